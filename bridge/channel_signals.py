@@ -5,4 +5,14 @@ class PodSignal(BaseModel):
     """A model representing a pod update event."""
     create: int | None = Field(None, description="The pod that was updated.")
     update: int | None = Field(None, description="The pod that was updated.")
-    delete: int | None = Field(None, description="The pod that was deleted.")
\ No newline at end of file
+    delete: int | None = Field(None, description="The pod that was deleted.")
+
+
+class ScanJobSignal(BaseModel):
+    """A progress event of one repository of a scan job."""
+    job: int = Field(description="The scan job the event belongs to.")
+    repo: int = Field(description="The repository that made progress.")
+    status: str = Field(description="The progress the repository reached.")
+    flavours: int = Field(0, description="How many flavours were upserted.")
+    reason: str | None = Field(None, description="Why the scan failed, if it did.")
+    done: bool = Field(False, description="Whether this was the last repository of the job.")
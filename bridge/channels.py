@@ -1,4 +1,5 @@
 from kante.channel import build_channel
-from bridge.channel_signals import PodSignal
+from bridge.channel_signals import PodSignal, ScanJobSignal
 
 pod_channel = build_channel(PodSignal)
+scan_job_channel = build_channel(ScanJobSignal)
@@ -0,0 +1,126 @@
+"""Cached results of port demands.
+
+UIs send the same demands ("actions that take an image and return an image")
+over and over. The definition IDs a set of demands matches are cached in the
+default Django cache (Redis), keyed by a hash of the normalized demands and the
+organization, with a small in-process LRU in front so repeated demands on one
+worker skip the round trip for the ID list. Results with more than
+``DEMAND_CACHE_MAX_IDS`` IDs are not cached: callers match those in a
+subquery, as a long ID list costs more to send back than to match again.
+
+Every key also carries the organization's *generation*, a counter that is
+bumped (see :func:`bump_generation`) whenever ingestion commits added,
+changed or deleted flavours, definitions or links of the organization, and
+whenever a definition is saved. A bump makes every cached result of that
+organization unreachable at once; the stale entries simply expire.
+"""
+
+import collections
+import dataclasses
+import enum
+import hashlib
+import json
+import threading
+import typing as t
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Cached in place of a result with too many IDs to be worth caching.
+TOO_MANY = "too-many"
+
+_local: "collections.OrderedDict[str, list[int] | str]" = collections.OrderedDict()
+_local_lock = threading.Lock()
+
+
+def normalize(value: t.Any) -> t.Any:
+    """A JSON-able form of a demand input that ignores unset fields."""
+    if dataclasses.is_dataclass(value):
+        return {field.name: normalize(getattr(value, field.name)) for field in dataclasses.fields(value) if getattr(value, field.name) is not None}
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    return value
+
+
+def canonical(value: t.Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+def demand_key(demands: list[t.Any], organization_id: int) -> str:
+    """Hash ``demands`` so that equivalent demands share a key.
+
+    Demands are intersected and the matches of a demand are matched
+    independently, so neither order is significant and both are sorted.
+    """
+    normalized = []
+    for demand in demands:
+        demand = normalize(demand)
+        if demand.get("matches"):
+            demand["matches"] = sorted(demand["matches"], key=canonical)
+        normalized.append(demand)
+
+    digest = hashlib.sha256(canonical(sorted(normalized, key=canonical)).encode()).hexdigest()
+    return f"demands:{organization_id}:{digest}"
+
+
+def generation_key(organization_id: int) -> str:
+    return f"demands:{organization_id}:generation"
+
+
+def generation(organization_id: int) -> int:
+    """The current definition generation of an organization."""
+    return cache.get(generation_key(organization_id), 0)
+
+
+def bump_generation(organization_id: int) -> None:
+    """Invalidate every cached demand result of an organization."""
+    key = generation_key(organization_id)
+    cache.add(key, 0, timeout=None)
+    cache.incr(key)
+
+
+def _local_get(key: str) -> list[int] | str | None:
+    with _local_lock:
+        ids = _local.get(key)
+        if ids is not None:
+            _local.move_to_end(key)
+        return ids
+
+
+def _local_set(key: str, ids: list[int] | str) -> None:
+    size = settings.DEMAND_CACHE_LOCAL_SIZE
+    with _local_lock:
+        _local[key] = ids
+        _local.move_to_end(key)
+        while len(_local) > size:
+            _local.popitem(last=False)
+
+
+def clear_local() -> None:
+    """Drop the in-process results (the shared cache is left alone)."""
+    with _local_lock:
+        _local.clear()
+
+
+def get_or_match(demands: list[t.Any], organization_id: int, match: t.Callable[[], list[int]]) -> list[int] | None:
+    """The definition IDs matching ``demands``, calling ``match`` only on a miss.
+
+    ``None`` if they are more than ``DEMAND_CACHE_MAX_IDS``: sending a long ID
+    list back to the database as parameters costs more than matching the
+    demands again in a subquery, so only the fact that it is long is cached.
+    """
+    key = f"{demand_key(demands, organization_id)}:{generation(organization_id)}"
+
+    ids = _local_get(key)
+    if ids is None:
+        ids = cache.get(key)
+        if ids is None:
+            ids = list(match())
+            if len(ids) > settings.DEMAND_CACHE_MAX_IDS:
+                ids = TOO_MANY
+            cache.set(key, ids, timeout=settings.DEMAND_CACHE_TTL)
+        _local_set(key, ids)
+
+    return None if ids == TOO_MANY else ids
@@ -20,6 +20,55 @@ class DemandKind(str, Enum):
     RETURNS = "returns"
 
 
+@strawberry.enum(description="The outcome of scanning a single tracked repository.")
+class RepoScanStatus(str, Enum):
+    """The outcome of scanning a single tracked repository."""
+
+    OK = "OK"
+    UNCHANGED = "UNCHANGED"
+    FAILED = "FAILED"
+    QUEUED = "QUEUED"
+
+
+@strawberry.enum(description="The lifecycle status of a scan job.")
+class ScanJobStatus(str, Enum):
+    """The lifecycle status of a scan job."""
+
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+
+
+@strawberry.enum(description="How far the scan of one repository of a scan job got.")
+class ScanProgress(str, Enum):
+    """How far the scan of one repository of a scan job got."""
+
+    QUEUED = "QUEUED"
+    FETCHED = "FETCHED"
+    PARSED = "PARSED"
+    UPSERTED = "UPSERTED"
+    UNCHANGED = "UNCHANGED"
+    FAILED = "FAILED"
+
+
+@strawberry.enum(description="Which side of a definition to find compatible definitions for.")
+class CompatibilityDirection(str, Enum):
+    """Which side of a definition to find compatible definitions for."""
+
+    CONSUMERS = "CONSUMERS"
+    PRODUCERS = "PRODUCERS"
+
+
+@strawberry.enum(description="The kind of entity a search hit refers to.")
+class SearchKind(str, Enum):
+    """The kind of entity a search hit refers to."""
+
+    DEFINITION = "DEFINITION"
+    FLAVOUR = "FLAVOUR"
+    APP = "APP"
+    GITHUB_REPO = "GITHUB_REPO"
+
+
 @strawberry.enum(description="The container runtime used to run a pod.")
 class ContainerType(str, Enum):
     APPTAINER = "APPTAINER"
@@ -1,10 +1,14 @@
 import strawberry
+from bridge import demand_cache
 from bridge import managers
+from bridge.search import search_q
 from bridge import inputs
 from bridge import models
+from bridge import versions
 import strawberry_django
 from kante.types import Info
 from django.db.models import Q, QuerySet
+from django.db.models.expressions import RawSQL
 
 
 @strawberry_django.order_type(models.Definition)
@@ -20,9 +24,9 @@ class GithubRepoFilter:
     def ids(self, value: list[strawberry.ID], prefix: str) -> Q:
         return Q(**{f"{prefix}id__in": value})
 
-    @strawberry_django.filter_field(description="Case-insensitive search on the repository name.")
+    @strawberry_django.filter_field(description="Search on the repository name, tolerating typos.")
     def search(self, value: str, prefix: str) -> Q:
-        return Q(**{f"{prefix}name__icontains": value})
+        return search_q(prefix, value, "name")
 
     @strawberry_django.filter_field(description="Case-insensitive match on the GitHub repository name.")
     def repo(self, value: str, prefix: str) -> Q:
@@ -45,35 +49,25 @@ class DefinitionFilter:
     def ids(self, value: list[strawberry.ID], prefix: str) -> Q:
         return Q(**{f"{prefix}id__in": value})
 
-    @strawberry_django.filter_field(description="Case-insensitive search on the action name.")
+    @strawberry_django.filter_field(description="Full-text search on the action name and description, with prefix and typo-tolerant name matching.")
     def search(self, value: str, prefix: str) -> Q:
-        return Q(**{f"{prefix}name__icontains": value})
+        return search_q(prefix, value, "name", vector="search_vector")
 
     @strawberry_django.filter_field(
         description="Keep only definitions whose ports satisfy all of the given demands.",
     )
-    def demands(self, value: list[inputs.PortDemandInput], prefix: str) -> Q:
-        filtered_ids = None
-
-        for ports_demand in value:
-            new_ids = managers.get_action_ids_by_demands(
-                ports_demand.matches,
-                type=ports_demand.kind.value,
-                force_length=ports_demand.force_length,
-                force_non_nullable_length=ports_demand.force_non_nullable_length,
-                force_structure_length=ports_demand.force_structure_length,
-                model="bridge_definition",
-            )
-
-            if filtered_ids is None:
-                filtered_ids = set(new_ids)
-            else:
-                filtered_ids = filtered_ids.intersection(new_ids)
-
-        if filtered_ids is None:
+    def demands(self, value: list[inputs.PortDemandInput], info: Info, prefix: str) -> Q:
+        if not value:
             return Q()
 
-        return Q(**{f"{prefix}id__in": filtered_ids})
+        # Small results are cached until the organization's next ingestion and
+        # sent as an ID list; larger ones are matched in a subquery (the
+        # database intersects the demands) rather than sent back as parameters.
+        organization_id = info.context.request.organization.id
+        ids = demand_cache.get_or_match(value, organization_id, lambda: managers.get_definition_ids_by_port_demands(value, organization_id=organization_id))
+        if ids is None:
+            return Q(**{f"{prefix}id__in": RawSQL(*managers.build_port_demands_sql(value, organization_id=organization_id))})
+        return Q(**{f"{prefix}id__in": ids})
 
 
 @strawberry_django.order_type(models.Flavour)
@@ -100,9 +94,9 @@ class FlavourFilter:
     def ids(self, value: list[strawberry.ID], prefix: str) -> Q:
         return Q(**{f"{prefix}id__in": value})
 
-    @strawberry_django.filter_field(description="Case-insensitive search on the flavour name.")
+    @strawberry_django.filter_field(description="Search on the flavour name, tolerating typos.")
     def search(self, value: str, prefix: str) -> Q:
-        return Q(**{f"{prefix}name__icontains": value})
+        return search_q(prefix, value, "name")
 
     @strawberry_django.filter_field(description="Keep only flavours that provide one of the given definitions.")
     def has_definitions(self, value: list[strawberry.ID], prefix: str) -> Q:
@@ -174,9 +168,9 @@ class AppFilter:
     def ids(self, value: list[strawberry.ID], prefix: str) -> Q:
         return Q(**{f"{prefix}id__in": value})
 
-    @strawberry_django.filter_field(description="Case-insensitive search on the app identifier.")
+    @strawberry_django.filter_field(description="Search on the app identifier, tolerating typos.")
     def search(self, value: str, prefix: str) -> Q:
-        return Q(**{f"{prefix}identifier__icontains": value})
+        return search_q(prefix, value, "identifier")
 
 
 @strawberry_django.filter_type(models.DockerImage, description="Filter for Docker images.")
@@ -245,10 +239,20 @@ class AppOrder:
 @strawberry_django.order_type(models.Release)
 class ReleaseOrder:
     id: strawberry.auto
-    version: strawberry.auto
     released_at: strawberry.auto
     created_at: strawberry.auto
 
+    @strawberry_django.order_field
+    def version(
+        self,
+        info: Info,
+        queryset: QuerySet,
+        value: strawberry_django.Ordering,
+        prefix: str,
+    ) -> tuple[QuerySet, list[str]] | list[str]:
+        """Semver order; versions that are not semver go last."""
+        return queryset, versions.ordering(prefix, descending=value.name.startswith("DESC"))
+
 
 @strawberry_django.order_type(models.DockerImage)
 class DockerImageOrder:
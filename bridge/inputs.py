@@ -26,6 +26,19 @@ class ScanRepoInput:
     id: str
 
 
+class StartScanInputModel(BaseModel):
+    """Input for starting a scan job."""
+
+    repos: list[str] | None = Field(default=None, description="The IDs of the GitHub repositories to scan. Scans every repository of the organization when omitted.")
+
+
+@pydantic.input(StartScanInputModel, description="Input for starting a background scan of tracked GitHub repositories.")
+class StartScanInput:
+    """Input for starting a scan job."""
+
+    repos: list[str] | None = None
+
+
 class CreateGithubRepoInputModel(BaseModel):
     """Input for tracking a new GitHub repository."""
 
@@ -99,8 +112,16 @@ class DeploySetupInput:
 
 
 class DeviceFeatureModel(BaseModel):
-    kind: str = Field(description="The kind of feature (e.g. 'gpu', 'cpu').")
-    cpu_count: str = Field(description="The number of CPUs the feature describes.")
+    kind: str = Field(description="The kind of feature (e.g. 'cuda', 'rocm', 'oneapi', 'cpu', 'ram', 'label').")
+    cpu_count: str | None = Field(default=None, description="The number of CPUs the feature describes.")
+    cuda_version: str | None = Field(default=None, description="The CUDA version the device supports (cuda features).")
+    cuda_cores: int | None = Field(default=None, description="The number of CUDA cores of the device (cuda features).")
+    api_version: str | None = Field(default=None, description="The ROCm API version the device supports (rocm features).")
+    oneapi_version: str | None = Field(default=None, description="The oneAPI version the device supports (oneapi features).")
+    frequency: int | None = Field(default=None, description="The CPU frequency, in MHz (cpu features).")
+    memory: int | None = Field(default=None, description="The available memory, in MB (cpu and ram features).")
+    key: str | None = Field(default=None, description="The key of a label (label features).")
+    value: str | None = Field(default=None, description="The value of a label (label features).")
 
 
 class EnvironmentInputModel(BaseModel):
@@ -111,7 +132,15 @@ class EnvironmentInputModel(BaseModel):
 @pydantic.input(DeviceFeatureModel, description="A single hardware feature of a device to match against.")
 class DeviceFeature:
     kind: str
-    cpu_count: str
+    cpu_count: str | None = None
+    cuda_version: str | None = None
+    cuda_cores: int | None = None
+    api_version: str | None = None
+    oneapi_version: str | None = None
+    frequency: int | None = None
+    memory: int | None = None
+    key: str | None = None
+    value: str | None = None
 
 
 @pydantic.input(EnvironmentInputModel, description="The target environment that flavours are matched against.")
@@ -127,7 +156,7 @@ class MatchFlavoursInputModel(BaseModel):
 
     environment: EnvironmentInputModel | None = Field(default=None, description="The target environment to match flavours against.")
     release: strawberry.ID | None = Field(default=None, description="The release whose flavours should be matched.")
-    actions: Optional[list[str]] = Field(description="The action hashes that the matched flavour must provide.")
+    actions: Optional[list[str]] = Field(default=None, description="The action hashes that the matched flavour must provide.")
 
 
 @pydantic.input(MatchFlavoursInputModel, description="Input for matching the best flavour for a release in a given environment.")
@@ -135,8 +164,8 @@ class MatchFlavoursInput:
     """Input for matching the best flavour for a release in a given environment."""
 
     environment: EnvironmentInput | None = None
-    actions: Optional[list[ActionHash]]
-    release: Optional[strawberry.ID]
+    actions: Optional[list[ActionHash]] = None
+    release: Optional[strawberry.ID] = None
 
 
 class CreatePodInputModel(BaseModel):
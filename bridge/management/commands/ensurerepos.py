@@ -1,50 +1,54 @@
-from django.contrib.auth import get_user_model
-from django.contrib.auth.models import Group
-from django.core.management.base import BaseCommand
-from authentikate.models import Organization
-from django.conf import settings
-from bridge.mutations.repo import _create_github_repo
-from bridge import inputs
+"""Make sure every organization in ``repo_map`` tracks its repositories.
+
+Each distinct ``deployments.yaml`` is fetched once, concurrently, and shared
+by the organizations that map it (see :mod:`bridge.repo.provision`). With
+``--defer`` the repositories are only created and queued for the sync worker,
+so the server can start right away.
+
+    python manage.py ensurerepos [--defer] [--concurrency N]
+"""
+
 from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
 from pydantic import BaseModel
 
+from bridge import inputs
+from bridge.mutations.repo import infer_repo_info
+from bridge.repo.provision import RepoTarget, aensure_repos
+
 
 class RepoMap(BaseModel):
     organization: str
     repos: list[str]
 
+
 class RepoMapSettings(BaseModel):
     repo_map: list[RepoMap]
 
 
-async def create_github_repos(repo_map: list[RepoMap]):
+def build_targets(repo_map: list[RepoMap]) -> list[RepoTarget]:
+    targets = []
+    for mapping in repo_map:
+        for repo_identifier in mapping.repos:
+            user, repo, branch, name = infer_repo_info(inputs.CreateGithubRepoInputModel(identifier=repo_identifier, name=repo_identifier))
+            targets.append(RepoTarget(organization=mapping.organization, user=user, repo=repo, branch=branch, name=name))
 
-    for repo in repo_map:
-        
-        organization, _  = await Organization.objects.aget_or_create(slug=repo.organization)
-        
-        for repo_identifier in repo.repos:
-            input = inputs.CreateGithubRepoInput(
-                identifier=repo_identifier, name=repo_identifier
-            )
-            
-            try:
-                await _create_github_repo(input, organization, None)
-            except Exception as e:
-                raise e
-                
-                print(f"Error creating repo {repo_identifier}: {e}")
-        
+    return targets
 
 
 class Command(BaseCommand):
     help = "Ensures that the repos are used"
 
-    def handle(self, *args, **kwargs):
-        
-        
-        repos = settings.REPO_MAP
-        match = RepoMapSettings(repo_map=repos)
-        repos = match.repo_map
+    def add_arguments(self, parser):
+        parser.add_argument("--defer", action="store_true", help="Only create the repositories and leave fetching them to the sync worker")
+        parser.add_argument("--concurrency", type=int, default=None, help="Maximum number of configs fetched at once")
+
+    def handle(self, *args, **options):
+        match = RepoMapSettings(repo_map=settings.REPO_MAP)
+        targets = build_targets(match.repo_map)
+
+        results = async_to_sync(aensure_repos)(targets, defer=options["defer"], concurrency=options["concurrency"])
 
-        async_to_sync(create_github_repos)(repos)
+        for result in results:
+            self.stdout.write(f"{result.repo.organization.slug} {result.repo}: {result.status.value}" + (f" ({result.reason})" if result.reason else ""))
@@ -0,0 +1,46 @@
+"""Keep tracked GitHub repositories in sync in the background.
+
+Runs a :class:`bridge.repo.sync.RepoSyncWorker` until it receives SIGTERM or
+SIGINT, then cancels the scans in flight and exits. It runs as its own
+process (``run-sync.sh``, the ``sync`` service of ``docker-compose.yaml``),
+so it is restarted on its own if it dies; the ``scanRepo``/``rescanRepos``
+and ``createGithubRepo`` mutations only queue work for it.
+
+    python manage.py syncrepos [--once] [--concurrency N]
+"""
+
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from bridge.repo.scan import RepoScanResult
+from bridge.repo.sync import RepoSyncWorker
+
+
+async def run_until_stopped(worker: RepoSyncWorker, once: bool) -> list[RepoScanResult]:
+    """Run ``worker`` until it is done or the process is asked to stop."""
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, task.cancel)
+
+    try:
+        return await worker.run(once=once)
+    except asyncio.CancelledError:
+        return []
+
+
+class Command(BaseCommand):
+    help = "Periodically rescans tracked GitHub repositories"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Sync every due repository, then exit")
+        parser.add_argument("--concurrency", type=int, default=None, help="Maximum number of repositories scanned at once")
+
+    def handle(self, *args, **options):
+        worker = RepoSyncWorker(concurrency=options["concurrency"])
+        results = asyncio.run(run_until_stopped(worker, options["once"]))
+
+        for result in results:
+            self.stdout.write(f"{result.repo}: {result.status.value}" + (f" ({result.reason})" if result.reason else ""))
@@ -1,68 +1,154 @@
+import json
 import re
 import typing as t
 
 from django.db import connection
+from django.db.models import Count, QuerySet
+from django.db.models.expressions import RawSQL
 
-from .inputs import ActionDemandInput
+from . import enums, matcher, models
+from .inputs import ActionDemandInput, PortDemandInput
 from rekuest_core.inputs.types import PortMatchInput
 
 qt = re.compile(r"@(?P<package>[^\/]*)\/(?P<interface>[^\/]*)")
+placeholder = re.compile(r"%\((\w+)\)s")
 
 
-def build_child_recursively(item: PortMatchInput, prefix, value_path, parts, params):
-    if item.key:
-        parts.append(f"{prefix}->>'key' = %({value_path}_key)s")
-        params[f"{value_path}_key"] = item.key
+PORT_TABLE = "bridge_definitionport"
+STATE_PORT_TABLE = "bridge_statedefinitionport"
 
-    if item.kind:
-        parts.append(f"{prefix}->>'kind' = %({value_path}_kind)s")
-        params[f"{value_path}_kind"] = item.kind.value
 
-    if item.identifier:
-        parts.append(f"{prefix}->>'identifier' = %({value_path}_identifier)s")
-        params[f"{value_path}_identifier"] = item.identifier
+def build_port_conditions(alias: str, item: PortMatchInput, direction: str | None, prefix: str, params: dict[str, t.Any]) -> list[str]:
+    """The conditions on the port row ``alias`` for it to satisfy ``item``.
 
-    if item.children:
-        raise ValueError("Children should not be present in the child item")
-        build_child_recursively(item.child, prefix + "->'children'", f"{value_path}_child", parts, params)
+    ``direction`` is ``None`` for port tables without directions (states).
+    """
+    conditions = []
+    if direction is not None:
+        conditions.append(f"{alias}.direction = %({prefix}_direction)s")
+        params[f"{prefix}_direction"] = direction
 
+    if item.at is not None:
+        conditions.append(f"{alias}.position = %({alias}_at)s")
+        params[f"{alias}_at"] = item.at
 
-def build_sql_for_item_recursive(item: PortMatchInput, index: int, at_value: int | None = None, prefix: str = "arg"):
-    sql_parts = []
-    params = {}
+    for field in ("key", "kind", "identifier"):
+        value = getattr(item, field)
+        if value:
+            conditions.append(f"{alias}.{field} = %({alias}_{field})s")
+            params[f"{alias}_{field}"] = getattr(value, "value", value)
 
-    if at_value is not None:
-        sql_parts.append(f"idx = %({prefix}_at_{index})s")
-        params[f"{prefix}_at_{index}"] = at_value + 1
+    for index, child in enumerate(item.children or []):
+        if child.children:
+            raise ValueError("Children should not be present in the child item")
 
-    if item.key:
-        sql_parts.append(f"item->>'key' = %({prefix}_key_{index})s")
-        params[f"{prefix}_key_{index}"] = item.key
+        if child.kind:
+            # Postgres arrays are one-based
+            conditions.append(f"{alias}.child_kinds[{index + 1}] = %({alias}_child_{index}_kind)s")
+            params[f"{alias}_child_{index}_kind"] = child.kind.value
+        for field in ("key", "identifier"):
+            value = getattr(child, field)
+            if value:
+                conditions.append(f"{alias}.children->{index}->>'{field}' = %({alias}_child_{index}_{field})s")
+                params[f"{alias}_child_{index}_{field}"] = value
 
-    if item.kind:
-        sql_parts.append(f"item->>'kind' = %({prefix}_kind_{index})s")
-        params[f"{prefix}_kind_{index}"] = item.kind.value
+    return conditions
 
-    if item.identifier:
-        sql_parts.append(f"item->>'identifier' = %({prefix}_identifier_{index})s")
-        params[f"{prefix}_identifier_{index}"] = item.identifier
 
-    if item.children:
-        # Adjusting the prefix for recursion
-        child_parts = []
-        child_params = {}
-        for idx, child in enumerate(item.children):
-            build_child_recursively(
-                child,
-                f"item->'children'->{idx + 1}",
-                f"children_{index}_{idx}",
-                child_parts,
-                child_params,
-            )
-        sql_parts += child_parts
-        params.update(child_params)
+def build_port_query(
+    matches: list[tuple[str | None, list[PortMatchInput] | None, str]],
+    params: dict[str, t.Any],
+    definition_conditions: list[str] | None = None,
+    model: str = "bridge_definition",
+    organization_id: int | None = None,
+    port_table: str = PORT_TABLE,
+    owner: str = "definition_id",
+) -> str:
+    """Join one port row per match and select the definitions that have all of them.
+
+    ``matches`` holds ``(direction, items, prefix)`` triples. The first port
+    is found through the port indexes and every further port is joined on its
+    definition, so the cost grows with the number of matching ports rather
+    than with the number of definitions. ``definition_conditions`` refer to
+    the definition as ``d``.
+
+    With ``organization_id`` every joined port is restricted to that
+    organization, so each lookup is a range scan on the port indexes (which
+    lead with the organization) instead of a scan across all tenants.
+
+    ``port_table`` and ``owner`` (its column referring to ``model``) select
+    another port table, such as the ports of state definitions.
+    """
+    definition_conditions = list(definition_conditions or [])
+
+    aliases = []
+    conditions = []
+    for direction, items, prefix in matches:
+        for index, item in enumerate(items or []):
+            alias = f"{prefix}{index}"
+            aliases.append(alias)
+            conditions += build_port_conditions(alias, item, direction, prefix, params)
+            if organization_id is not None:
+                conditions.append(f"{alias}.organization_id = %(organization_id)s")
+
+    if not aliases and not definition_conditions:
+        raise ValueError("No search params provided")
 
-    return (" AND ".join(sql_parts), params)
+    if organization_id is not None:
+        params["organization_id"] = organization_id
+        if not aliases:
+            definition_conditions.append("d.organization_id = %(organization_id)s")
+
+    if not aliases:
+        return f"SELECT d.id FROM {model} d WHERE " + " AND ".join(definition_conditions)
+
+    first = aliases[0]
+    sql = f"SELECT DISTINCT {first}.{owner} FROM {port_table} {first}"
+    for alias in aliases[1:]:
+        sql += f" JOIN {port_table} {alias} ON {alias}.{owner} = {first}.{owner}"
+    if definition_conditions:
+        sql += f" JOIN {model} d ON d.id = {first}.{owner}"
+
+    return sql + " WHERE " + " AND ".join(conditions + definition_conditions)
+
+
+def build_shape_conditions(direction: t.Literal["args", "returns"], params: dict[str, t.Any], **counts: int | None) -> list[str]:
+    """Equality checks on the precomputed shape columns of the definition ``d``.
+
+    ``counts`` maps a shape (``length``, ``non_nullable_length`` or
+    ``structure_length``) to the number of ports of ``direction`` it requires.
+    """
+    column = direction[:-1]
+    columns = {"length": f"{column}_count", "non_nullable_length": f"non_nullable_{column}_count", "structure_length": f"structure_{column}_count"}
+
+    conditions = []
+    for shape, count in counts.items():
+        if count is not None:
+            name = f"{column}_{shape}"
+            conditions.append(f"d.{columns[shape]} = %({name})s")
+            params[name] = count
+    return conditions
+
+
+def build_compatibility_sql(definition_id: int, direction: enums.CompatibilityDirection) -> tuple[str, list[t.Any]]:
+    """Select the definitions that can consume the returns (or produce the args) of a definition.
+
+    A return port fits an arg port of the same signature (see
+    ``DefinitionPort.signature_of``) unless the return is nullable and the arg
+    is not. The ports are paired with an indexed join, so no JSON is read.
+    """
+    if direction == enums.CompatibilityDirection.CONSUMERS:
+        own, other, fits = "returns", "args", "(NOT own.nullable OR other.nullable)"
+    else:
+        own, other, fits = "args", "returns", "(NOT other.nullable OR own.nullable)"
+
+    sql = (
+        f"SELECT DISTINCT other.definition_id FROM {PORT_TABLE} own"
+        f" JOIN {PORT_TABLE} other ON other.organization_id = own.organization_id AND other.direction = %s"
+        f" AND other.signature = own.signature AND other.definition_id <> own.definition_id AND {fits}"
+        " WHERE own.definition_id = %s AND own.direction = %s"
+    )
+    return sql, [other, definition_id, own]
 
 
 def build_params(
@@ -72,104 +158,152 @@ def build_params(
     force_non_nullable_length: t.Optional[int] = None,
     force_structure_length: t.Optional[int] = None,
     model: str = "bridge_definition",
+    organization_id: int | None = None,
 ):
-    individual_queries = []
     all_params = {}
-    if search_params:
-        for index, item in enumerate(search_params):
-            sql_part, params = build_sql_for_item_recursive(item, index, at_value=item.at)
-            if type == "args":
-                subquery = f"EXISTS (SELECT 1 FROM jsonb_array_elements(args) WITH ORDINALITY AS j(item, idx) WHERE {sql_part})"
-            else:
-                subquery = f"EXISTS (SELECT 1 FROM jsonb_array_elements(returns) WITH ORDINALITY AS j(item, idx) WHERE {sql_part})"
-
-            individual_queries.append(subquery)
-            all_params.update(params)
-
-    if force_length is not None:
-        individual_queries.append(f"jsonb_array_length({type}) = {force_length}")
-
-    if force_non_nullable_length is not None:
-        sql_part = "item->>'nullable'::text = 'false'"
-        count_condition = f"""(SELECT COUNT(*) FROM jsonb_array_elements({type}) AS j(item) WHERE {sql_part}) = {force_non_nullable_length}"""
-        individual_queries.append(count_condition)
-
-    if force_structure_length is not None:
-        sql_part = "item->>'kind' = 'STRUCTURE'"
-        count_condition = f"""(SELECT COUNT(*) FROM jsonb_array_elements({type}) AS j(item) WHERE {sql_part}) = {force_structure_length}"""
-        individual_queries.append(count_condition)
-
-    if not individual_queries:
-        raise ValueError("No search params provided")
+    definition_conditions = build_shape_conditions(
+        type,
+        all_params,
+        length=force_length,
+        non_nullable_length=force_non_nullable_length,
+        structure_length=force_structure_length,
+    )
 
-    full_sql = f"SELECT id FROM {model} WHERE " + " AND ".join(individual_queries)
+    full_sql = build_port_query([(type, search_params, "arg")], all_params, definition_conditions=definition_conditions, model=model, organization_id=organization_id)
 
     return full_sql, all_params
 
 
 def build_action_demand_params(
     action_demand: ActionDemandInput,
-    model: str = "facade_action",
+    model: str = "bridge_definition",
+    organization_id: int | None = None,
 ) -> tuple[str, dict[str, t.Any]]:
-    """Build SQL for action demand"""
-    individual_queries = []
-    all_params = {}
-    
-    
-    if action_demand.name:
-        individual_queries.append(f"name = %(name)s")
-        all_params["name"] = action_demand.name
-        
-
-    if action_demand.arg_matches:
-        for index, item in enumerate(action_demand.arg_matches):
-            sql_part, params = build_sql_for_item_recursive(item, index, at_value=item.at, prefix="arg")
-            subquery = f"EXISTS (SELECT 1 FROM jsonb_array_elements(args) WITH ORDINALITY AS j(item, idx) WHERE {sql_part})"
+    """Build SQL for action demand
 
-            individual_queries.append(subquery)
-            all_params.update(params)
+    Definitions are not stored with a ``key`` (that is the name an agent
+    gives an action), so a demand for one is rejected rather than ignored.
+    """
+    if action_demand.key:
+        raise ValueError("Definitions cannot be demanded by key, use their hash, name or ports")
 
-    if action_demand.return_matches:
-        for index, item in enumerate(action_demand.return_matches):
-            sql_part, params = build_sql_for_item_recursive(item, index, at_value=item.at, prefix="return")
-            subquery = f"EXISTS (SELECT 1 FROM jsonb_array_elements(returns) WITH ORDINALITY AS j(item, idx) WHERE {sql_part})"
-
-            individual_queries.append(subquery)
-            all_params.update(params)
-
-    if action_demand.force_arg_length is not None:
-        individual_queries.append(f"jsonb_array_length(args) = {action_demand.force_arg_length}")
-    if action_demand.force_return_length is not None:
-        individual_queries.append(f"jsonb_array_length(returns) = {action_demand.force_return_length}")
+    all_params = {}
+    definition_conditions = build_shape_conditions("args", all_params, length=action_demand.force_arg_length)
+    definition_conditions += build_shape_conditions("returns", all_params, length=action_demand.force_return_length)
 
-    if not individual_queries:
-        raise ValueError("No search params provided")
+    if action_demand.name:
+        definition_conditions.append("d.name = %(name)s")
+        all_params["name"] = action_demand.name
 
-    full_sql = f"SELECT id FROM {model} WHERE " + " AND ".join(individual_queries)
+    if action_demand.hash:
+        definition_conditions.append("d.hash = %(hash)s")
+        all_params["hash"] = action_demand.hash
+
+    # Protocols are demanded by name, which is unique within the definition's organization.
+    for index, protocol in enumerate(action_demand.protocols or []):
+        definition_conditions.append(
+            f"EXISTS (SELECT 1 FROM {model}_protocols dp JOIN bridge_protocol p ON p.id = dp.protocol_id"
+            f" WHERE dp.definition_id = d.id AND p.organization_id = d.organization_id AND p.name = %(protocol_{index})s)"
+        )
+        all_params[f"protocol_{index}"] = protocol
+
+    full_sql = build_port_query(
+        [("args", action_demand.arg_matches, "arg"), ("returns", action_demand.return_matches, "return")],
+        all_params,
+        definition_conditions=definition_conditions,
+        model=model,
+        organization_id=organization_id,
+    )
 
     return full_sql, all_params
 
 
 def build_state_params(
     search_params: list[PortMatchInput] | None,
-    model: str = "facade_state_schema",
+    model: str = "bridge_statedefinition",
+    organization_id: int | None = None,
 ):
-    individual_queries = []
+    """Build SQL selecting the state definitions with a port for every item, over their port table."""
+    if not search_params:
+        raise ValueError("No search params provided")
+
     all_params = {}
-    if search_params:
-        for index, item in enumerate(search_params):
-            sql_part, params = build_sql_for_item_recursive(item, index, at_value=item.at)
-            subquery = f"EXISTS (SELECT 1 FROM jsonb_array_elements(ports) WITH ORDINALITY AS j(item, idx) WHERE {sql_part})"
+    full_sql = build_port_query(
+        [(None, search_params, "port")],
+        all_params,
+        model=model,
+        organization_id=organization_id,
+        port_table=STATE_PORT_TABLE,
+        owner="state_id",
+    )
+
+    return full_sql, all_params
 
-            individual_queries.append(subquery)
-            all_params.update(params)
 
-    if not individual_queries:
+def to_positional(sql: str, params: dict[str, t.Any]) -> tuple[str, list[t.Any]]:
+    """Rewrite the ``%(name)s`` placeholders of ``sql`` to ``%s``, for APIs that
+    only take positional params (such as ``RawSQL``)."""
+    values = []
+
+    def replace(match: re.Match) -> str:
+        values.append(params[match.group(1)])
+        return "%s"
+
+    return placeholder.sub(replace, sql), values
+
+
+def build_port_demands_sql(demands: list[PortDemandInput], model: str = "bridge_definition", organization_id: int | None = None) -> tuple[str, list[t.Any]]:
+    """Compile several port demands into one statement selecting the definitions that meet all of them.
+
+    Every demand becomes a port query (see :func:`build_params`); the
+    database intersects them, so the result can be used as a subquery
+    without materializing any ID list in Python. ``organization_id`` scopes
+    every demand to one organization's definitions.
+    """
+    parts = []
+    values = []
+    for demand in demands:
+        sql, params = build_params(
+            demand.matches,
+            type=demand.kind.value,
+            force_length=demand.force_length,
+            force_non_nullable_length=demand.force_non_nullable_length,
+            force_structure_length=demand.force_structure_length,
+            model=model,
+            organization_id=organization_id,
+        )
+        sql, demand_values = to_positional(sql, params)
+        parts.append(f"({sql})")
+        values += demand_values
+
+    if not parts:
         raise ValueError("No search params provided")
 
-    full_sql = f"SELECT id FROM {model} WHERE " + " AND ".join(individual_queries)
+    return " INTERSECT ".join(parts), values
 
-    return full_sql, all_params
+
+def build_action_demands_sql(demands: list[ActionDemandInput], model: str = "bridge_definition", organization_id: int | None = None) -> tuple[str, list[t.Any]]:
+    """Compile several action demands into one statement of ``(demand, definition)`` rows.
+
+    ``demand`` is the index of the demand in ``demands``. Every demand becomes
+    a port query (see :func:`build_action_demand_params`) and the queries are
+    combined with ``UNION ALL``, so a whole workflow resolves in one round trip.
+    The matching definitions are joined in as ``d``, every column of them
+    selected, ordered by demand and ID.
+    """
+    parts = []
+    values = []
+    for index, demand in enumerate(demands):
+        sql, params = build_action_demand_params(demand, model=model, organization_id=organization_id)
+        sql, demand_values = to_positional(sql, params)
+        parts.append(f"SELECT {index} AS demand, matched.id FROM ({sql}) AS matched(id)")
+        values += demand_values
+
+    if not parts:
+        raise ValueError("No demands provided")
+
+    matches = " UNION ALL ".join(parts)
+    return f"SELECT d.*, m.demand FROM ({matches}) AS m JOIN {model} d ON d.id = m.id ORDER BY m.demand, d.id", values
 
 
 def filter_actions_by_demands(
@@ -180,10 +314,10 @@ def filter_actions_by_demands(
     force_non_nullable_length: t.Optional[int] = None,
     force_structure_length: t.Optional[int] = None,
     model: str = "bridge_definition",
+    organization_id: int | None = None,
 ):
     if type not in ["args", "returns"]:
         raise ValueError("Type must be either 'args' or 'returns'")
-    
 
     full_sql, all_params = build_params(
         demands,
@@ -192,15 +326,10 @@ def filter_actions_by_demands(
         force_non_nullable_length=force_non_nullable_length,
         force_structure_length=force_structure_length,
         model=model,
+        organization_id=organization_id,
     )
 
-    with connection.cursor() as cursor:
-        cursor.execute(full_sql, all_params)
-        rows = cursor.fetchall()
-        ids = [row[0] for row in rows]
-
-    qs = qs.filter(id__in=ids)
-    return qs
+    return qs.filter(id__in=RawSQL(*to_positional(full_sql, all_params)))
 
 
 def get_action_ids_by_demands(
@@ -210,6 +339,7 @@ def get_action_ids_by_demands(
     force_non_nullable_length: t.Optional[int] = None,
     force_structure_length: t.Optional[int] = None,
     model: str = "bridge_definition",
+    organization_id: int | None = None,
 ):
     if type not in ["args", "returns"]:
         raise ValueError("Type must be either 'args' or 'returns'")
@@ -221,6 +351,7 @@ def get_action_ids_by_demands(
         force_non_nullable_length=force_non_nullable_length,
         force_structure_length=force_structure_length,
         model=model,
+        organization_id=organization_id,
     )
 
     with connection.cursor() as cursor:
@@ -230,13 +361,35 @@ def get_action_ids_by_demands(
         return ids
 
 
+def get_definition_ids_by_port_demands(
+    demands: list[PortDemandInput],
+    model: str = "bridge_definition",
+    organization_id: int | None = None,
+):
+    if organization_id is not None and model == "bridge_definition":
+        # Hot shapes are answered by the in-process index, if it is enabled.
+        ids = matcher.match_port_demands(demands, organization_id)
+        if ids is not None:
+            return ids
+
+    full_sql, values = build_port_demands_sql(demands, model=model, organization_id=organization_id)
+
+    with connection.cursor() as cursor:
+        cursor.execute(full_sql, values)
+        rows = cursor.fetchall()
+        ids = [row[0] for row in rows]
+        return ids
+
+
 def get_action_ids_by_action_demand(
     action_demand: ActionDemandInput,
     model: str = "bridge_definition",
+    organization_id: int | None = None,
 ):
     full_sql, all_params = build_action_demand_params(
         action_demand,
         model=model,
+        organization_id=organization_id,
     )
 
     with connection.cursor() as cursor:
@@ -246,13 +399,84 @@ def get_action_ids_by_action_demand(
         return ids
 
 
+def get_definitions_by_action_demands(
+    demands: list[ActionDemandInput],
+    model: str = "bridge_definition",
+    organization_id: int | None = None,
+) -> list[list["models.Definition"]]:
+    """The definitions matching each of ``demands``, in one query; one list per demand."""
+    full_sql, values = build_action_demands_sql(demands, model=model, organization_id=organization_id)
+
+    grouped: list[list[models.Definition]] = [[] for _ in demands]
+    for definition in models.Definition.objects.raw(full_sql, values):
+        grouped[definition.demand].append(definition)
+    return grouped
+
+
+def flavour_ids_providing(hashes: list[str], organization_id: int) -> QuerySet:
+    """The IDs of the flavours providing every action of ``hashes``, as a subquery.
+
+    One ``GROUP BY flavour HAVING COUNT(DISTINCT definition) = N`` over the
+    flavour-definition table, starting from the (hash, organization) index,
+    instead of one join of that table per hash.
+    """
+    hashes = set(hashes)
+    return (
+        models.Definition.flavours.through.objects.filter(definition__organization_id=organization_id, definition__hash__in=hashes)
+        .values("flavour_id")
+        .annotate(provided=Count("definition_id", distinct=True))
+        .filter(provided=len(hashes))
+        .values("flavour_id")
+    )
+
+
+def get_flavour_candidates(
+    flavours: QuerySet,
+    hashes: set[str],
+    organization_id: int,
+    flags: t.Sequence[str] = (),
+) -> list[tuple[int, int, list[dict[str, t.Any]], list[str], tuple[bool, ...]]]:
+    """The ID, release, selectors, provided ``hashes`` and ``flags`` of each of ``flavours``, newest first.
+
+    The provided hashes are aggregated per flavour from the requested
+    definitions only, starting from the (hash, organization) index, and then
+    joined to the flavours; aggregating over every link of every flavour
+    would sort all of them. ``flags`` are boolean annotations of
+    ``flavours``, computed by the database along with the candidates.
+    """
+    candidates, candidate_params = flavours.order_by().values("id", *flags).query.sql_with_params()
+    flag_columns = "".join(f", c.{flag}" for flag in flags)
+    full_sql = f"""
+        SELECT f.id, f.release_id, f.selectors, COALESCE(p.provided, ARRAY[]::varchar[]){flag_columns}
+        FROM ({candidates}) c
+        JOIN bridge_flavour f ON f.id = c.id
+        LEFT JOIN (
+            SELECT df.flavour_id, array_agg(d.hash) AS provided
+            FROM bridge_definition d
+            JOIN bridge_definition_flavours df ON df.definition_id = d.id
+            WHERE d.organization_id = %s AND d.hash = ANY(%s)
+            GROUP BY df.flavour_id
+        ) p ON p.flavour_id = f.id
+        ORDER BY f.created_at DESC
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(full_sql, [*candidate_params, organization_id, sorted(hashes)])
+        return [
+            (id, release_id, json.loads(selectors) if isinstance(selectors, str) else selectors, provided, tuple(values))
+            for id, release_id, selectors, provided, *values in cursor.fetchall()
+        ]
+
+
 def get_state_ids_by_demands(
     matches: list[PortMatchInput] = None,
-    model: str = "facade_stateschema",
+    model: str = "bridge_statedefinition",
+    organization_id: int | None = None,
 ):
     full_sql, all_params = build_state_params(
         matches,
         model=model,
+        organization_id=organization_id,
     )
 
     with connection.cursor() as cursor:
@@ -0,0 +1,194 @@
+"""An in-process index of the definition ports of an organization.
+
+For the demand shapes the UI sends on every keystroke, even the indexed port
+queries of :mod:`bridge.managers` cost a round trip. With
+``DEMAND_MATCHER_ENABLED`` each process keeps, per organization, the port rows
+in flat arrays with posting lists keyed by direction and field value (kind,
+identifier, key, position), plus the shape counts of every definition. Port
+demands are then intersected in memory.
+
+An index is loaded on the first demand of its organization and rebuilt when
+the organization's definition generation (see :mod:`bridge.demand_cache`)
+moves, so it is never older than the last ingestion. Demands the index cannot
+answer (matches on children) and organizations with more than
+``DEMAND_MATCHER_MAX_PORTS`` ports are left to SQL.
+"""
+
+import array
+import bisect
+import dataclasses
+import threading
+import typing as t
+
+from django.conf import settings
+
+from bridge import demand_cache, models
+from bridge.inputs import PortDemandInput
+
+SHAPES = {
+    "args": {"force_length": "arg_count", "force_non_nullable_length": "non_nullable_arg_count", "force_structure_length": "structure_arg_count"},
+    "returns": {"force_length": "return_count", "force_non_nullable_length": "non_nullable_return_count", "force_structure_length": "structure_return_count"},
+}
+SHAPE_COLUMNS = [column for columns in SHAPES.values() for column in columns.values()]
+PROBE_RATIO = 16
+
+
+def contains(rows: array.array, row: int) -> bool:
+    index = bisect.bisect_left(rows, row)
+    return index < len(rows) and rows[index] == row
+
+
+def intersect(lists: list[t.Sequence[int]]) -> set[int]:
+    """The rows in every one of the sorted ``lists``.
+
+    A list much longer than the rows left is probed by bisection rather than
+    scanned, so a selective value is not slowed down by a common one.
+    """
+    lists = sorted(lists, key=len)
+    rows = set(lists[0])
+    for other in lists[1:]:
+        if not rows:
+            break
+        if len(other) > PROBE_RATIO * len(rows):
+            rows = {row for row in rows if contains(other, row)}
+        else:
+            rows.intersection_update(other)
+    return rows
+
+
+@dataclasses.dataclass
+class PortIndex:
+    """The ports of one organization's definitions, in flat arrays.
+
+    Definitions are numbered by their row in ``definitions``; ports by their
+    row in ``port_definition``, which holds the definition row of each port.
+    ``postings`` maps ``(direction, field, value)`` to the sorted port rows
+    with that value; ``(direction, "direction", direction)`` lists every port
+    of a direction. ``shapes`` maps ``(column, count)`` to the sorted
+    definition rows with that shape count.
+    """
+
+    generation: int
+    definitions: array.array
+    shapes: dict[tuple[str, int], array.array]
+    port_definition: array.array
+    postings: dict[tuple[str, str, t.Any], array.array]
+
+    @classmethod
+    def load(cls, organization_id: int, generation: int) -> "PortIndex | None":
+        """Read the index of an organization, or ``None`` if it has too many ports."""
+        ports = models.DefinitionPort.objects.filter(organization_id=organization_id)
+        if ports.count() > settings.DEMAND_MATCHER_MAX_PORTS:
+            return None
+
+        definitions = array.array("q")
+        shapes: dict[tuple[str, int], array.array] = {}
+        row_of = {}
+        for id, *counts in models.Definition.objects.filter(organization_id=organization_id).order_by("id").values_list("id", *SHAPE_COLUMNS):
+            row_of[id] = len(definitions)
+            for column, count in zip(SHAPE_COLUMNS, counts):
+                shapes.setdefault((column, count), array.array("l")).append(len(definitions))
+            definitions.append(id)
+
+        port_definition = array.array("l")
+        postings: dict[tuple[str, str, t.Any], array.array] = {}
+        for definition_id, direction, position, key, kind, identifier in ports.order_by("id").values_list("definition_id", "direction", "position", "key", "kind", "identifier"):
+            row = len(port_definition)
+            port_definition.append(row_of[definition_id])
+            for field, value in (("direction", direction), ("position", position), ("key", key), ("kind", kind), ("identifier", identifier)):
+                postings.setdefault((direction, field, value), array.array("l")).append(row)
+
+        return cls(generation=generation, definitions=definitions, shapes=shapes, port_definition=port_definition, postings=postings)
+
+    def match_item(self, direction: str, item: t.Any) -> set[int]:
+        """The definition rows with a port of ``direction`` satisfying ``item``."""
+        # Every posting list is per direction; the list of all ports of a
+        # direction is only needed when the item has no other condition.
+        conditions = []
+        if item.at is not None:
+            conditions.append(("position", item.at))
+        for field in ("key", "kind", "identifier"):
+            value = getattr(item, field)
+            if value:
+                conditions.append((field, getattr(value, "value", value)))
+
+        ports = intersect([self.postings.get((direction, field, value), ()) for field, value in conditions or [("direction", direction)]])
+        return {self.port_definition[port] for port in ports}
+
+    def match_demand(self, demand: PortDemandInput) -> set[int]:
+        """The definition rows meeting ``demand``."""
+        direction = demand.kind.value
+        rows: set[int] | None = None
+        for item in demand.matches or []:
+            matched = self.match_item(direction, item)
+            rows = matched if rows is None else rows & matched
+            if not rows:
+                return set()
+
+        shapes = [self.shapes.get((column, getattr(demand, force)), ()) for force, column in SHAPES[direction].items() if getattr(demand, force) is not None]
+        if shapes:
+            if rows is None:
+                rows = intersect(shapes)
+            else:
+                rows = {row for row in rows if all(contains(shape, row) for shape in shapes)}
+
+        return rows or set()
+
+    def match(self, demands: list[PortDemandInput]) -> list[int]:
+        """The IDs of the definitions meeting every demand, in ID order."""
+        rows: set[int] | None = None
+        for demand in demands:
+            matched = self.match_demand(demand)
+            rows = matched if rows is None else rows & matched
+
+        return [self.definitions[row] for row in sorted(rows or ())]
+
+
+_indexes: dict[int, PortIndex | None] = {}
+_generations: dict[int, int] = {}
+_lock = threading.Lock()
+
+
+def answerable(demands: list[PortDemandInput]) -> bool:
+    """Whether the index can evaluate ``demands`` exactly like the SQL does."""
+    if not demands:
+        return False
+
+    for demand in demands:
+        if not demand.matches and all(getattr(demand, force) is None for force in SHAPES["args"]):
+            # SQL rejects a demand without any condition.
+            return False
+        if any(item.children for item in demand.matches or []):
+            return False
+    return True
+
+
+def get_index(organization_id: int) -> PortIndex | None:
+    """The current index of an organization, loading it if the generation moved."""
+    generation = demand_cache.generation(organization_id)
+    with _lock:
+        if _generations.get(organization_id) == generation:
+            return _indexes[organization_id]
+
+        index = PortIndex.load(organization_id, generation)
+        _indexes[organization_id] = index
+        _generations[organization_id] = generation
+        return index
+
+
+def clear() -> None:
+    """Drop every loaded index."""
+    with _lock:
+        _indexes.clear()
+        _generations.clear()
+
+
+def match_port_demands(demands: list[PortDemandInput], organization_id: int) -> list[int] | None:
+    """The definitions meeting ``demands`` from memory, or ``None`` if SQL has to answer."""
+    if not settings.DEMAND_MATCHER_ENABLED or not answerable(demands):
+        return None
+
+    index = get_index(organization_id)
+    if index is None:
+        return None
+    return index.match(demands)
@@ -19,3 +19,26 @@ class PodUpdateMessage:
     status: str
     created: bool
     progress: int | None = None
+
+
+class ScanJobProgressMessageModel(BaseModel):
+    """A progress event of one repository of a scan job, pushed over a subscription."""
+
+    job: str = Field(description="The ID of the scan job this event belongs to.")
+    repo: str = Field(description="The ID of the repository that made progress.")
+    status: str = Field(description="The progress the repository reached (FETCHED, PARSED, UPSERTED, UNCHANGED or FAILED).")
+    flavours: int = Field(default=0, description="How many flavours were upserted, once the repository is UPSERTED.")
+    reason: str | None = Field(default=None, description="Why the scan failed, if it did.")
+    done: bool = Field(default=False, description="Whether this event finished the scan job.")
+
+
+@pydantic.type(ScanJobProgressMessageModel, description="A progress event of one repository of a scan job, pushed over a subscription.")
+class ScanJobProgressMessage:
+    """A progress event of one repository of a scan job, pushed over a subscription."""
+
+    job: str
+    repo: str
+    status: str
+    flavours: int = 0
+    reason: str | None = None
+    done: bool = False
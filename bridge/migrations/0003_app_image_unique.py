@@ -0,0 +1,60 @@
+# Generated by Django 6.0.6 on 2026-10-18 13:06
+#
+# Hand-edited after autogeneration: the bulk ingestion in bridge.repo.db upserts
+# App and DockerImage rows with ON CONFLICT on their natural keys, which needs a
+# real unique constraint. App declared its constraint under `class Config` (so
+# it never reached the database) and DockerImage had none, so concurrent
+# get_or_create calls may have left duplicates behind. Those are merged into the
+# oldest row first: flavours are repointed to the surviving image, releases to
+# the surviving app (a release whose version already exists on the survivor is
+# dropped with its duplicate app).
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    App = apps.get_model("bridge", "App")
+    Release = apps.get_model("bridge", "Release")
+    DockerImage = apps.get_model("bridge", "DockerImage")
+    Flavour = apps.get_model("bridge", "Flavour")
+
+    duplicated_images = DockerImage.objects.values("image_string", "organization").annotate(keep=Min("id"), count=Count("id")).filter(count__gt=1)
+    for row in duplicated_images:
+        duplicates = DockerImage.objects.filter(image_string=row["image_string"], organization=row["organization"]).exclude(id=row["keep"])
+        Flavour.objects.filter(image__in=duplicates).update(image_id=row["keep"])
+        duplicates.delete()
+
+    duplicated_apps = App.objects.values("identifier", "organization").annotate(keep=Min("id"), count=Count("id")).filter(count__gt=1)
+    for row in duplicated_apps:
+        duplicates = App.objects.filter(identifier=row["identifier"], organization=row["organization"]).exclude(id=row["keep"])
+        taken = set(Release.objects.filter(app_id=row["keep"]).values_list("version", flat=True))
+        for duplicate in duplicates.order_by("id"):
+            moved = Release.objects.filter(app=duplicate).exclude(version__in=taken)
+            taken.update(moved.values_list("version", flat=True))
+            moved.update(app_id=row["keep"])
+        duplicates.delete()
+
+
+def noop_reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentikate', '0006_alter_app_identifier_alter_release_unique_together'),
+        ('bridge', '0002_collection_organization_definition_organization_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, noop_reverse),
+        migrations.AddConstraint(
+            model_name='app',
+            constraint=models.UniqueConstraint(fields=('identifier', 'organization'), name='Unique app for org'),
+        ),
+        migrations.AddConstraint(
+            model_name='dockerimage',
+            constraint=models.UniqueConstraint(fields=('image_string', 'organization'), name='Unique image for org'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.6 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bridge', '0003_app_image_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='githubrepo',
+            name='config_digest',
+            field=models.CharField(blank=True, help_text='The sha256 of the last ingested deployments.yaml', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='githubrepo',
+            name='config_etag',
+            field=models.CharField(blank=True, help_text='The ETag of the last ingested deployments.yaml', max_length=1000, null=True),
+        ),
+        migrations.AddField(
+            model_name='githubrepo',
+            name='config_last_modified',
+            field=models.CharField(blank=True, help_text='The Last-Modified header of the last ingested deployments.yaml', max_length=100, null=True),
+        ),
+    ]
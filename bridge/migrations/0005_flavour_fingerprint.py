@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-18 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bridge', '0004_githubrepo_config_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flavour',
+            name='fingerprint',
+            field=models.CharField(blank=True, help_text='The sha256 of the app image this flavour was last ingested from', max_length=64, null=True),
+        ),
+    ]
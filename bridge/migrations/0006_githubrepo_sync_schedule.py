@@ -0,0 +1,38 @@
+# Generated by Django 6.0.6 on 2026-10-18 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bridge', '0005_flavour_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='githubrepo',
+            name='last_sync_error',
+            field=models.TextField(blank=True, help_text='Why the last scan failed, if it did', null=True),
+        ),
+        migrations.AddField(
+            model_name='githubrepo',
+            name='last_synced_at',
+            field=models.DateTimeField(blank=True, help_text='When this repository was last scanned successfully', null=True),
+        ),
+        migrations.AddField(
+            model_name='githubrepo',
+            name='next_sync_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='When the sync worker should scan this repository next', null=True),
+        ),
+        migrations.AddField(
+            model_name='githubrepo',
+            name='sync_failures',
+            field=models.PositiveIntegerField(default=0, help_text='How many scans in a row failed'),
+        ),
+        migrations.AddField(
+            model_name='githubrepo',
+            name='sync_requested_at',
+            field=models.DateTimeField(blank=True, help_text='When a priority sync was requested, if one is pending', null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.6 on 2026-10-18 13:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentikate', '0006_alter_app_identifier_alter_release_unique_together'),
+        ('bridge', '0006_githubrepo_sync_schedule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(default='QUEUED', help_text='Whether the job is queued, running or done', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, help_text='When the last repository of the job was scanned', null=True)),
+                ('creator', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scan_jobs', to='authentikate.organization')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ScanJobRepo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(default='QUEUED', help_text='How far the scan of this repository got', max_length=100)),
+                ('flavours', models.PositiveIntegerField(default=0, help_text='How many flavours the scan upserted')),
+                ('reason', models.TextField(blank=True, help_text='Why the scan failed, if it did', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='repos', to='bridge.scanjob')),
+                ('repo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scan_job_entries', to='bridge.githubrepo')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('job', 'repo'), name='Unique repo per scan job')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0.6 on 2026-10-18 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bridge', '0007_scanjob'),
+        ('datalayer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Logo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(help_text="The sha256 of the logo's content", max_length=64, unique=True)),
+                ('content_type', models.CharField(blank=True, max_length=255, null=True)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('store', models.ForeignKey(blank=True, help_text='Where the content is stored, if the media datalayer is configured', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='logos', to='datalayer.mediastore')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='release',
+            name='stored_logo',
+            field=models.ForeignKey(blank=True, help_text='The content-addressed copy of the original logo', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='releases', to='bridge.logo'),
+        ),
+        migrations.CreateModel(
+            name='LogoSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.CharField(max_length=2000, unique=True)),
+                ('etag', models.CharField(blank=True, max_length=1000, null=True)),
+                ('last_modified', models.CharField(blank=True, max_length=100, null=True)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+                ('logo', models.ForeignKey(help_text='The content last served at this url', on_delete=django.db.models.deletion.CASCADE, related_name='sources', to='bridge.logo')),
+            ],
+        ),
+    ]
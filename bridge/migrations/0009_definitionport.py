@@ -0,0 +1,80 @@
+# Generated by Django 6.0.6 on 2026-10-18 13:58
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def unnest_ports(apps, schema_editor):
+    Definition = apps.get_model("bridge", "Definition")
+    DefinitionPort = apps.get_model("bridge", "DefinitionPort")
+
+    batch = []
+    for definition in Definition.objects.only("id", "args", "returns").iterator(chunk_size=2000):
+        for direction, ports in (("args", definition.args), ("returns", definition.returns)):
+            for position, port in enumerate(ports or []):
+                children = port.get("children") or []
+                batch.append(
+                    DefinitionPort(
+                        definition_id=definition.id,
+                        direction=direction,
+                        position=position,
+                        key=port.get("key") or "",
+                        kind=port.get("kind") or "",
+                        identifier=port.get("identifier"),
+                        nullable=bool(port.get("nullable")),
+                        child_kinds=[child.get("kind") or "" for child in children],
+                        children=children,
+                    )
+                )
+        if len(batch) >= 5000:
+            DefinitionPort.objects.bulk_create(batch)
+            batch = []
+
+    DefinitionPort.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bridge', '0008_release_logo_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DefinitionPort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('direction', models.CharField(help_text='Whether this is one of the ``args`` or the ``returns`` of the definition', max_length=10)),
+                ('position', models.PositiveIntegerField(help_text='The (zero-based) position of the port in its direction')),
+                ('key', models.CharField(max_length=1000)),
+                ('kind', models.CharField(max_length=100)),
+                ('identifier', models.CharField(blank=True, max_length=1000, null=True)),
+                ('nullable', models.BooleanField(default=False)),
+                ('child_kinds', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=100), blank=True, default=list, help_text="The kinds of the port's children, in order")),
+                ('children', models.JSONField(default=list, help_text="The port's children, as declared")),
+            ],
+        ),
+        migrations.AddField(
+            model_name='definitionport',
+            name='definition',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ports', to='bridge.definition'),
+        ),
+        migrations.AddIndex(
+            model_name='definitionport',
+            index=models.Index(fields=['direction', 'kind', 'identifier'], name='port_direction_kind_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='definitionport',
+            index=models.Index(fields=['direction', 'identifier'], name='port_direction_identifier_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='definitionport',
+            index=models.Index(fields=['direction', 'key'], name='port_direction_key_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='definitionport',
+            constraint=models.UniqueConstraint(fields=('definition', 'direction', 'position'), name='Unique port position per definition'),
+        ),
+        migrations.RunPython(unnest_ports, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.6 on 2026-10-18 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentikate', '0006_alter_app_identifier_alter_release_unique_together'),
+        ('bridge', '0009_definitionport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='definitionport',
+            name='organization',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='authentikate.organization'),
+        ),
+        migrations.RunSQL(
+            "UPDATE bridge_definitionport p SET organization_id = d.organization_id FROM bridge_definition d WHERE d.id = p.definition_id",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='definitionport',
+            name='organization',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='authentikate.organization'),
+        ),
+        migrations.RemoveIndex(
+            model_name='definitionport',
+            name='port_direction_kind_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='definitionport',
+            name='port_direction_identifier_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='definitionport',
+            name='port_direction_key_idx',
+        ),
+        migrations.AddIndex(
+            model_name='definitionport',
+            index=models.Index(fields=['organization', 'direction', 'kind', 'identifier'], name='port_org_kind_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='definitionport',
+            index=models.Index(fields=['organization', 'direction', 'identifier'], name='port_org_identifier_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='definitionport',
+            index=models.Index(fields=['organization', 'direction', 'key'], name='port_org_key_idx'),
+        ),
+    ]
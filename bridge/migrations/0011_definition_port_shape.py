@@ -0,0 +1,75 @@
+# Generated by Django 6.0.6 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+def count_ports(column: str, condition: str = "TRUE") -> str:
+    return f"(SELECT COUNT(*) FROM jsonb_array_elements({column}) AS port WHERE {condition})"
+
+
+NOT_NULLABLE = "NOT COALESCE((port->>'nullable')::boolean, FALSE)"
+STRUCTURE = "port->>'kind' = 'STRUCTURE'"
+
+BACKFILL_SHAPE = f"""
+UPDATE bridge_definition SET
+    arg_count = jsonb_array_length(args),
+    return_count = jsonb_array_length(returns),
+    non_nullable_arg_count = {count_ports("args", NOT_NULLABLE)},
+    non_nullable_return_count = {count_ports("returns", NOT_NULLABLE)},
+    structure_arg_count = {count_ports("args", STRUCTURE)},
+    structure_return_count = {count_ports("returns", STRUCTURE)}
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentikate', '0006_alter_app_identifier_alter_release_unique_together'),
+        ('bridge', '0010_definitionport_organization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='definition',
+            name='arg_count',
+            field=models.PositiveIntegerField(default=0, help_text='The number of args'),
+        ),
+        migrations.AddField(
+            model_name='definition',
+            name='non_nullable_arg_count',
+            field=models.PositiveIntegerField(default=0, help_text='The number of args that are not nullable'),
+        ),
+        migrations.AddField(
+            model_name='definition',
+            name='non_nullable_return_count',
+            field=models.PositiveIntegerField(default=0, help_text='The number of returns that are not nullable'),
+        ),
+        migrations.AddField(
+            model_name='definition',
+            name='return_count',
+            field=models.PositiveIntegerField(default=0, help_text='The number of returns'),
+        ),
+        migrations.AddField(
+            model_name='definition',
+            name='structure_arg_count',
+            field=models.PositiveIntegerField(default=0, help_text='The number of args that are structures'),
+        ),
+        migrations.AddField(
+            model_name='definition',
+            name='structure_return_count',
+            field=models.PositiveIntegerField(default=0, help_text='The number of returns that are structures'),
+        ),
+        migrations.RunSQL(BACKFILL_SHAPE, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='definition',
+            index=models.Index(fields=['organization', 'arg_count', 'return_count'], name='definition_org_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='definition',
+            index=models.Index(fields=['organization', 'non_nullable_arg_count'], name='definition_org_non_null_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='definition',
+            index=models.Index(fields=['organization', 'structure_arg_count'], name='definition_org_structure_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.6 on 2026-10-18 14:18
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+TRIGRAM_INDEXES = [
+    ('app', django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('identifier'), name='gin_trgm_ops'), name='app_identifier_trgm_idx')),
+    ('definition', django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='definition_name_trgm_idx')),
+    ('flavour', django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='flavour_name_trgm_idx')),
+    ('repo', django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='repo_name_trgm_idx')),
+]
+
+
+def trigram_available(schema_editor) -> bool:
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm')")
+        return cursor.fetchone()[0]
+
+
+def add_trigram_indexes(apps, schema_editor):
+    # Servers without the contrib extensions still migrate; search then falls
+    # back to full-text and substring matching (see bridge.search).
+    if not trigram_available(schema_editor):
+        return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for model_name, index in TRIGRAM_INDEXES:
+        schema_editor.add_index(apps.get_model('bridge', model_name), index)
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    for model_name, index in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(index.name)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentikate', '0006_alter_app_identifier_alter_release_unique_together'),
+        ('bridge', '0011_definition_port_shape'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='definition',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('name', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('description', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), help_text='The weighted full-text document of the name and description', output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='definition',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='definition_search_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name=model_name, index=index) for model_name, index in TRIGRAM_INDEXES],
+            database_operations=[migrations.RunPython(add_trigram_indexes, remove_trigram_indexes)],
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.6 on 2026-10-18 14:23
+
+from django.db import migrations, models
+
+
+def signature_of(port: dict) -> str:
+    signature = port.get("kind") or ""
+    if port.get("identifier"):
+        signature += f":{port['identifier']}"
+    if port.get("children"):
+        signature += "<" + ",".join(signature_of(child) for child in port["children"]) + ">"
+    return signature
+
+
+def sign_ports(apps, schema_editor):
+    DefinitionPort = apps.get_model("bridge", "DefinitionPort")
+
+    batch = []
+    for port in DefinitionPort.objects.only("id", "kind", "identifier", "children").iterator(chunk_size=2000):
+        port.signature = signature_of({"kind": port.kind, "identifier": port.identifier, "children": port.children})
+        batch.append(port)
+        if len(batch) >= 5000:
+            DefinitionPort.objects.bulk_update(batch, ["signature"])
+            batch = []
+
+    DefinitionPort.objects.bulk_update(batch, ["signature"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentikate', '0006_alter_app_identifier_alter_release_unique_together'),
+        ('bridge', '0012_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='definitionport',
+            name='signature',
+            field=models.TextField(default='', help_text='The structure of the port (kind, identifier and children); ports of equal signature are compatible'),
+        ),
+        migrations.RunPython(sign_ports, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='definitionport',
+            index=models.Index(fields=['organization', 'direction', 'signature'], name='port_org_signature_idx'),
+        ),
+    ]
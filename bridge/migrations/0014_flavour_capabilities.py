@@ -0,0 +1,115 @@
+# Generated by Django 6.0.6 on 2026-10-18 14:54
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import re
+
+from django.db import migrations, models
+
+# A frozen copy of bridge.scoring.capabilities as of this migration.
+MINIMUMS = {
+    "cuda": {"cuda_version": "min_cuda_version", "cuda_cores": "min_cuda_cores"},
+    "rocm": {"api_version": "min_rocm_version"},
+    "oneapi": {"oneapi_version": "min_oneapi_version"},
+    "cpu": {"min_count": "min_cpu_count", "frequency": "min_frequency", "memory": "min_memory"},
+    "ram": {"min": "min_memory"},
+}
+VERSIONS = {"min_cuda_version", "min_rocm_version", "min_oneapi_version"}
+COLUMNS = ["min_cuda_version", "min_cuda_cores", "min_rocm_version", "min_oneapi_version", "min_cpu_count", "min_frequency", "min_memory"]
+
+
+def level(value):
+    if isinstance(value, str):
+        return tuple(int(part) for part in re.findall(r"\d+", value))
+    return (value,)
+
+
+def capabilities(selectors):
+    kinds, minimums = set(), {}
+    for selector in selectors:
+        if not selector.get("required", True):
+            continue
+        kinds.add(selector["kind"])
+        for field, column in MINIMUMS.get(selector["kind"], {}).items():
+            if selector.get(field) is not None:
+                minimums[column] = max(minimums.get(column, level(selector[field])), level(selector[field]))
+
+    values = {"required_kinds": sorted(kinds)}
+    for column in COLUMNS:
+        minimum = minimums.get(column)
+        values[column] = None if minimum is None else list(minimum) if column in VERSIONS else (minimum[0] if minimum else None)
+    return values
+
+
+def compile_flavours(apps, schema_editor):
+    Flavour = apps.get_model("bridge", "Flavour")
+
+    batch = []
+    for flavour in Flavour.objects.only("id", "selectors").iterator(chunk_size=2000):
+        for column, value in capabilities(flavour.selectors).items():
+            setattr(flavour, column, value)
+        batch.append(flavour)
+        if len(batch) >= 5000:
+            Flavour.objects.bulk_update(batch, ["required_kinds", *COLUMNS])
+            batch = []
+
+    Flavour.objects.bulk_update(batch, ["required_kinds", *COLUMNS])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bridge', '0013_definitionport_signature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flavour',
+            name='min_cpu_count',
+            field=models.IntegerField(blank=True, help_text='The fewest CPUs the required selectors accept', null=True),
+        ),
+        migrations.AddField(
+            model_name='flavour',
+            name='min_cuda_cores',
+            field=models.IntegerField(blank=True, help_text='The fewest CUDA cores the required selectors accept', null=True),
+        ),
+        migrations.AddField(
+            model_name='flavour',
+            name='min_cuda_version',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, help_text='The lowest CUDA version the required selectors accept', null=True),
+        ),
+        migrations.AddField(
+            model_name='flavour',
+            name='min_frequency',
+            field=models.FloatField(blank=True, help_text='The lowest CPU frequency, in MHz, the required selectors accept', null=True),
+        ),
+        migrations.AddField(
+            model_name='flavour',
+            name='min_memory',
+            field=models.IntegerField(blank=True, help_text='The least memory, in MB, the required selectors accept', null=True),
+        ),
+        migrations.AddField(
+            model_name='flavour',
+            name='min_oneapi_version',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, help_text='The lowest oneAPI version the required selectors accept', null=True),
+        ),
+        migrations.AddField(
+            model_name='flavour',
+            name='min_rocm_version',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, help_text='The lowest ROCm API version the required selectors accept', null=True),
+        ),
+        migrations.AddField(
+            model_name='flavour',
+            name='required_kinds',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=100), default=list, help_text='The kinds of the required selectors'),
+        ),
+        migrations.RunPython(compile_flavours, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='flavour',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['required_kinds'], name='flavour_required_kinds_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flavour',
+            index=models.Index(fields=['release', 'min_cuda_version', 'min_memory'], name='flavour_release_min_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 6.0.6 on 2026-10-18 15:01
+
+import re
+
+from django.db import migrations, models
+
+# A frozen copy of bridge.versions.parse as of this migration.
+version_re = re.compile(r"^v?(?P<major>\d+)(?:\.(?P<minor>\d+))?(?:\.(?P<patch>\d+))?(?:-(?P<prerelease>[0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$")
+COLUMNS = ["version_major", "version_minor", "version_patch", "version_prerelease"]
+
+
+def parse_versions(apps, schema_editor):
+    Release = apps.get_model("bridge", "Release")
+
+    batch = []
+    for release in Release.objects.only("id", "version").iterator(chunk_size=2000):
+        match = version_re.match(release.version.strip())
+        if match is None:
+            continue
+        release.version_major = int(match["major"])
+        release.version_minor = int(match["minor"] or 0)
+        release.version_patch = int(match["patch"] or 0)
+        release.version_prerelease = match["prerelease"]
+        batch.append(release)
+        if len(batch) >= 5000:
+            Release.objects.bulk_update(batch, COLUMNS)
+            batch = []
+
+    Release.objects.bulk_update(batch, COLUMNS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bridge', '0014_flavour_capabilities'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='release',
+            name='version_major',
+            field=models.PositiveIntegerField(blank=True, help_text='The major part of the (semver) version', null=True),
+        ),
+        migrations.AddField(
+            model_name='release',
+            name='version_minor',
+            field=models.PositiveIntegerField(blank=True, help_text='The minor part of the (semver) version', null=True),
+        ),
+        migrations.AddField(
+            model_name='release',
+            name='version_patch',
+            field=models.PositiveIntegerField(blank=True, help_text='The patch part of the (semver) version', null=True),
+        ),
+        migrations.AddField(
+            model_name='release',
+            name='version_prerelease',
+            field=models.CharField(blank=True, help_text='The prerelease tag of the (semver) version, if any', max_length=400, null=True),
+        ),
+        migrations.RunPython(parse_versions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='release',
+            index=models.Index(fields=['app', 'version_major', 'version_minor', 'version_patch'], name='release_app_semver_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 6.0.6 on 2026-10-18 15:28
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def unnest_ports(apps, schema_editor):
+    StateDefinition = apps.get_model("bridge", "StateDefinition")
+    StateDefinitionPort = apps.get_model("bridge", "StateDefinitionPort")
+
+    batch = []
+    for state in StateDefinition.objects.only("id", "organization_id", "ports").iterator(chunk_size=2000):
+        for position, port in enumerate(state.ports or []):
+            children = port.get("children") or []
+            batch.append(
+                StateDefinitionPort(
+                    state_id=state.id,
+                    organization_id=state.organization_id,
+                    position=position,
+                    key=port.get("key") or "",
+                    kind=port.get("kind") or "",
+                    identifier=port.get("identifier"),
+                    nullable=bool(port.get("nullable")),
+                    child_kinds=[child.get("kind") or "" for child in children],
+                    children=children,
+                )
+            )
+        if len(batch) >= 5000:
+            StateDefinitionPort.objects.bulk_create(batch)
+            batch = []
+
+    StateDefinitionPort.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentikate', '0006_alter_app_identifier_alter_release_unique_together'),
+        ('bridge', '0015_release_semver'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StateDefinitionPort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(help_text='The (zero-based) position of the port')),
+                ('key', models.CharField(max_length=1000)),
+                ('kind', models.CharField(max_length=100)),
+                ('identifier', models.CharField(blank=True, max_length=1000, null=True)),
+                ('nullable', models.BooleanField(default=False)),
+                ('child_kinds', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=100), blank=True, default=list, help_text="The kinds of the port's children, in order")),
+                ('children', models.JSONField(default=list, help_text="The port's children, as declared")),
+                ('organization', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='authentikate.organization')),
+                ('state', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='port_rows', to='bridge.statedefinition')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['organization', 'kind', 'identifier'], name='state_port_org_kind_idx'), models.Index(fields=['organization', 'identifier'], name='state_port_org_identifier_idx'), models.Index(fields=['organization', 'key'], name='state_port_org_key_idx')],
+                'constraints': [models.UniqueConstraint(fields=('state', 'position'), name='Unique port position per state')],
+            },
+        ),
+        migrations.RunPython(unnest_ports, migrations.RunPython.noop),
+    ]
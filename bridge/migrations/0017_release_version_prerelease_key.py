@@ -0,0 +1,39 @@
+# Generated by Django 6.0.6 on 2026-10-18 15:36
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+# A frozen copy of bridge.versions.prerelease_key as of this migration.
+def prerelease_key(prerelease):
+    return [f"0{len(part):03d}{part}" if part.isdigit() else f"1{part}" for part in prerelease.split(".")]
+
+
+def key_prereleases(apps, schema_editor):
+    Release = apps.get_model("bridge", "Release")
+
+    batch = []
+    for release in Release.objects.filter(version_prerelease__isnull=False).only("id", "version_prerelease").iterator(chunk_size=2000):
+        release.version_prerelease_key = prerelease_key(release.version_prerelease)
+        batch.append(release)
+        if len(batch) >= 5000:
+            Release.objects.bulk_update(batch, ["version_prerelease_key"])
+            batch = []
+
+    Release.objects.bulk_update(batch, ["version_prerelease_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bridge', '0016_statedefinitionport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='release',
+            name='version_prerelease_key',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(db_collation='C', max_length=400), blank=True, help_text='The identifiers of the prerelease tag, encoded to order by semver precedence', null=True),
+        ),
+        migrations.RunPython(key_prereleases, migrations.RunPython.noop),
+    ]
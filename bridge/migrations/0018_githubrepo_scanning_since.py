@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bridge', '0017_release_version_prerelease_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='githubrepo',
+            name='scanning_since',
+            field=models.DateTimeField(blank=True, help_text='When a sync worker claimed this repository, if its scan is in flight', null=True),
+        ),
+    ]
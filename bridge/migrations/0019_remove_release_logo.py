@@ -0,0 +1,17 @@
+# Generated by Django 6.0.6 on 2026-10-18 15:51
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bridge', '0018_githubrepo_scanning_since'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='release',
+            name='logo',
+        ),
+    ]
@@ -1,4 +1,8 @@
 from django.db import models
+from django.db.models.functions import Upper
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.contrib.auth import get_user_model
 import uuid
 from bridge.fields import S3Field
@@ -6,15 +10,24 @@ from bridge.datalayer import Datalayer
 from django.conf import settings
 
 # Create your models here.
+from bridge import scoring, versions
 from bridge.repo import selectors as rselectors
 from typing import List
 from authentikate.models import Client, Organization
 
 
+def trigram_index(field: str, name: str) -> GinIndex:
+    """A trigram index on ``UPPER(field)``, serving ``icontains`` and fuzzy matches (see bridge.search)."""
+    return GinIndex(OpClass(Upper(field), name="gin_trgm_ops"), name=name)
+
+
 class Repo(models.Model):
     name = models.CharField(max_length=400)
     created_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [trigram_index("name", "repo_name_trgm_idx")]
+
     def __str__(self) -> str:
         return self.name
 
@@ -30,21 +43,30 @@ class GithubRepo(Repo):
     updated_at = models.DateTimeField(auto_now=True)
     added_at = models.DateTimeField(auto_now_add=True)
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="repos")
+    config_etag = models.CharField(max_length=1000, null=True, blank=True, help_text="The ETag of the last ingested deployments.yaml")
+    config_last_modified = models.CharField(max_length=100, null=True, blank=True, help_text="The Last-Modified header of the last ingested deployments.yaml")
+    config_digest = models.CharField(max_length=64, null=True, blank=True, help_text="The sha256 of the last ingested deployments.yaml")
+    next_sync_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text="When the sync worker should scan this repository next")
+    sync_requested_at = models.DateTimeField(null=True, blank=True, help_text="When a priority sync was requested, if one is pending")
+    scanning_since = models.DateTimeField(null=True, blank=True, help_text="When a sync worker claimed this repository, if its scan is in flight")
+    last_synced_at = models.DateTimeField(null=True, blank=True, help_text="When this repository was last scanned successfully")
+    sync_failures = models.PositiveIntegerField(default=0, help_text="How many scans in a row failed")
+    last_sync_error = models.TextField(null=True, blank=True, help_text="Why the last scan failed, if it did")
 
     def __str__(self) -> str:
         return f"{self.user}/{self.repo}:{self.branch}"
 
     @property
     def pyproject_url(self) -> str:
-        return f"https://raw.githubusercontent.com/{self.user}/{self.repo}/{self.branch}/pyproject.toml"
+        return f"{settings.GITHUB_RAW_URL}/{self.user}/{self.repo}/{self.branch}/pyproject.toml"
 
     @property
     def readme_url(self) -> str:
-        return f"https://raw.githubusercontent.com/{self.user}/{self.repo}/{self.branch}/README.md"
+        return f"{settings.GITHUB_RAW_URL}/{self.user}/{self.repo}/{self.branch}/README.md"
 
     @property
     def manifest_url(self) -> str:
-        return f"https://raw.githubusercontent.com/{self.user}/{self.repo}/{self.branch}/.arkitekt-next/manifest.yaml"
+        return f"{settings.GITHUB_RAW_URL}/{self.user}/{self.repo}/{self.branch}/.arkitekt-next/manifest.yaml"
 
     @property
     def issue_url(self) -> str:
@@ -56,18 +78,42 @@ class GithubRepo(Repo):
 
     @classmethod
     def build_kabinet_url(cls, user: str, repo: str, branch: str) -> str:
-        return f"https://raw.githubusercontent.com/{user}/{repo}/{branch}/.arkitekt_next/deployments.yaml"
+        return f"{settings.GITHUB_RAW_URL}/{user}/{repo}/{branch}/.arkitekt_next/deployments.yaml"
 
     class Config:
         constraints = [models.UniqueConstraint(fields=["repo", "user", "branch", "organization"], name="Unique repo for url")]
 
 
+class ScanJob(models.Model):
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="scan_jobs")
+    creator = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=100, default="QUEUED", help_text="Whether the job is queued, running or done")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True, help_text="When the last repository of the job was scanned")
+
+    class Meta:
+        ordering = ["-created_at"]
+
+
+class ScanJobRepo(models.Model):
+    job = models.ForeignKey(ScanJob, on_delete=models.CASCADE, related_name="repos")
+    repo = models.ForeignKey(GithubRepo, on_delete=models.CASCADE, related_name="scan_job_entries")
+    status = models.CharField(max_length=100, default="QUEUED", help_text="How far the scan of this repository got")
+    flavours = models.PositiveIntegerField(default=0, help_text="How many flavours the scan upserted")
+    reason = models.TextField(null=True, blank=True, help_text="Why the scan failed, if it did")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["job", "repo"], name="Unique repo per scan job")]
+
+
 class App(models.Model):
     identifier = models.CharField(max_length=4000)
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="apps")
 
-    class Config:
+    class Meta:
         constraints = [models.UniqueConstraint(fields=["identifier", "organization"], name="Unique app for org")]
+        indexes = [trigram_index("identifier", "app_identifier_trgm_idx")]
 
 
 class S3Store(models.Model):
@@ -108,18 +154,51 @@ class MediaStore(S3Store):
         self.save()
 
 
+class Logo(models.Model):
+    digest = models.CharField(max_length=64, unique=True, help_text="The sha256 of the logo's content")
+    content_type = models.CharField(max_length=255, null=True, blank=True)
+    size = models.PositiveIntegerField(default=0)
+    store = models.ForeignKey("datalayer.MediaStore", on_delete=models.SET_NULL, null=True, blank=True, related_name="logos", help_text="Where the content is stored, if the media datalayer is configured")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class LogoSource(models.Model):
+    url = models.CharField(max_length=2000, unique=True)
+    logo = models.ForeignKey(Logo, on_delete=models.CASCADE, related_name="sources", help_text="The content last served at this url")
+    etag = models.CharField(max_length=1000, null=True, blank=True)
+    last_modified = models.CharField(max_length=100, null=True, blank=True)
+    fetched_at = models.DateTimeField(auto_now=True)
+
+
 class Release(models.Model):
     app = models.ForeignKey(App, on_delete=models.CASCADE, related_name="releases")
     version = models.CharField(max_length=400)
+    # Parsed from the version on ingestion (see bridge.versions); NULL if it is not semver.
+    version_major = models.PositiveIntegerField(null=True, blank=True, help_text="The major part of the (semver) version")
+    version_minor = models.PositiveIntegerField(null=True, blank=True, help_text="The minor part of the (semver) version")
+    version_patch = models.PositiveIntegerField(null=True, blank=True, help_text="The patch part of the (semver) version")
+    version_prerelease = models.CharField(max_length=400, null=True, blank=True, help_text="The prerelease tag of the (semver) version, if any")
+    version_prerelease_key = ArrayField(
+        models.CharField(max_length=400, db_collation="C"),
+        null=True,
+        blank=True,
+        help_text="The identifiers of the prerelease tag, encoded to order by semver precedence",
+    )
     scopes = models.JSONField(default=list)
-    logo = models.ForeignKey(MediaStore, on_delete=models.CASCADE, related_name="releases", null=True, blank=True)
     original_logo = models.CharField(max_length=1000, null=True, blank=True, help_text="The original logo url")
+    stored_logo = models.ForeignKey(Logo, on_delete=models.SET_NULL, null=True, blank=True, related_name="releases", help_text="The content-addressed copy of the original logo")
     entrypoint = models.CharField(max_length=4000, default="app")
     released_at = models.DateTimeField(auto_now_add=True, help_text="When this release was created")
     created_at = models.DateTimeField(auto_now=True, help_text="When this release was created")
 
     class Meta:
         constraints = [models.UniqueConstraint(fields=["app", "version"], name="Unique release for version")]
+        indexes = [models.Index(fields=["app", "version_major", "version_minor", "version_patch"], name="release_app_semver_idx")]
+
+    @staticmethod
+    def version_columns(version: str) -> dict:
+        """The version columns of a release with this version."""
+        return versions.parse(version)
 
 
 class DockerImage(models.Model):
@@ -129,6 +208,9 @@ class DockerImage(models.Model):
     created_at = models.DateTimeField(auto_now=True)
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["image_string", "organization"], name="Unique image for org")]
+
 
 class Flavour(models.Model):
     release = models.ForeignKey(Release, on_delete=models.CASCADE, related_name="flavours")
@@ -136,6 +218,15 @@ class Flavour(models.Model):
     deployment_id = models.CharField(max_length=400, default=uuid.uuid4)
     flavour = models.CharField(max_length=400, default="vanilla")
     selectors = models.JSONField(default=list)
+    # Compiled from the required selectors on ingestion (see bridge.scoring.capabilities).
+    required_kinds = ArrayField(models.CharField(max_length=100), default=list, help_text="The kinds of the required selectors")
+    min_cuda_version = ArrayField(models.IntegerField(), null=True, blank=True, help_text="The lowest CUDA version the required selectors accept")
+    min_cuda_cores = models.IntegerField(null=True, blank=True, help_text="The fewest CUDA cores the required selectors accept")
+    min_rocm_version = ArrayField(models.IntegerField(), null=True, blank=True, help_text="The lowest ROCm API version the required selectors accept")
+    min_oneapi_version = ArrayField(models.IntegerField(), null=True, blank=True, help_text="The lowest oneAPI version the required selectors accept")
+    min_cpu_count = models.IntegerField(null=True, blank=True, help_text="The fewest CPUs the required selectors accept")
+    min_frequency = models.FloatField(null=True, blank=True, help_text="The lowest CPU frequency, in MHz, the required selectors accept")
+    min_memory = models.IntegerField(null=True, blank=True, help_text="The least memory, in MB, the required selectors accept")
     repo = models.ForeignKey(Repo, on_delete=models.CASCADE, related_name="flavours")
     image = models.ForeignKey(DockerImage, on_delete=models.CASCADE, related_name="flavours")
     builder = models.CharField(max_length=400)
@@ -144,15 +235,26 @@ class Flavour(models.Model):
     deployed_at = models.DateTimeField(null=True)
     manifest = models.JSONField(default=dict)
     requirements = models.JSONField(default=dict)
+    fingerprint = models.CharField(max_length=64, null=True, blank=True, help_text="The sha256 of the app image this flavour was last ingested from")
 
     class Meta:
         constraints = [models.UniqueConstraint(fields=["release", "name"], name="Unique flavour for release")]
+        indexes = [
+            trigram_index("name", "flavour_name_trgm_idx"),
+            GinIndex(fields=["required_kinds"], name="flavour_required_kinds_idx"),
+            models.Index(fields=["release", "min_cuda_version", "min_memory"], name="flavour_release_min_idx"),
+        ]
         ordering = ["-created_at"]
 
     def get_selectors(self) -> List[rselectors.Selector]:
         field_json = rselectors.SelectorFieldJson(**{"selectors": self.selectors})
         return field_json.selectors
 
+    @staticmethod
+    def capabilities(selectors: list[dict]) -> dict:
+        """The capability columns of a flavour with these stored selectors."""
+        return scoring.capabilities(selectors)
+
 
 class Collection(models.Model):
     name = models.CharField(max_length=1000, help_text="The name of this Collection")
@@ -237,12 +339,114 @@ class Definition(models.Model):
     args = models.JSONField(default=list, help_text="Inputs for this Action")
     returns = models.JSONField(default=list, help_text="Outputs for this Action")
 
+    # The shape of args and returns, precomputed (see port_shape) so that the
+    # length demands are plain equality checks.
+    arg_count = models.PositiveIntegerField(default=0, help_text="The number of args")
+    return_count = models.PositiveIntegerField(default=0, help_text="The number of returns")
+    non_nullable_arg_count = models.PositiveIntegerField(default=0, help_text="The number of args that are not nullable")
+    non_nullable_return_count = models.PositiveIntegerField(default=0, help_text="The number of returns that are not nullable")
+    structure_arg_count = models.PositiveIntegerField(default=0, help_text="The number of args that are structures")
+    structure_return_count = models.PositiveIntegerField(default=0, help_text="The number of returns that are structures")
+
+    search_vector = models.GeneratedField(
+        expression=SearchVector("name", weight="A", config="english") + SearchVector("description", weight="B", config="english"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+        help_text="The weighted full-text document of the name and description",
+    )
+
     class Meta:
         constraints = [models.UniqueConstraint(fields=["hash", "organization"], name="Unique definition for org")]
+        indexes = [
+            models.Index(fields=["organization", "arg_count", "return_count"], name="definition_org_count_idx"),
+            models.Index(fields=["organization", "non_nullable_arg_count"], name="definition_org_non_null_idx"),
+            models.Index(fields=["organization", "structure_arg_count"], name="definition_org_structure_idx"),
+            GinIndex(fields=["search_vector"], name="definition_search_idx"),
+            trigram_index("name", "definition_name_trgm_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.name}"
 
+    @staticmethod
+    def port_shape(args: list[dict], returns: list[dict]) -> dict[str, int]:
+        """The shape columns of a definition with these port dicts."""
+        shape = {}
+        for name, ports in (("arg", args), ("return", returns)):
+            shape[f"{name}_count"] = len(ports)
+            shape[f"non_nullable_{name}_count"] = sum(1 for port in ports if not port.get("nullable"))
+            shape[f"structure_{name}_count"] = sum(1 for port in ports if port["kind"] == "STRUCTURE")
+        return shape
+
+
+class DefinitionPort(models.Model):
+    """One port of a definition, unnested from its ``args`` or ``returns``.
+
+    Maintained on ingestion and whenever a definition is saved (see
+    bridge.signals), so that port demands (see bridge.managers) are answered
+    by index lookups on the matching ports instead of unnesting the ports of
+    every definition.
+    """
+
+    definition = models.ForeignKey(Definition, on_delete=models.CASCADE, related_name="ports")
+    # Denormalized from the definition, so demands are matched within one tenant's ports.
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="+", db_index=False)
+    direction = models.CharField(max_length=10, help_text="Whether this is one of the ``args`` or the ``returns`` of the definition")
+    position = models.PositiveIntegerField(help_text="The (zero-based) position of the port in its direction")
+    key = models.CharField(max_length=1000)
+    kind = models.CharField(max_length=100)
+    identifier = models.CharField(max_length=1000, null=True, blank=True)
+    nullable = models.BooleanField(default=False)
+    child_kinds = ArrayField(models.CharField(max_length=100), default=list, blank=True, help_text="The kinds of the port's children, in order")
+    children = models.JSONField(default=list, help_text="The port's children, as declared")
+    signature = models.TextField(default="", help_text="The structure of the port (kind, identifier and children); ports of equal signature are compatible")
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["definition", "direction", "position"], name="Unique port position per definition")]
+        indexes = [
+            models.Index(fields=["organization", "direction", "kind", "identifier"], name="port_org_kind_idx"),
+            models.Index(fields=["organization", "direction", "identifier"], name="port_org_identifier_idx"),
+            models.Index(fields=["organization", "direction", "key"], name="port_org_key_idx"),
+            models.Index(fields=["organization", "direction", "signature"], name="port_org_signature_idx"),
+        ]
+
+    @staticmethod
+    def signature_of(port: dict) -> str:
+        """The structural signature of a port dict, e.g. ``LIST<STRUCTURE:@mikro/image>``."""
+        kind = port["kind"]
+        signature = getattr(kind, "value", kind)
+        if port.get("identifier"):
+            signature += f":{port['identifier']}"
+        if port.get("children"):
+            signature += "<" + ",".join(DefinitionPort.signature_of(child) for child in port["children"]) + ">"
+        return signature
+
+    @classmethod
+    def from_ports(cls, definition: Definition, direction: str, ports: list[dict]) -> list["DefinitionPort"]:
+        """Unnest the port dicts of one direction of a definition."""
+        return [
+            cls(
+                definition_id=definition.id,
+                organization_id=definition.organization_id,
+                direction=direction,
+                position=position,
+                key=port["key"],
+                kind=port["kind"],
+                identifier=port.get("identifier"),
+                nullable=bool(port.get("nullable")),
+                child_kinds=[child["kind"] for child in port.get("children") or []],
+                children=port.get("children") or [],
+                signature=cls.signature_of(port),
+            )
+            for position, port in enumerate(ports)
+        ]
+
+    @classmethod
+    def rebuild(cls, definitions: list[Definition]) -> None:
+        """Replace the port rows of ``definitions`` with their current ``args`` and ``returns``."""
+        cls.objects.filter(definition__in=definitions).delete()
+        cls.objects.bulk_create([port for definition in definitions for direction in ("args", "returns") for port in cls.from_ports(definition, direction, getattr(definition, direction))])
+
 
 class StateDefinition(models.Model):
     """StateDefinitions are used to define the state that an Action can have. They are used to define the state that an Action can have. They are used to define the state that an Action can have."""
@@ -262,6 +466,57 @@ class StateDefinition(models.Model):
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="state_definitions")
 
 
+class StateDefinitionPort(models.Model):
+    """One port of a state definition, unnested from its ``ports``.
+
+    The counterpart of :class:`DefinitionPort` for state definitions, so state
+    demands are answered by the same port joins (see bridge.managers).
+    Maintained whenever a state definition is saved (see bridge.signals).
+    """
+
+    state = models.ForeignKey(StateDefinition, on_delete=models.CASCADE, related_name="port_rows")
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="+", db_index=False)
+    position = models.PositiveIntegerField(help_text="The (zero-based) position of the port")
+    key = models.CharField(max_length=1000)
+    kind = models.CharField(max_length=100)
+    identifier = models.CharField(max_length=1000, null=True, blank=True)
+    nullable = models.BooleanField(default=False)
+    child_kinds = ArrayField(models.CharField(max_length=100), default=list, blank=True, help_text="The kinds of the port's children, in order")
+    children = models.JSONField(default=list, help_text="The port's children, as declared")
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["state", "position"], name="Unique port position per state")]
+        indexes = [
+            models.Index(fields=["organization", "kind", "identifier"], name="state_port_org_kind_idx"),
+            models.Index(fields=["organization", "identifier"], name="state_port_org_identifier_idx"),
+            models.Index(fields=["organization", "key"], name="state_port_org_key_idx"),
+        ]
+
+    @classmethod
+    def from_ports(cls, state: StateDefinition) -> list["StateDefinitionPort"]:
+        """Unnest the ports of a state definition."""
+        return [
+            cls(
+                state_id=state.id,
+                organization_id=state.organization_id,
+                position=position,
+                key=port["key"],
+                kind=port["kind"],
+                identifier=port.get("identifier"),
+                nullable=bool(port.get("nullable")),
+                child_kinds=[child["kind"] for child in port.get("children") or []],
+                children=port.get("children") or [],
+            )
+            for position, port in enumerate(state.ports)
+        ]
+
+    @classmethod
+    def rebuild(cls, states: list[StateDefinition]) -> None:
+        """Replace the port rows of ``states`` with their current ``ports``."""
+        cls.objects.filter(state__in=states).delete()
+        cls.objects.bulk_create([port for state in states for port in cls.from_ports(state)])
+
+
 class Backend(models.Model):
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="backends")
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
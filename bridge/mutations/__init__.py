@@ -1,6 +1,6 @@
 """Mutations for the bridge app."""
 
-from .repo import scan_repo, create_github_repo, rescan_repos
+from .repo import scan_repo, create_github_repo, rescan_repos, start_scan
 from .flavour import match_flavours
 from .deployment import create_deployment, update_deployment
 from .pod import create_pod, update_pod, dump_logs, delete_pod
@@ -18,6 +18,7 @@ __all__ = [
     "create_pod",
     "update_pod",
     "rescan_repos",
+    "start_scan",
     "dump_logs",
     "declare_backenddelete_pod",
     "create_app_image",
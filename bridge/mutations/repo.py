@@ -2,12 +2,9 @@ from kante.types import Info
 from bridge import types, inputs, models
 from bridge.scoping import aget_for_org, for_org
 import logging
-import aiohttp
-import yaml
-from bridge.repo.db import parse_config
-from bridge.repo.models import KabinetConfigFile
-from django.core.files import File
-from django.core.files.temp import NamedTemporaryFile
+from bridge.repo.jobs import create_scan_job
+from asgiref.sync import sync_to_async
+from bridge.repo.sync import arequest_sync
 import re
 from authentikate.models import Organization, User
 
@@ -15,46 +12,12 @@ from authentikate.models import Organization, User
 logger = logging.getLogger(__name__)
 
 
-async def adownload_logo(url: str) -> File:
-    """Downloads a logo from a url and returns a django file"""
-    img_tmp = NamedTemporaryFile(delete=True)
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            img_tmp.write(await response.read())
-            img_tmp.flush()
-
-    return File(img_tmp)
-
-
-async def aget_kabinet_config(kabinet_url: str) -> KabinetConfigFile:
-    async with aiohttp.ClientSession(headers={"Cache-Control": "no-cache"}) as session:
-        async with session.get(kabinet_url) as response:
-            assert response.status == 200, f"This seems to be not an Arkitekt Repository. Failed to fetch kabinet.yml."
-
-            z = await response.text()
-
-    z = yaml.safe_load(z)
-    if not isinstance(z, dict):
-        raise Exception("Invalid kabinet.yml")
-
-    config = KabinetConfigFile(**z)
-    return config
-
-
 async def scan_repo(info: Info, input: inputs.ScanRepoInput) -> types.GithubRepo:
-    """Scan a tracked GitHub repository for app manifests and update its flavours."""
+    """Queue a priority scan of a tracked GitHub repository for the sync worker."""
     parsed = input.to_pydantic()
-    repo = await aget_for_org(models.GithubRepo, info, id=parsed.id)
+    await arequest_sync(for_org(models.GithubRepo, info).filter(id=parsed.id))
 
-    config = await aget_kabinet_config(repo.kabinet_url)
-
-    try:
-        await parse_config(config, repo, organization=info.context.request.organization)
-    except KeyError as e:
-        logger.error(e, exc_info=True)
-        pass
-
-    return repo
+    return await aget_for_org(models.GithubRepo, info, id=parsed.id)
 
 
 def infer_repo_info(input: inputs.CreateGithubRepoInputModel) -> tuple[str, str, str, str]:
@@ -107,12 +70,9 @@ async def _create_github_repo(
     organization: Organization,
     creator: User,
 ) -> models.GithubRepo:
+    """Track a GitHub repository and queue its first scan for the sync worker."""
     user, repo, branch, name = infer_repo_info(input)
 
-    dep_url = models.GithubRepo.build_kabinet_url(user, repo, branch)
-
-    config = await aget_kabinet_config(dep_url)
-
     repo, _ = await models.GithubRepo.objects.aget_or_create(
         user=user,
         branch=branch,
@@ -124,12 +84,7 @@ async def _create_github_repo(
         ),
     )
 
-    try:
-        await parse_config(config, repo, organization)
-    except KeyError as e:
-        logger.error(e, exc_info=True)
-        pass
-        raise e
+    await arequest_sync(models.GithubRepo.objects.filter(id=repo.id))
 
     return repo
 
@@ -140,15 +95,18 @@ async def create_github_repo(info: Info, input: inputs.CreateGithubRepoInput) ->
 
 
 async def rescan_repos(info: Info) -> list[types.GithubRepo]:
+    """Queue a priority scan of every repository of the organization for the sync worker."""
     repos = for_org(models.GithubRepo, info)
+    await arequest_sync(repos)
+
+    return [repo async for repo in repos]
 
-    async for repo in repos:
-        config = await aget_kabinet_config(repo.kabinet_url)
 
-        try:
-            await parse_config(config, repo, organization=info.context.request.organization)
-        except KeyError as e:
-            logger.error(e, exc_info=True)
-            pass
+async def start_scan(info: Info, input: inputs.StartScanInput) -> types.ScanJob:
+    """Start a background scan job over some or all repositories of the organization."""
+    parsed = input.to_pydantic()
+    repos = for_org(models.GithubRepo, info)
+    if parsed.repos is not None:
+        repos = repos.filter(id__in=parsed.repos)
 
-    return repos
+    return await sync_to_async(create_scan_job)(repos, info.context.request.organization, info.context.request.user)
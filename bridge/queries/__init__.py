@@ -1,13 +1,14 @@
 """Queries for the bridge app."""
 
-from .repos import github_repo
+from .repos import github_repo, scan_job
 from .me import me
-from .definition import definition
-from .release import release
-from .flavour import flavour, match_flavour
+from .definition import compatible_definitions, definition, resolve_action_demands
+from .release import release, latest_release
+from .flavour import flavour, match_flavour, match_flavours
 from .pod import pod, pod_for_agent, my_pod_at
 from .deployment import deployment
 from .backend import backend
 from .resource import resource
+from .search import search
 
-__all__ = ["github_repo", "me", "definition", "release", "flavour", "match_flavour", "pod", "pod_for_agent", "deployment", "backend", "my_pod_at"]
+__all__ = ["github_repo", "scan_job", "me", "definition", "release", "latest_release", "flavour", "match_flavour", "match_flavours", "pod", "pod_for_agent", "deployment", "backend", "my_pod_at", "search", "resolve_action_demands", "compatible_definitions"]
@@ -1,5 +1,6 @@
-from bridge import types, models
-from bridge.scoping import get_for_org
+from bridge import enums, inputs, managers, types, models
+from bridge.scoping import for_org, get_for_org
+from django.db.models.expressions import RawSQL
 from kante.types import Info
 import strawberry
 from rekuest_core.scalars import ActionHash
@@ -13,3 +14,18 @@ def definition(info: Info, id: strawberry.ID | None = None, hash: ActionHash | N
         return get_for_org(models.Definition, info, hash=hash)
 
     raise Exception("Either hash or id needs to be provided")
+
+
+def resolve_action_demands(info: Info, demands: list[inputs.ActionDemandInput]) -> list[types.ActionDemandMatches]:
+    """Return the definitions of the request's organization matching each demand, resolved in one query."""
+    if not demands:
+        return []
+
+    matches = managers.get_definitions_by_action_demands(demands, organization_id=info.context.request.organization.id)
+    return [types.ActionDemandMatches(demand=index, definitions=definitions) for index, definitions in enumerate(matches)]
+
+
+def compatible_definitions(info: Info, definition: strawberry.ID, direction: enums.CompatibilityDirection) -> list[types.Definition]:
+    """Return the definitions that can consume the returns of a definition (or produce its args)."""
+    source = get_for_org(models.Definition, info, id=definition)
+    return for_org(models.Definition, info).filter(id__in=RawSQL(*managers.build_compatibility_sql(source.id, direction))).order_by("id")
@@ -1,7 +1,9 @@
-from bridge import types, models, inputs
+from bridge import types, models, inputs, managers, scoring
 from bridge.scoping import for_org, get_for_org
+from django.db.models import BooleanField, ExpressionWrapper, Q
 from kante.types import Info
 import strawberry
+import typing as t
 
 
 def flavour(info: Info, id: strawberry.ID) -> types.Flavour:
@@ -9,8 +11,14 @@ def flavour(info: Info, id: strawberry.ID) -> types.Flavour:
     return get_for_org(models.Flavour, info, id=id)
 
 
-def match_flavour(info: Info, input: inputs.MatchFlavoursInput) -> types.Flavour:
-    """Return the flavour that best matches the requested release and actions."""
+def match_flavour(info: Info, input: inputs.MatchFlavoursInput) -> t.Optional[types.Flavour]:
+    """Return the flavour that best matches the requested release and actions.
+
+    With an environment, flavours whose required selectors it cannot meet are
+    dropped and the rest ranked by their selector score (see
+    :mod:`bridge.scoring`); without one, the newest candidate wins. ``None``
+    if no flavour matches or none can run in the environment.
+    """
     parsed = input.to_pydantic()
 
     flavours = for_org(models.Flavour, info)
@@ -19,7 +27,107 @@ def match_flavour(info: Info, input: inputs.MatchFlavoursInput) -> types.Flavour
         flavours = flavours.filter(release_id=parsed.release)
 
     if parsed.actions:
-        for action_hash in parsed.actions:
-            flavours = flavours.filter(definitions__hash=action_hash)
+        flavours = flavours.filter(id__in=managers.flavour_ids_providing(parsed.actions, info.context.request.organization.id))
+
+    if parsed.environment is None:
+        return flavours.first()
+
+    ranked = scoring.rank(scoring.exclude_unrunnable(flavours, parsed.environment), parsed.environment)
+    return ranked[0].flavour if ranked else None
+
+
+MAX_REQUESTS = 1000
+
+
+class Candidate(t.NamedTuple):
+    """The columns of a flavour that batch matching reads."""
+
+    id: int
+    release_id: int
+    selectors: list[dict[str, t.Any]]
+    provided: list[str]
+    # Whether the capability columns allow each requested environment, by its index.
+    runnable: tuple[bool, ...]
+
+
+def match_flavours(info: Info, requests: list[inputs.MatchFlavoursInput]) -> list[types.FlavourMatch]:
+    """Return the best flavour for each request, like ``match_flavour``.
+
+    The candidates of every request are read in one query, as their ID,
+    release and selectors with the requested action hashes they provide
+    (see ``managers.get_flavour_candidates``). Like ``match_flavour``, the
+    capability columns rule out flavours in SQL: candidates are only read if
+    some request could run them, and each distinct environment gets a flag
+    telling which candidates it can run. Every request then scores only its
+    runnable candidates in memory, and the winners are fetched in a second
+    query.
+    """
+    if len(requests) > MAX_REQUESTS:
+        raise ValueError(f"At most {MAX_REQUESTS} requests can be matched at once")
+
+    parsed = [request.to_pydantic() for request in requests]
+    if not parsed:
+        return []
+
+    organization_id = info.context.request.organization.id
+    flavours = for_org(models.Flavour, info)
+
+    runnable: dict[str, Q] = {}
+    for request in parsed:
+        if request.environment is not None:
+            runnable.setdefault(request.environment.model_dump_json(), scoring.runnable_q(request.environment))
+    environments = {key: index for index, key in enumerate(runnable)}
+
+    def environment_key(request: inputs.MatchFlavoursInputModel) -> str | None:
+        return None if request.environment is None else request.environment.model_dump_json()
+
+    # Requests for a release only need that release's flavours; the others
+    # need the flavours providing their actions (or any flavour at all).
+    # Either way only the flavours their environment can run.
+    releases: dict[str | None, set[str]] = {}
+    scopes: list[tuple[Q, str | None]] = []
+    for request in parsed:
+        if request.release:
+            releases.setdefault(environment_key(request), set()).add(request.release)
+        elif request.actions:
+            scopes.append((Q(id__in=managers.flavour_ids_providing(request.actions, organization_id)), environment_key(request)))
+        else:
+            scopes.append((Q(), environment_key(request)))
+    scopes += [(Q(release_id__in=ids), key) for key, ids in releases.items()]
+
+    candidates = None
+    for scope, key in scopes:
+        wanted = scope if key is None else scope & runnable[key]
+        if not wanted:
+            candidates = Q()
+            break
+        candidates = wanted if candidates is None else candidates | wanted
+    flavours = flavours.filter(candidates).annotate(
+        **{f"runnable_{index}": ExpressionWrapper(runnable[key], output_field=BooleanField()) for key, index in environments.items()}
+    )
+
+    hashes = {action_hash for request in parsed for action_hash in request.actions or []}
+    flags = [f"runnable_{index}" for index in environments.values()]
+    everything = [Candidate(*row) for row in managers.get_flavour_candidates(flavours, hashes, organization_id, flags)]
+    by_release: dict[str, list[Candidate]] = {}
+    for candidate in everything:
+        by_release.setdefault(str(candidate.release_id), []).append(candidate)
+
+    bests = []
+    for request in parsed:
+        actions = set(request.actions or [])
+        key = environment_key(request)
+        fitting = [
+            candidate
+            for candidate in (by_release.get(str(request.release), []) if request.release else everything)
+            if actions.issubset(candidate.provided) and (key is None or candidate.runnable[environments[key]])
+        ]
+        bests.append(scoring.best(fitting, request.environment))
 
-    return flavours.first()
+    winners = models.Flavour.objects.in_bulk({best.flavour.id for best in bests if best is not None})
+    return [
+        types.FlavourMatch(request=index, flavour=None, score=0, met=[], missed=[])
+        if best is None
+        else types.FlavourMatch(request=index, flavour=winners[best.flavour.id], score=best.score, met=best.met, missed=best.missed)
+        for index, best in enumerate(bests)
+    ]
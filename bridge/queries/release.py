@@ -1,5 +1,7 @@
-from bridge import types, models
-from bridge.scoping import get_for_org
+from typing import Optional
+
+from bridge import types, models, versions
+from bridge.scoping import for_org, get_for_org
 from kante.types import Info
 import strawberry
 
@@ -7,3 +9,24 @@ import strawberry
 def release(info: Info, id: strawberry.ID) -> types.Release:
     """Return a release by id, scoped to the request's organization."""
     return get_for_org(models.Release, info, id=id)
+
+
+def latest_release(
+    info: Info,
+    app: strawberry.ID | None = None,
+    identifier: str | None = None,
+    constraint: str | None = None,
+    include_prereleases: bool = False,
+) -> Optional[types.Release]:
+    """Return the highest semver release of an app matching ``constraint``, scoped to the request's organization."""
+    releases = for_org(models.Release, info)
+    if app:
+        releases = releases.filter(app_id=app)
+    elif identifier:
+        releases = releases.filter(app__identifier=identifier)
+    else:
+        raise Exception("Either app or identifier needs to be provided")
+
+    releases = releases.filter(versions.constraint_q(constraint or "*", include_prereleases=include_prereleases))
+
+    return releases.order_by(*versions.ordering(descending=True, parsed=True)).first()
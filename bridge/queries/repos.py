@@ -7,3 +7,8 @@ import strawberry
 def github_repo(info: Info, id: strawberry.ID) -> types.GithubRepo:
     """Return a tracked GitHub repository by id, scoped to the request's organization."""
     return get_for_org(models.GithubRepo, info, id=id)
+
+
+def scan_job(info: Info, id: strawberry.ID) -> types.ScanJob:
+    """Return a scan job by id, scoped to the request's organization."""
+    return get_for_org(models.ScanJob, info, id=id)
@@ -0,0 +1,18 @@
+from bridge import enums, models, types
+from bridge.scoping import for_org
+from bridge.search import search_hits
+from kante.types import Info
+
+MAX_LIMIT = 100
+
+
+def search(info: Info, query: str, limit: int = 20) -> list[types.SearchHit]:
+    """Return the entities of the request's organization that best match ``query``, best first."""
+    querysets = {
+        enums.SearchKind.DEFINITION: (for_org(models.Definition, info), "name", "search_vector"),
+        enums.SearchKind.FLAVOUR: (for_org(models.Flavour, info), "name", None),
+        enums.SearchKind.APP: (for_org(models.App, info), "identifier", None),
+        enums.SearchKind.GITHUB_REPO: (for_org(models.GithubRepo, info), "name", None),
+    }
+    hits = search_hits(querysets, query, min(max(limit, 1), MAX_LIMIT))
+    return [types.SearchHit(kind=enums.SearchKind(hit["hit_kind"]), id=hit["id"], label=hit["hit_label"], rank=hit["hit_rank"]) for hit in hits]
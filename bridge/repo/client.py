@@ -0,0 +1,176 @@
+"""The shared HTTP client for outbound fetches (``deployments.yaml``, logos).
+
+One pooled ``aiohttp.ClientSession`` is kept per event loop and reused by every
+fetch on it, so consecutive requests to raw.githubusercontent.com ride on
+kept-alive connections instead of paying a TCP and TLS handshake each. The
+pool is bounded overall and per host, DNS lookups are cached, and requests that
+fail with a connection error, a timeout or a transient status (429, 5xx) are
+retried with exponential backoff by :func:`request` (a plain loop around
+``session.request``, as the pinned aiohttp has no client middlewares).
+
+Every session reports into the process-wide :data:`metrics`, which tracks
+request latency and how many requests reused a pooled connection.
+:func:`aclose_session` closes the session of the running loop; long-running
+callers (the sync worker, management commands) call it when they are done.
+"""
+
+import asyncio
+import contextlib
+import dataclasses
+import logging
+import time
+import typing as t
+import weakref
+
+import aiohttp
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+
+
+@dataclasses.dataclass
+class ClientMetrics:
+    """Counters of the outbound HTTP client."""
+
+    requests: int = 0
+    failures: int = 0
+    retries: int = 0
+    connections_created: int = 0
+    connections_reused: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        """Mean time to response headers, in seconds."""
+        return self.latency_total / self.requests if self.requests else 0.0
+
+    @property
+    def reuse_rate(self) -> float:
+        """The fraction of connections that came from the pool."""
+        connections = self.connections_created + self.connections_reused
+        return self.connections_reused / connections if connections else 0.0
+
+    def reset(self) -> None:
+        for field in dataclasses.fields(self):
+            setattr(self, field.name, field.default)
+
+    def summary(self) -> str:
+        return (
+            f"{self.requests} requests ({self.failures} failed, {self.retries} retried), "
+            f"latency mean {self.mean_latency * 1000:.0f} ms / max {self.latency_max * 1000:.0f} ms, "
+            f"connection reuse {self.reuse_rate:.0%}"
+        )
+
+
+metrics = ClientMetrics()
+
+
+def retry_delay(attempt: int) -> float:
+    """Seconds to wait before retry number ``attempt`` (counting from 0)."""
+    return settings.HTTP_CLIENT_RETRY_BACKOFF * 2**attempt
+
+
+async def arequest(method: str, url: str, **kwargs) -> aiohttp.ClientResponse:
+    """Send a request on the shared session, retrying transient failures.
+
+    A connection error, a timeout or a transient status is retried up to
+    ``HTTP_CLIENT_RETRIES`` times; the last response is returned whatever its
+    status. The caller releases the response (see :func:`request`).
+    """
+    session = get_session()
+    retries = settings.HTTP_CLIENT_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            response = await session.request(method, url, **kwargs)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if attempt == retries:
+                raise
+            logger.info("Retrying %s after %s", url, type(e).__name__)
+        else:
+            if response.status not in RETRY_STATUSES or attempt == retries:
+                return response
+            logger.info("Retrying %s after HTTP %s", url, response.status)
+            response.release()
+
+        metrics.retries += 1
+        await asyncio.sleep(retry_delay(attempt))
+
+    raise AssertionError("unreachable")
+
+
+@contextlib.asynccontextmanager
+async def request(method: str, url: str, **kwargs) -> t.AsyncIterator[aiohttp.ClientResponse]:
+    """:func:`arequest` as a context manager that releases the response."""
+    response = await arequest(method, url, **kwargs)
+    try:
+        yield response
+    finally:
+        response.release()
+
+
+def build_trace_config() -> aiohttp.TraceConfig:
+    """Feed request latency and connection reuse into :data:`metrics`."""
+
+    async def on_request_start(session, context, params) -> None:
+        context.start = time.perf_counter()
+
+    async def on_request_end(session, context, params) -> None:
+        latency = time.perf_counter() - context.start
+        metrics.requests += 1
+        metrics.latency_total += latency
+        metrics.latency_max = max(metrics.latency_max, latency)
+
+    async def on_request_exception(session, context, params) -> None:
+        metrics.requests += 1
+        metrics.failures += 1
+
+    async def on_connection_create_end(session, context, params) -> None:
+        metrics.connections_created += 1
+
+    async def on_connection_reuseconn(session, context, params) -> None:
+        metrics.connections_reused += 1
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    return trace_config
+
+
+def build_session() -> aiohttp.ClientSession:
+    """Build a pooled session; use :func:`get_session` to share one."""
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+            limit_per_host=settings.HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST,
+            ttl_dns_cache=settings.HTTP_CLIENT_DNS_CACHE_TTL,
+            keepalive_timeout=settings.HTTP_CLIENT_KEEPALIVE_TIMEOUT,
+        ),
+        timeout=aiohttp.ClientTimeout(total=settings.REPO_SCAN_TIMEOUT, connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT),
+        headers={"Cache-Control": "no-cache"},
+        trace_configs=[build_trace_config()],
+    )
+
+
+def get_session() -> aiohttp.ClientSession:
+    """The shared session of the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = _sessions[loop] = build_session()
+    return session
+
+
+async def aclose_session() -> None:
+    """Close the shared session of the running event loop, if it has one."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        logger.info("Closing HTTP client: %s", metrics.summary())
+        await session.close()
@@ -1,86 +1,295 @@
-from .models import KabinetConfigFile
-from bridge import models
+import dataclasses
+import hashlib
+import json
+from functools import partial
+
+from .models import AppImageInputModel, KabinetConfigFile
+from bridge import demand_cache, models
 from .errors import DBError
-import aiohttp
-from django.core.files import File
-from django.core.files.temp import NamedTemporaryFile
+from .logos import aupdate_logos
+from asgiref.sync import sync_to_async
+from django.db import transaction
 
 
-async def adownload_logo(url: str) -> File:  # type: ignore
-    """Downloads a logo from a url and returns a django file"""
-    img_tmp = NamedTemporaryFile(delete=True)
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            img_tmp.write(await response.read())
-            img_tmp.flush()
+@dataclasses.dataclass
+class IngestionBatch:
+    """The rows of a whole ``KabinetConfigFile``, deduplicated by natural key.
 
-    return File(img_tmp)
+    Each mapping is keyed by the natural key of its model (the fields of the
+    unique constraint the bulk upsert conflicts on), so an app image that
+    repeats an app, release, image or definition collapses onto a single row
+    and the last occurrence wins, just like the sequential ``update_or_create``
+    it replaces.
+    """
 
+    apps: dict[str, dict] = dataclasses.field(default_factory=dict)
+    releases: dict[tuple[str, str], dict] = dataclasses.field(default_factory=dict)
+    images: dict[str, dict] = dataclasses.field(default_factory=dict)
+    flavours: dict[tuple[str, str, str | None], dict] = dataclasses.field(default_factory=dict)
+    definitions: dict[str, dict] = dataclasses.field(default_factory=dict)
+    links: set[tuple[str, tuple[str, str, str | None]]] = dataclasses.field(default_factory=set)
+    order: list[tuple[str, str, str | None]] = dataclasses.field(default_factory=list)
 
-async def parse_config(config: KabinetConfigFile, repo: models.GithubRepo, organization: models.Organization) -> list[models.Flavour]:
-    """Parse a deployments config file and create models"""
 
-    deps = []
+@dataclasses.dataclass
+class IngestionResult:
+    """What ingesting a config changed, diffed per app image.
+
+    ``flavours`` holds the flavour of every app image in config order, written
+    or not; ``removed`` lists the keys of the flavours that left the config
+    and were deleted, ``kept`` those that left it but are still deployed.
+    Kept flavours do not count as a change, as they are kept on every scan.
+    """
+
+    flavours: list[models.Flavour] = dataclasses.field(default_factory=list)
+    added: list[models.Flavour] = dataclasses.field(default_factory=list)
+    changed: list[models.Flavour] = dataclasses.field(default_factory=list)
+    unchanged: list[models.Flavour] = dataclasses.field(default_factory=list)
+    removed: list[tuple[str, str, str | None]] = dataclasses.field(default_factory=list)
+    kept: list[tuple[str, str, str | None]] = dataclasses.field(default_factory=list)
+
+    @property
+    def touched(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+def flavour_key(deployment: AppImageInputModel) -> tuple[str, str, str | None]:
+    """The natural key (app identifier, version, flavour name) of an app image."""
+    return (deployment.manifest.identifier, deployment.manifest.version, deployment.flavour_name)
+
+
+def stored_flavour_key(flavour: models.Flavour) -> tuple[str, str, str | None]:
+    """The natural key of a stored flavour (needs ``release__app`` loaded)."""
+    return (flavour.release.app.identifier, flavour.release.version, flavour.name)
+
+
+def format_flavour_key(key: tuple[str, str, str | None]) -> str:
+    identifier, version, name = key
+    return f"{identifier}:{version}:{name}"
+
+
+def fingerprint(deployment: AppImageInputModel) -> str:
+    """A sha256 over the canonical JSON dump of an app image."""
+    canonical = json.dumps(deployment.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def collect_batch(deployments: list[AppImageInputModel]) -> IngestionBatch:
+    """Collect every row a list of app images describes into an in-memory batch."""
+    batch = IngestionBatch()
+
+    for deployment in deployments:
+        manifest = deployment.manifest
+        key = flavour_key(deployment)
+
+        batch.apps[manifest.identifier] = {}
+        batch.releases[(manifest.identifier, manifest.version)] = dict(scopes=manifest.scopes, **models.Release.version_columns(manifest.version))
+        batch.images[deployment.image.image_string] = dict(build_at=deployment.image.build_at)
+        selectors = [d.model_dump() for d in deployment.selectors]
+        batch.flavours[key] = dict(
+            deployment_id=deployment.app_image_id,
+            flavour=deployment.app_image_id,
+            selectors=selectors,
+            **models.Flavour.capabilities(selectors),
+            image_string=deployment.image.image_string,
+            manifest=deployment.manifest.model_dump(),
+            requirements=deployment.inspection.model_dump()["requirements"],
+            fingerprint=fingerprint(deployment),
+        )
+        batch.order.append(key)
+
+        if deployment.inspection:
+            for implementation in deployment.inspection.implementations:
+                definition = implementation.definition
+                args = [d.model_dump() for d in definition.args]
+                returns = [d.model_dump() for d in definition.returns]
+                batch.definitions[definition.unique_hash] = dict(
+                    description=definition.description,
+                    args=args,
+                    returns=returns,
+                    name=definition.name,
+                    **models.Definition.port_shape(args, returns),
+                )
+                batch.links.add((definition.unique_hash, key))
+
+    return batch
+
+
+def write_batch(batch: IngestionBatch, repo: models.GithubRepo, organization: models.Organization) -> list[models.Flavour]:
+    """Persist a batch with one bulk upsert per model and one for the M2M links.
+
+    Postgres returns the primary keys of inserted *and* updated rows for
+    ``update_conflicts`` upserts, so every later batch can reference the rows
+    of the previous one without reading them back.
+    """
+    if not batch.order:
+        return []
+
+    apps = models.App.objects.bulk_create(
+        [models.App(identifier=identifier, organization=organization) for identifier in batch.apps],
+        update_conflicts=True,
+        unique_fields=["identifier", "organization"],
+        update_fields=["identifier"],
+    )
+    app_by_identifier = {app.identifier: app for app in apps}
+
+    releases = models.Release.objects.bulk_create(
+        [models.Release(app=app_by_identifier[identifier], version=version, **values) for (identifier, version), values in batch.releases.items()],
+        update_conflicts=True,
+        unique_fields=["app", "version"],
+        update_fields=["scopes", "version_major", "version_minor", "version_patch", "version_prerelease", "version_prerelease_key", "created_at"],
+    )
+    release_by_key = {(release.app.identifier, release.version): release for release in releases}
+
+    images = models.DockerImage.objects.bulk_create(
+        [models.DockerImage(image_string=image_string, organization=organization, **values) for image_string, values in batch.images.items()],
+        update_conflicts=True,
+        unique_fields=["image_string", "organization"],
+        update_fields=["build_at", "created_at"],
+    )
+    image_by_string = {image.image_string: image for image in images}
+
+    flavour_rows = []
+    for (identifier, version, name), values in batch.flavours.items():
+        values = dict(values)
+        image = image_by_string[values.pop("image_string")]
+        flavour_rows.append(models.Flavour(release=release_by_key[(identifier, version)], name=name, repo=repo, image=image, **values))
+
+    flavours = models.Flavour.objects.bulk_create(
+        flavour_rows,
+        update_conflicts=True,
+        unique_fields=["release", "name"],
+        update_fields=[
+            "deployment_id",
+            "flavour",
+            "selectors",
+            "required_kinds",
+            "min_cuda_version",
+            "min_cuda_cores",
+            "min_rocm_version",
+            "min_oneapi_version",
+            "min_cpu_count",
+            "min_frequency",
+            "min_memory",
+            "repo",
+            "image",
+            "manifest",
+            "requirements",
+            "fingerprint",
+            "created_at",
+        ],
+    )
+    flavour_by_key = {(flavour.release.app.identifier, flavour.release.version, flavour.name): flavour for flavour in flavours}
+
+    if batch.definitions:
+        definitions = models.Definition.objects.bulk_create(
+            [models.Definition(hash=hash, organization=organization, **values) for hash, values in batch.definitions.items()],
+            update_conflicts=True,
+            unique_fields=["hash", "organization"],
+            update_fields=[
+                "description",
+                "args",
+                "returns",
+                "name",
+                "arg_count",
+                "return_count",
+                "non_nullable_arg_count",
+                "non_nullable_return_count",
+                "structure_arg_count",
+                "structure_return_count",
+            ],
+        )
+        definition_by_hash = {definition.hash: definition for definition in definitions}
+
+        # Re-unnest the ports the demand matcher queries (see bridge.managers).
+        models.DefinitionPort.rebuild(definitions)
+
+        through = models.Definition.flavours.through
+        through.objects.bulk_create(
+            [through(definition_id=definition_by_hash[hash].id, flavour_id=flavour_by_key[key].id) for hash, key in batch.links],
+            ignore_conflicts=True,
+        )
+
+    return [flavour_by_key[key] for key in batch.order]
+
+
+@transaction.atomic
+def ingest_config(config: KabinetConfigFile, repo: models.GithubRepo, organization: models.Organization) -> IngestionResult:
+    """Diff a config file against the repository's flavours and persist the difference.
+
+    Only app images whose fingerprint is new or differs from the stored one
+    are written (with their app, release, image and definitions); the others
+    are left untouched, so their ``auto_now`` timestamps keep their meaning.
+    Flavours that left the config are deleted unless they are still deployed.
+    """
+    stored = {stored_flavour_key(flavour): flavour for flavour in models.Flavour.objects.filter(repo=repo).select_related("release__app")}
+    incoming = {flavour_key(deployment): fingerprint(deployment) for deployment in config.app_images}
+
+    stale = {key for key, digest in incoming.items() if key not in stored or stored[key].fingerprint != digest}
+    changed_ids = [stored[key].id for key in stale if key in stored]
+    leaving = [key for key in stored if key not in incoming]
+
+    if changed_ids:
+        # The definitions of a changed app image are replaced, not merged.
+        models.Definition.flavours.through.objects.filter(flavour_id__in=changed_ids).delete()
+
+    written = write_batch(collect_batch([d for d in config.app_images if flavour_key(d) in stale]), repo, organization)
+    flavour_by_key = {**stored, **{stored_flavour_key(flavour): flavour for flavour in written}}
+
+    deleted: set[int] = set()
+    if leaving:
+        deleted = set(models.Flavour.objects.filter(id__in=[stored[key].id for key in leaving], deployments__isnull=True).values_list("id", flat=True))
+        models.Flavour.objects.filter(id__in=deleted).delete()
+
+    if written or changed_ids or deleted:
+        # Flavours, definitions or their links changed (deletions included),
+        # so cached demand results of the organization are stale once this commits.
+        transaction.on_commit(partial(demand_cache.bump_generation, organization.id))
+
+    result = IngestionResult(
+        removed=[key for key in leaving if stored[key].id in deleted],
+        kept=[key for key in leaving if stored[key].id not in deleted],
+    )
+    for key in dict.fromkeys(flavour_key(deployment) for deployment in config.app_images):
+        flavour = flavour_by_key[key]
+        if key not in stale:
+            result.unchanged.append(flavour)
+        elif key in stored:
+            result.changed.append(flavour)
+        else:
+            result.added.append(flavour)
+
+    result.flavours = [flavour_by_key[flavour_key(deployment)] for deployment in config.app_images]
+    return result
+
+
+async def aingest_config(
+    config: KabinetConfigFile,
+    repo: models.GithubRepo,
+    organization: models.Organization,
+) -> IngestionResult:
+    """Ingest a deployments config file and report what changed.
+
+    The logos of added and changed releases are fetched afterwards; a logo
+    that cannot be fetched does not fail the ingestion.
+    """
+
     try:
-        for deployment in config.app_images:
-            manifest = deployment.manifest
-
-            app, _ = await models.App.objects.aget_or_create(
-                identifier=manifest.identifier,
-                organization=organization,
-            )
-
-            release, _ = await models.Release.objects.aupdate_or_create(
-                version=manifest.version,
-                app=app,
-                defaults=dict(
-                    scopes=manifest.scopes,
-                ),
-            )
-
-            if manifest.logo:
-                logo_file = await adownload_logo(manifest.logo)
-                release.logo.save(f"logo{release.id}.png", logo_file)
-                await release.asave()
-
-            x, _ = await models.DockerImage.objects.aupdate_or_create(
-                image_string=deployment.image.image_string,
-                defaults=dict(build_at=deployment.image.build_at),
-                organization=organization
-            )
-
-            flavour, _ = await models.Flavour.objects.aupdate_or_create(
-                release=release,
-                name=deployment.flavour_name,
-                defaults=dict(
-                    deployment_id=deployment.app_image_id,
-                    flavour=deployment.app_image_id,
-                    selectors=[d.model_dump() for d in deployment.selectors],
-                    repo=repo,
-                    image=x,
-                    manifest=deployment.manifest.model_dump(),
-                    requirements=deployment.inspection.model_dump()["requirements"],
-                ),
-            )
-
-            inspection = deployment.inspection
-
-            if inspection:
-                for implementation in inspection.implementations:
-                    def_model, _ = await models.Definition.objects.aupdate_or_create(
-                        hash=implementation.definition.unique_hash,
-                        organization=organization,
-                        defaults=dict(
-                            description=implementation.definition.description,
-                            args=[d.model_dump() for d in implementation.definition.args],
-                            returns=[d.model_dump() for d in implementation.definition.returns],
-                            name=implementation.definition.name,
-                        ),
-                    )
-                    await def_model.flavours.aadd(flavour)
-
-            deps.append(flavour)
+        result = await sync_to_async(ingest_config)(config, repo, organization)
     except Exception as e:
         raise DBError("Could not create models from deployments") from e
 
-    return deps
+    touched = {stored_flavour_key(flavour) for flavour in result.added + result.changed}
+    releases_by_url: dict[str, list[int]] = {}
+    for deployment, flavour in zip(config.app_images, result.flavours):
+        if deployment.manifest.logo and flavour_key(deployment) in touched:
+            releases_by_url.setdefault(deployment.manifest.logo, []).append(flavour.release_id)
+
+    await aupdate_logos(releases_by_url)
+
+    return result
+
+
+async def parse_config(config: KabinetConfigFile, repo: models.GithubRepo, organization: models.Organization) -> list[models.Flavour]:
+    """Parse a deployments config file and create models"""
+    return (await aingest_config(config, repo, organization)).flavours
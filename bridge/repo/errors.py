@@ -4,3 +4,7 @@ class RepoError(Exception):
 
 class DBError(RepoError):
     pass
+
+
+class FetchError(RepoError):
+    pass
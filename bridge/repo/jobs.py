@@ -0,0 +1,83 @@
+"""Scan jobs: tracked, observable batches of repository scans.
+
+``startScan`` creates a :class:`bridge.models.ScanJob` with one
+:class:`bridge.models.ScanJobRepo` per repository and queues a priority sync
+for them; the scanning itself is done by the sync worker
+(:mod:`bridge.repo.sync`). As the worker scans a repository it reports every
+stage through :func:`areport_progress`, which updates the open job entries of
+that repository and broadcasts the progress on ``scan_job_channel``.
+"""
+
+from asgiref.sync import sync_to_async
+from authentikate.models import Organization, User
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from bridge import channel_signals, channels, models
+from bridge.enums import ScanJobStatus, ScanProgress
+
+FINAL_PROGRESS = (ScanProgress.UPSERTED.value, ScanProgress.UNCHANGED.value, ScanProgress.FAILED.value)
+OPEN_PROGRESS = tuple(progress.value for progress in ScanProgress if progress.value not in FINAL_PROGRESS)
+
+
+def scan_job_group(job_id: int | str) -> str:
+    return f"scan_job_{job_id}"
+
+
+@transaction.atomic
+def create_scan_job(repos: QuerySet, organization: Organization, creator: User | None) -> models.ScanJob:
+    """Create a job for ``repos`` and queue a priority sync for each of them."""
+    job = models.ScanJob.objects.create(organization=organization, creator=creator)
+
+    repo_ids = list(repos.values_list("id", flat=True))
+    models.ScanJobRepo.objects.bulk_create([models.ScanJobRepo(job=job, repo_id=repo_id) for repo_id in repo_ids])
+    models.GithubRepo.objects.filter(id__in=repo_ids).update(sync_requested_at=timezone.now())
+
+    if not repo_ids:
+        job.status = ScanJobStatus.DONE.value
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "finished_at"])
+
+    return job
+
+
+@transaction.atomic
+def record_progress(repo: models.GithubRepo, progress: ScanProgress, flavours: int = 0, reason: str | None = None) -> tuple[list[int], set[int]]:
+    """Move the open job entries of ``repo`` to ``progress``.
+
+    Returns the affected jobs and the subset that this progress finished.
+    """
+    entries = models.ScanJobRepo.objects.filter(repo=repo, status__in=OPEN_PROGRESS)
+    job_ids = list(entries.values_list("job_id", flat=True))
+    if not job_ids:
+        return [], set()
+
+    entries.update(status=progress.value, flavours=flavours, reason=reason, updated_at=timezone.now())
+    models.ScanJob.objects.filter(id__in=job_ids, status=ScanJobStatus.QUEUED.value).update(status=ScanJobStatus.RUNNING.value)
+
+    finished: set[int] = set()
+    if progress.value in FINAL_PROGRESS:
+        jobs = models.ScanJob.objects.filter(id__in=job_ids).exclude(status=ScanJobStatus.DONE.value).exclude(repos__status__in=OPEN_PROGRESS)
+        finished = set(jobs.values_list("id", flat=True))
+        models.ScanJob.objects.filter(id__in=finished).update(status=ScanJobStatus.DONE.value, finished_at=timezone.now())
+
+    return job_ids, finished
+
+
+async def areport_progress(repo: models.GithubRepo, progress: ScanProgress, flavours: int = 0, reason: str | None = None) -> None:
+    """Record and broadcast the progress of ``repo`` for every job waiting on it."""
+    job_ids, finished = await sync_to_async(record_progress)(repo, progress, flavours, reason)
+
+    for job_id in job_ids:
+        await channels.scan_job_channel.abroadcast(
+            channel_signals.ScanJobSignal(
+                job=job_id,
+                repo=repo.id,
+                status=progress.value,
+                flavours=flavours,
+                reason=reason,
+                done=job_id in finished,
+            ),
+            groups=[scan_job_group(job_id)],
+        )
@@ -0,0 +1,178 @@
+"""Content-addressed caching of release logos.
+
+A logo is stored once per sha256 of its content (:class:`bridge.models.Logo`),
+in the ``media`` bucket of the datalayer, and shared by every release whose
+manifest points at the same content. Each logo URL remembers the ETag and
+Last-Modified of its last download (:class:`bridge.models.LogoSource`), so a
+rescan revalidates it with a conditional request instead of downloading it
+again. A logo no release refers to any more is pruned.
+
+Linking releases to logos and pruning logos both lock the logo rows, so a
+scan cannot link a logo that a concurrent scan is deleting: whichever locks
+first wins, and a link to a logo pruned meanwhile is skipped (the release
+keeps its logo until the next scan fetches it again).
+"""
+
+import asyncio
+import hashlib
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+
+from bridge import models
+from .client import request
+from .errors import FetchError
+
+logger = logging.getLogger(__name__)
+
+
+def upload_logo(digest: str, body: bytes, content_type: str | None):
+    """Store the content of a new logo in the media datalayer.
+
+    Returns the ``datalayer.MediaStore``, or ``None`` if no media bucket is
+    configured.
+    """
+    from datalayer import models as dl_models
+    from datalayer.datalayer import get_current_datalayer
+
+    datalayer = get_current_datalayer()
+    try:
+        datalayer.get_bucket_config("media")
+    except ValueError:
+        logger.info("No media bucket configured, not storing logo %s", digest)
+        return None
+
+    key = f"logos/{digest}"
+    store, _ = dl_models.MediaStore.objects.get_or_create(
+        bucket="media",
+        key=key,
+        defaults=dict(original_file_name=digest, content_type=content_type),
+    )
+    if not store.populated:
+        datalayer.put_file("media", key, body, content_type)
+        store.fill_info(datalayer)
+
+    return store
+
+
+def store_logo(url: str, body: bytes, content_type: str | None, etag: str | None, last_modified: str | None) -> models.Logo:
+    """Find or create the logo for ``body`` and point ``url`` at it."""
+    digest = hashlib.sha256(body).hexdigest()
+
+    logo = models.Logo.objects.filter(digest=digest).first()
+    if logo is None:
+        store = upload_logo(digest, body, content_type)
+        try:
+            with transaction.atomic():
+                logo = models.Logo.objects.create(digest=digest, content_type=content_type, size=len(body), store=store)
+        except IntegrityError:
+            # Another scan stored the same content concurrently.
+            logo = models.Logo.objects.get(digest=digest)
+
+    models.LogoSource.objects.update_or_create(url=url, defaults=dict(logo=logo, etag=etag, last_modified=last_modified))
+    return logo
+
+
+async def afetch_logo(url: str, source: models.LogoSource | None) -> models.Logo:
+    """Fetch the logo at ``url``, revalidating against its last download."""
+    headers = {}
+    if source is not None:
+        if source.etag:
+            headers["If-None-Match"] = source.etag
+        if source.last_modified:
+            headers["If-Modified-Since"] = source.last_modified
+
+    async with request("GET", url, headers=headers) as response:
+        if response.status == 304 and source is not None:
+            return source.logo
+
+        if response.status != 200:
+            raise FetchError(f"Failed to fetch logo {url} (HTTP {response.status}).")
+
+        body = await response.read()
+        content_type = response.headers.get("Content-Type")
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+    if source is not None and source.logo.digest == hashlib.sha256(body).hexdigest() and (source.etag, source.last_modified) == (etag, last_modified):
+        return source.logo
+
+    return await sync_to_async(store_logo)(url, body, content_type, etag, last_modified)
+
+
+async def afetch_logos(urls: set[str]) -> dict[str, models.Logo]:
+    """Fetch every logo URL concurrently; URLs that fail are logged and left out."""
+    sources = {source.url: source async for source in models.LogoSource.objects.filter(url__in=urls).select_related("logo")}
+    semaphore = asyncio.Semaphore(settings.REPO_SCAN_CONCURRENCY)
+
+    async def bounded(url: str) -> models.Logo:
+        async with semaphore:
+            return await afetch_logo(url, sources.get(url))
+
+    ordered = list(urls)
+    fetched = await asyncio.gather(*(bounded(url) for url in ordered), return_exceptions=True)
+
+    logos = {}
+    for url, logo in zip(ordered, fetched):
+        if isinstance(logo, BaseException):
+            logger.warning("Fetching logo %s failed", url, exc_info=logo)
+            continue
+        logos[url] = logo
+
+    return logos
+
+
+def lock_logos(logo_ids: set[int]) -> set[int]:
+    """Lock the logos among ``logo_ids`` until the transaction ends; returns those that still exist.
+
+    The rows are locked in id order, so two scans locking overlapping logos
+    cannot deadlock.
+    """
+    return set(models.Logo.objects.select_for_update().filter(id__in=logo_ids).order_by("id").values_list("id", flat=True))
+
+
+@transaction.atomic
+def assign_logos(releases_by_url: dict[str, list[int]], logos: dict[str, models.Logo]) -> None:
+    """Point releases at their logos and prune logos no release uses any more."""
+    release_ids = [release_id for url in logos for release_id in releases_by_url[url]]
+    previous = set(models.Release.objects.filter(id__in=release_ids, stored_logo__isnull=False).values_list("stored_logo_id", flat=True))
+    assigned = {logo.id for logo in logos.values()}
+
+    existing = lock_logos(assigned | previous)
+    for url, logo in logos.items():
+        if logo.id not in existing:
+            logger.info("Logo %s was pruned by a concurrent scan, not assigning it", url)
+            continue
+        models.Release.objects.filter(id__in=releases_by_url[url]).exclude(stored_logo=logo).update(stored_logo=logo, original_logo=url)
+
+    prune_logos(previous - assigned)
+
+
+@transaction.atomic
+def prune_logos(logo_ids: set[int]) -> None:
+    """Delete the logos among ``logo_ids`` that no release refers to, with their content.
+
+    The references are counted only once the logos are locked, so a link
+    committed by a concurrent scan in the meantime is seen.
+    """
+    if not logo_ids:
+        return
+
+    locked = lock_logos(logo_ids)
+    unused = models.Logo.objects.filter(id__in=locked).annotate(refcount=Count("releases")).filter(refcount=0).select_related("store")
+    for logo in unused:
+        if logo.store is not None and not logo.store.logos.exclude(id=logo.id).exists():
+            logo.store.delete()
+        logo.delete()
+
+
+async def aupdate_logos(releases_by_url: dict[str, list[int]]) -> None:
+    """Fetch the logos of freshly ingested releases and assign them."""
+    if not releases_by_url:
+        return
+
+    logos = await afetch_logos(set(releases_by_url))
+    await sync_to_async(assign_logos)(releases_by_url, logos)
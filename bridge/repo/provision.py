@@ -0,0 +1,118 @@
+"""Provisioning of the repositories configured in ``repo_map``.
+
+``python manage.py ensurerepos`` makes sure every organization in the map
+tracks its repositories. The rows are created in one transaction; each
+distinct ``deployments.yaml`` is then fetched and parsed once, concurrently,
+and ingested for every organization that maps it. A repository whose stored
+digest already matches the fetched file is left alone, so running the command
+on every boot is cheap.
+
+With ``defer`` nothing is fetched: the repositories are queued for a priority
+sync and the sync worker (:mod:`bridge.repo.sync`) ingests them after the
+server has started.
+"""
+
+import asyncio
+import dataclasses
+import logging
+
+from asgiref.sync import sync_to_async
+from authentikate.models import Organization
+from django.conf import settings
+from django.db import transaction
+
+from bridge import models
+from bridge.enums import RepoScanStatus
+from .client import aclose_session
+from .scan import FetchedConfig, RepoScanResult, aget_kabinet_config, aingest_fetched
+from .sync import arecord_sync, arequest_sync
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class RepoTarget:
+    """A repository one organization should track."""
+
+    organization: str
+    user: str
+    repo: str
+    branch: str
+    name: str
+
+
+@transaction.atomic
+def ensure_repo_rows(targets: list[RepoTarget]) -> list[models.GithubRepo]:
+    """Get or create the organizations and repositories of ``targets``.
+
+    Existing repositories are loaded with one query. Organizations go through
+    ``get_or_create`` so their ``post_save`` hooks (default repositories) run.
+    """
+    organizations = {slug: Organization.objects.get_or_create(slug=slug)[0] for slug in dict.fromkeys(target.organization for target in targets)}
+
+    existing = {
+        (repo.organization.slug, repo.user, repo.repo, repo.branch): repo
+        for repo in models.GithubRepo.objects.filter(organization__in=organizations.values()).select_related("organization")
+    }
+
+    repos: dict[tuple[str, str, str, str], models.GithubRepo] = {}
+    for target in targets:
+        key = (target.organization, target.user, target.repo, target.branch)
+        if key in repos:
+            continue
+
+        repo = existing.get(key)
+        if repo is None:
+            # GithubRepo is a multi-table child of Repo, which bulk_create does not support.
+            repo = models.GithubRepo.objects.create(
+                name=target.name,
+                user=target.user,
+                repo=target.repo,
+                branch=target.branch,
+                organization=organizations[target.organization],
+            )
+        repos[key] = repo
+
+    return list(repos.values())
+
+
+async def aprovision_repo(repo: models.GithubRepo, fetch: "asyncio.Future[FetchedConfig]") -> RepoScanResult:
+    """Ingest the shared fetch of ``repo``'s config, reporting failures instead of raising."""
+    try:
+        fetched = await fetch
+        if fetched.digest == repo.config_digest:
+            result = RepoScanResult(repo=repo, status=RepoScanStatus.UNCHANGED)
+        else:
+            ingestion = await aingest_fetched(repo, repo.organization, fetched)
+            result = RepoScanResult(repo=repo, status=RepoScanStatus.OK, ingestion=ingestion)
+    except Exception as e:
+        logger.warning("Provisioning %s failed", repo, exc_info=True)
+        result = RepoScanResult(repo=repo, status=RepoScanStatus.FAILED, reason=str(e) or type(e).__name__)
+
+    await arecord_sync(result)
+    return result
+
+
+async def aensure_repos(targets: list[RepoTarget], defer: bool = False, concurrency: int | None = None) -> list[RepoScanResult]:
+    """Provision ``targets``, fetching each distinct config once.
+
+    Returns one result per repository, in the order of ``targets``.
+    """
+    repos = await sync_to_async(ensure_repo_rows)(targets)
+
+    if defer:
+        await arequest_sync(models.GithubRepo.objects.filter(id__in=[repo.id for repo in repos]))
+        return [RepoScanResult(repo=repo, status=RepoScanStatus.QUEUED) for repo in repos]
+
+    concurrency = concurrency or settings.REPO_SCAN_CONCURRENCY
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(url: str) -> FetchedConfig:
+        async with semaphore:
+            return await aget_kabinet_config(url)
+
+    try:
+        fetches = {url: asyncio.ensure_future(bounded(url)) for url in dict.fromkeys(repo.kabinet_url for repo in repos)}
+        return list(await asyncio.gather(*(aprovision_repo(repo, fetches[repo.kabinet_url]) for repo in repos)))
+    finally:
+        await aclose_session()
@@ -0,0 +1,249 @@
+"""Fetching and rescanning of tracked GitHub repositories.
+
+Repositories are scanned by the sync worker (:mod:`bridge.repo.sync`), which
+keeps at most ``REPO_SCAN_CONCURRENCY`` of them in flight, all over the pooled
+session of :mod:`bridge.repo.client`. A failing repository never aborts the
+others; its :class:`RepoScanResult` carries the reason instead.
+
+Fetches are conditional: the ETag, Last-Modified and sha256 of the last
+ingested ``deployments.yaml`` are stored on the repository, so an unchanged
+file costs one ``304`` (or one identical download) and is neither parsed nor
+ingested again.
+
+Files above ``REPO_CONFIG_MAX_SIZE`` are rejected while downloading. Parsing
+and validation run on a pool of ``REPO_PARSE_WORKERS`` threads with the
+libyaml loader when it is available, so a large file does not stall the event
+loop (and every other request served by it).
+"""
+
+import asyncio
+import dataclasses
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable
+
+import aiohttp
+import yaml
+from django.conf import settings
+
+from bridge import models
+from bridge.enums import RepoScanStatus, ScanProgress
+from .client import request
+from .db import IngestionResult, aingest_config, format_flavour_key
+from .errors import FetchError
+from .models import KabinetConfigFile
+
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as YamlLoader  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+_parse_pool: ThreadPoolExecutor | None = None
+
+ProgressCallback = Callable[..., Awaitable[None]]
+
+
+@dataclasses.dataclass
+class RepoScanResult:
+    """The outcome of scanning one repository."""
+
+    repo: models.GithubRepo
+    status: RepoScanStatus
+    reason: str | None = None
+    ingestion: IngestionResult = dataclasses.field(default_factory=IngestionResult)
+
+    @property
+    def added(self) -> list[models.Flavour]:
+        return self.ingestion.added
+
+    @property
+    def changed(self) -> list[models.Flavour]:
+        return self.ingestion.changed
+
+    @property
+    def removed(self) -> list[str]:
+        return [format_flavour_key(key) for key in self.ingestion.removed]
+
+    @property
+    def kept(self) -> list[str]:
+        return [format_flavour_key(key) for key in self.ingestion.kept]
+
+    @property
+    def unchanged(self) -> int:
+        return len(self.ingestion.unchanged)
+
+
+@dataclasses.dataclass
+class FetchedConfig:
+    """A conditionally fetched ``deployments.yaml``.
+
+    ``config`` is ``None`` when the file did not change since the validators
+    that were sent along (``304`` or an identical digest).
+    """
+
+    config: KabinetConfigFile | None
+    etag: str | None = None
+    last_modified: str | None = None
+    digest: str | None = None
+
+
+def parse_pool() -> ThreadPoolExecutor:
+    """The process-wide pool that config files are parsed on."""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ThreadPoolExecutor(max_workers=settings.REPO_PARSE_WORKERS, thread_name_prefix="kabinet-config-parse")
+    return _parse_pool
+
+
+def parse_kabinet_config(body: bytes) -> KabinetConfigFile:
+    """Parse and validate a ``deployments.yaml`` (blocking)."""
+    z = yaml.load(body, Loader=YamlLoader)
+    if not isinstance(z, dict):
+        raise FetchError("Invalid kabinet.yml")
+
+    return KabinetConfigFile(**z)
+
+
+async def aparse_kabinet_config(body: bytes) -> KabinetConfigFile:
+    """Parse and validate a ``deployments.yaml`` on the parse pool."""
+    return await asyncio.get_running_loop().run_in_executor(parse_pool(), parse_kabinet_config, body)
+
+
+async def aread_limited(response: aiohttp.ClientResponse, limit: int) -> bytes:
+    """Read a response body, failing as soon as it grows beyond ``limit`` bytes."""
+    if response.content_length is not None and response.content_length > limit:
+        raise FetchError(f"kabinet.yml is too large ({response.content_length} bytes, the limit is {limit}).")
+
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        body.extend(chunk)
+        if len(body) > limit:
+            raise FetchError(f"kabinet.yml is too large (more than {limit} bytes).")
+
+    return bytes(body)
+
+
+async def afetch_kabinet_config(
+    kabinet_url: str,
+    etag: str | None = None,
+    last_modified: str | None = None,
+    digest: str | None = None,
+) -> FetchedConfig:
+    """Fetch the ``deployments.yaml`` at ``kabinet_url`` unless it is unchanged.
+
+    ``etag`` and ``last_modified`` are sent as conditional request headers,
+    ``digest`` is compared against the sha256 of the downloaded body; only a
+    changed file is parsed and validated.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    async with request("GET", kabinet_url, headers=headers) as response:
+        if response.status == 304:
+            return FetchedConfig(config=None, etag=etag, last_modified=last_modified, digest=digest)
+
+        if response.status != 200:
+            raise FetchError(f"This seems to be not an Arkitekt Repository. Failed to fetch kabinet.yml (HTTP {response.status}).")
+
+        body = await aread_limited(response, settings.REPO_CONFIG_MAX_SIZE)
+        fetched = FetchedConfig(
+            config=None,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            digest=hashlib.sha256(body).hexdigest(),
+        )
+
+    if fetched.digest == digest:
+        return fetched
+
+    fetched.config = await aparse_kabinet_config(body)
+    return fetched
+
+
+async def aget_kabinet_config(kabinet_url: str) -> FetchedConfig:
+    """Unconditionally fetch and validate the ``deployments.yaml`` at ``kabinet_url``."""
+    return await afetch_kabinet_config(kabinet_url)
+
+
+async def aremember_config(repo: models.GithubRepo, fetched: FetchedConfig) -> None:
+    """Store the validators of an ingested config, writing only when they changed."""
+    validators = {
+        "config_etag": fetched.etag,
+        "config_last_modified": fetched.last_modified,
+        "config_digest": fetched.digest,
+    }
+    changed = [field for field, value in validators.items() if getattr(repo, field) != value]
+    if not changed:
+        return
+
+    for field in changed:
+        setattr(repo, field, validators[field])
+    await repo.asave(update_fields=changed)
+
+
+async def aingest_fetched(
+    repo: models.GithubRepo,
+    organization: models.Organization,
+    fetched: FetchedConfig,
+) -> IngestionResult:
+    """Ingest a freshly fetched config and remember its validators.
+
+    The validators are only stored once ingestion succeeded, so a failed
+    ingestion is retried by the next scan.
+    """
+    result = await aingest_config(fetched.config, repo, organization)
+    await aremember_config(repo, fetched)
+    return result
+
+
+async def ascan_repo(repo: models.GithubRepo, progress: ProgressCallback | None = None) -> RepoScanResult:
+    """Fetch and ingest one repository, reporting failures instead of raising.
+
+    ``repo.organization`` must already be loaded (``select_related``). When
+    given, ``progress(repo, stage, flavours=..., reason=...)`` is awaited as
+    the scan reaches each :class:`ScanProgress` stage.
+    """
+
+    async def report(stage: ScanProgress, **kwargs) -> None:
+        if progress is None:
+            return
+        try:
+            await progress(repo, stage, **kwargs)
+        except Exception:
+            logger.warning("Reporting %s progress of %s failed", stage.value, repo, exc_info=True)
+
+    try:
+        fetched = await afetch_kabinet_config(
+            repo.kabinet_url,
+            etag=repo.config_etag,
+            last_modified=repo.config_last_modified,
+            digest=repo.config_digest,
+        )
+        await report(ScanProgress.FETCHED)
+        if fetched.config is not None:
+            await report(ScanProgress.PARSED)
+
+        if fetched.config is None:
+            await aremember_config(repo, fetched)
+            await report(ScanProgress.UNCHANGED)
+            return RepoScanResult(repo=repo, status=RepoScanStatus.UNCHANGED)
+
+        ingestion = await aingest_fetched(repo, repo.organization, fetched)
+    except Exception as e:
+        logger.warning("Scanning %s failed", repo, exc_info=True)
+        reason = str(e) or type(e).__name__
+        await report(ScanProgress.FAILED, reason=reason)
+        return RepoScanResult(repo=repo, status=RepoScanStatus.FAILED, reason=reason)
+
+    if not ingestion.touched:
+        await report(ScanProgress.UNCHANGED)
+        return RepoScanResult(repo=repo, status=RepoScanStatus.UNCHANGED, ingestion=ingestion)
+
+    await report(ScanProgress.UPSERTED, flavours=len(ingestion.added) + len(ingestion.changed))
+    return RepoScanResult(repo=repo, status=RepoScanStatus.OK, ingestion=ingestion)
@@ -0,0 +1,155 @@
+"""Background synchronisation of tracked GitHub repositories.
+
+``python manage.py syncrepos`` runs a :class:`RepoSyncWorker`, which keeps at
+most ``REPO_SCAN_CONCURRENCY`` scans in flight and refills free slots with the
+repositories that are due: first those with a pending priority request (see
+:func:`arequest_sync`), then those whose ``next_sync_at`` has passed.
+
+Every stage of a scan is reported to the scan jobs waiting on the repository
+(:mod:`bridge.repo.jobs`). After a scan a repository is rescheduled
+``REPO_SYNC_INTERVAL`` seconds out; a failing one after ``REPO_SYNC_RETRY``
+seconds, doubling per consecutive failure up to ``REPO_SYNC_MAX_BACKOFF``.
+Every delay is jittered by ``REPO_SYNC_JITTER`` so repositories added together
+do not stay in lockstep. Due repositories are claimed with ``SELECT ... FOR
+UPDATE SKIP LOCKED`` and leased to their worker (``scanning_since``) until
+the scan is recorded or ``REPO_SYNC_LEASE`` seconds pass, so several workers
+can run side by side without scanning a repository twice, not even when a
+priority sync is requested while it is being scanned.
+"""
+
+import asyncio
+import datetime
+import logging
+import random
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, QuerySet
+from django.utils import timezone
+
+from bridge import models
+from bridge.enums import RepoScanStatus
+from .jobs import areport_progress
+from .client import aclose_session
+from .scan import RepoScanResult, ascan_repo
+
+logger = logging.getLogger(__name__)
+
+
+def next_sync_delay(failures: int) -> float:
+    """Seconds until the next sync of a repository that failed ``failures`` times in a row."""
+    if failures:
+        delay = min(settings.REPO_SYNC_RETRY * 2 ** min(failures - 1, 32), settings.REPO_SYNC_MAX_BACKOFF)
+    else:
+        delay = settings.REPO_SYNC_INTERVAL
+
+    jitter = settings.REPO_SYNC_JITTER
+    return delay * random.uniform(1 - jitter, 1 + jitter)
+
+
+@transaction.atomic
+def claim_due_repos(limit: int) -> list[models.GithubRepo]:
+    """Lock and claim up to ``limit`` due repositories, priority requests first.
+
+    Repositories with a scan in flight are skipped, even with a priority
+    request, which stays pending for after the scan. Claimed repositories
+    are leased, have their request cleared and are pushed one regular
+    interval out, so a worker that dies mid-scan does not leave them stuck.
+    """
+    now = timezone.now()
+    due = Q(sync_requested_at__isnull=False) | Q(next_sync_at__isnull=True) | Q(next_sync_at__lte=now)
+    scanning = Q(scanning_since__gt=now - datetime.timedelta(seconds=settings.REPO_SYNC_LEASE))
+
+    repos = list(
+        models.GithubRepo.objects.filter(due)
+        .exclude(scanning)
+        .select_related("organization")
+        .select_for_update(skip_locked=True, of=("self",))
+        .order_by(F("sync_requested_at").asc(nulls_last=True), F("next_sync_at").asc(nulls_first=True))[:limit]
+    )
+    if repos:
+        models.GithubRepo.objects.filter(id__in=[repo.id for repo in repos]).update(
+            sync_requested_at=None,
+            scanning_since=now,
+            next_sync_at=now + datetime.timedelta(seconds=settings.REPO_SYNC_INTERVAL),
+        )
+
+    return repos
+
+
+async def arecord_sync(result: RepoScanResult) -> None:
+    """Store the outcome of a scan and schedule the repository's next one."""
+    repo = result.repo
+    now = timezone.now()
+
+    if result.status == RepoScanStatus.FAILED:
+        repo.sync_failures += 1
+        repo.last_sync_error = result.reason
+    else:
+        repo.sync_failures = 0
+        repo.last_sync_error = None
+        repo.last_synced_at = now
+
+    repo.next_sync_at = now + datetime.timedelta(seconds=next_sync_delay(repo.sync_failures))
+    repo.scanning_since = None
+    await repo.asave(update_fields=["sync_failures", "last_sync_error", "last_synced_at", "next_sync_at", "scanning_since"])
+
+
+async def arequest_sync(repos: QuerySet) -> int:
+    """Queue a priority sync for ``repos``; returns how many were queued."""
+    return await repos.aupdate(sync_requested_at=timezone.now())
+
+
+class RepoSyncWorker:
+    """Keeps a bounded pool of repository scans busy with due repositories."""
+
+    def __init__(self, concurrency: int | None = None, poll_interval: float | None = None) -> None:
+        self.concurrency = concurrency or settings.REPO_SCAN_CONCURRENCY
+        self.poll_interval = poll_interval or settings.REPO_SYNC_POLL_INTERVAL
+
+    async def sync(self, repo: models.GithubRepo) -> RepoScanResult:
+        result = await ascan_repo(repo, progress=areport_progress)
+        await arecord_sync(result)
+        logger.info("Synced %s: %s", repo, result.status.value)
+        return result
+
+    async def run(self, once: bool = False) -> list[RepoScanResult]:
+        """Sync due repositories until cancelled.
+
+        With ``once`` the worker stops as soon as no repository is due and no
+        scan is in flight, and returns the results of every scan it ran.
+        """
+        results: list[RepoScanResult] = []
+        pending: set[asyncio.Task] = set()
+
+        try:
+            while True:
+                free = self.concurrency - len(pending)
+                if free:
+                    for repo in await sync_to_async(claim_due_repos)(free):
+                        pending.add(asyncio.create_task(self.sync(repo)))
+
+                if not pending:
+                    if once:
+                        return results
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=None if once else self.poll_interval,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    try:
+                        result = task.result()
+                    except Exception:
+                        logger.exception("Recording a repository sync failed")
+                        continue
+                    if once:
+                        results.append(result)
+        finally:
+            for task in pending:
+                task.cancel()
+            await aclose_session()
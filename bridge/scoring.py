@@ -0,0 +1,232 @@
+"""Scoring flavours against the environment of a backend.
+
+The ``selectors`` of a flavour describe what it needs to run: a CUDA GPU of
+some version, a minimum of memory, a label on the node. A selector is
+``required`` unless it says otherwise and carries a ``weight`` (1 by default).
+Against the features of an :class:`~bridge.inputs.EnvironmentInputModel`, a
+flavour with an unmet required selector cannot run at all; the others are
+ranked by the summed weight of the selectors they meet, so on a GPU node the
+CUDA flavour of a release beats its vanilla one, and on a CPU-only node it is
+never picked.
+
+Selectors are compiled from their stored JSON once per distinct list
+(:func:`compile_selectors`) rather than validated per row. Ingestion also
+stores what the required selectors of a flavour ask for in capability
+columns (:func:`capabilities`): the kinds they require and the highest
+minimum of every field. :func:`runnable_q` compares those to the
+environment with indexed SQL, so flavours that cannot run there are dropped
+(:func:`exclude_unrunnable`, or per environment in batch matching) before
+anything is scored.
+"""
+
+import dataclasses
+import functools
+import json
+import re
+import typing as t
+
+from django.db.models import Q, QuerySet
+
+from bridge.inputs import DeviceFeatureModel, EnvironmentInputModel
+
+# The feature kinds that can meet a selector of a kind.
+PROVIDERS: dict[str, frozenset[str]] = {
+    "cuda": frozenset({"cuda"}),
+    "rocm": frozenset({"rocm"}),
+    "oneapi": frozenset({"oneapi"}),
+    "cpu": frozenset({"cpu"}),
+    "ram": frozenset({"cpu", "ram"}),
+    "label": frozenset({"label"}),
+}
+
+# The selector fields that are minimums, and the feature field they bound.
+MINIMUMS: dict[str, dict[str, str]] = {
+    "cuda": {"cuda_version": "cuda_version", "cuda_cores": "cuda_cores"},
+    "rocm": {"api_version": "api_version"},
+    "oneapi": {"oneapi_version": "oneapi_version"},
+    "cpu": {"min_count": "cpu_count", "frequency": "frequency", "memory": "memory"},
+    "ram": {"min": "memory"},
+}
+
+# The capability column holding the highest required minimum of a feature field.
+COLUMNS: dict[str, str] = {
+    "cuda_version": "min_cuda_version",
+    "cuda_cores": "min_cuda_cores",
+    "api_version": "min_rocm_version",
+    "oneapi_version": "min_oneapi_version",
+    "cpu_count": "min_cpu_count",
+    "frequency": "min_frequency",
+    "memory": "min_memory",
+}
+# Versions are stored as integer arrays, which Postgres compares like tuples.
+VERSIONS = frozenset({"cuda_version", "api_version", "oneapi_version"})
+
+# Services are resolved when a flavour is deployed, not by its environment.
+ALWAYS_MET = frozenset({"service"})
+
+number = re.compile(r"\d+")
+
+
+def level(value: t.Any) -> tuple:
+    """A comparable form of a minimum or a capability: "11.8" -> (11, 8), 4 -> (4,)."""
+    if isinstance(value, str):
+        return tuple(int(part) for part in number.findall(value))
+    return (value,)
+
+
+@dataclasses.dataclass(frozen=True)
+class Requirement:
+    """One compiled selector."""
+
+    kind: str
+    required: bool
+    weight: int
+    minimums: tuple[tuple[str, tuple], ...] = ()
+    label: tuple[str | None, str | None] | None = None
+
+    def met_by(self, feature: "Feature") -> bool:
+        if feature.kind not in PROVIDERS.get(self.kind, ()):
+            return False
+        for field, minimum in self.minimums:
+            capability = feature.levels.get(field)
+            if capability is None or capability < minimum:
+                return False
+        if self.label is not None:
+            key, value = self.label
+            if (key is not None and feature.key != key) or (value is not None and feature.value != value):
+                return False
+        return True
+
+
+@dataclasses.dataclass(frozen=True)
+class Feature:
+    """One compiled environment feature."""
+
+    kind: str
+    levels: dict[str, tuple]
+    key: str | None = None
+    value: str | None = None
+
+    @classmethod
+    def from_model(cls, feature: DeviceFeatureModel) -> "Feature":
+        fields = {field for fields in MINIMUMS.values() for field in fields.values()}
+        levels = {field: level(getattr(feature, field)) for field in fields if getattr(feature, field) is not None}
+        return cls(kind=feature.kind.lower(), levels=levels, key=feature.key, value=feature.value)
+
+
+@dataclasses.dataclass
+class Score:
+    """How well a flavour fits an environment."""
+
+    flavour: t.Any
+    score: int
+    met: list[str]
+    missed: list[str]
+
+
+def compile_selector(selector: dict[str, t.Any]) -> Requirement:
+    kind = selector["kind"]
+    minimums = tuple(
+        (feature_field, level(selector[field])) for field, feature_field in MINIMUMS.get(kind, {}).items() if selector.get(field) is not None
+    )
+    label = (selector.get("key"), selector.get("value")) if kind == "label" else None
+    return Requirement(kind=kind, required=selector.get("required", True), weight=selector.get("weight", 1), minimums=minimums, label=label)
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile(selectors: str) -> tuple[Requirement, ...]:
+    return tuple(compile_selector(selector) for selector in json.loads(selectors))
+
+
+def compile_selectors(selectors: list[dict[str, t.Any]]) -> tuple[Requirement, ...]:
+    """Compile the stored selectors of a flavour; equal lists are compiled once."""
+    return _compile(json.dumps(selectors, sort_keys=True))
+
+
+def compile_environment(environment: EnvironmentInputModel) -> list[Feature]:
+    return [Feature.from_model(feature) for feature in environment.features or []]
+
+
+def score(flavour: t.Any, features: list[Feature]) -> Score | None:
+    """Score ``flavour`` against compiled ``features``, or ``None`` if it cannot run there."""
+    total, met, missed = 0, [], []
+    for requirement in compile_selectors(flavour.selectors):
+        if requirement.kind in ALWAYS_MET or any(requirement.met_by(feature) for feature in features):
+            total += requirement.weight
+            met.append(requirement.kind)
+        elif requirement.required:
+            return None
+        else:
+            missed.append(requirement.kind)
+
+    return Score(flavour=flavour, score=total, met=met, missed=missed)
+
+
+def rank(flavours: t.Iterable[t.Any], environment: EnvironmentInputModel) -> list[Score]:
+    """The flavours that can run in ``environment``, best first.
+
+    Equal scores keep the order of ``flavours``.
+    """
+    features = compile_environment(environment)
+    scores = [s for s in (score(flavour, features) for flavour in flavours) if s is not None]
+    return sorted(scores, key=lambda s: -s.score)
+
+
+def best(flavours: t.Iterable[t.Any], environment: EnvironmentInputModel | None) -> Score | None:
+    """The best of ``flavours`` for ``environment``; without an environment, the first one."""
+    if environment is None:
+        first = next(iter(flavours), None)
+        return None if first is None else Score(flavour=first, score=0, met=[], missed=[])
+
+    ranked = rank(flavours, environment)
+    return ranked[0] if ranked else None
+
+
+def column_value(field: str, minimum: tuple) -> t.Any:
+    if field in VERSIONS:
+        return list(minimum)
+    return minimum[0] if minimum else None
+
+
+def capabilities(selectors: list[dict[str, t.Any]]) -> dict[str, t.Any]:
+    """The capability columns of a flavour with these stored selectors."""
+    kinds: set[str] = set()
+    minimums: dict[str, tuple] = {}
+    for requirement in compile_selectors(selectors):
+        if not requirement.required:
+            continue
+        kinds.add(requirement.kind)
+        for field, minimum in requirement.minimums:
+            minimums[field] = max(minimums.get(field, minimum), minimum)
+
+    columns = {column: column_value(field, minimums[field]) if field in minimums else None for field, column in COLUMNS.items()}
+    return {"required_kinds": sorted(kinds), **columns}
+
+
+def runnable_q(environment: EnvironmentInputModel) -> Q:
+    """The flavours whose capability columns do not rule out ``environment``.
+
+    A flavour is ruled out if it requires a kind of device no feature
+    provides, or a minimum above the best feature that could meet it. This
+    only uses the columns, so scoring still decides whether one feature
+    meets all of a selector.
+    """
+    features = compile_environment(environment)
+    kinds = {feature.kind for feature in features}
+    unavailable = sorted(kind for kind, providers in PROVIDERS.items() if not providers & kinds)
+
+    q = ~Q(required_kinds__overlap=unavailable) if unavailable else Q()
+    for field, column in COLUMNS.items():
+        providers = frozenset().union(*(PROVIDERS[kind] for kind, fields in MINIMUMS.items() if field in fields.values()))
+        levels = [feature.levels[field] for feature in features if feature.kind in providers and field in feature.levels]
+        met = Q(**{f"{column}__isnull": True})
+        if levels:
+            met |= Q(**{f"{column}__lte": column_value(field, max(levels))})
+        q &= met
+
+    return q
+
+
+def exclude_unrunnable(flavours: QuerySet, environment: EnvironmentInputModel) -> QuerySet:
+    """Drop the flavours whose capability columns rule out ``environment`` (see :func:`runnable_q`)."""
+    return flavours.filter(runnable_q(environment))
@@ -0,0 +1,91 @@
+"""Ranked search over definitions, flavours, apps and repositories.
+
+Definitions carry a weighted ``search_vector`` (name over description) that is
+matched with a prefix query, so ``segm`` finds "Segment Image". Names are also
+matched as substrings and, where the server has ``pg_trgm``, fuzzily by
+trigram word similarity, so a typo like ``thresold`` still finds "Threshold".
+Both are served by trigram indexes on ``UPPER(name)`` (see
+``bridge.models.trigram_index``); without ``pg_trgm`` there are no such
+indexes and no fuzzy matches.
+
+:func:`search_q` builds the predicate used by the ``search`` filters and
+:func:`search_hits` ranks matches across entity types for the root ``search``
+query.
+"""
+
+import re
+import typing as t
+from functools import cache
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, QuerySet, Value, When
+from django.db.models.functions import Cast, Upper
+
+from bridge import enums
+
+SEARCH_CONFIG = "english"
+
+word = re.compile(r"\w+")
+
+
+@cache
+def has_trigram() -> bool:
+    """Whether ``pg_trgm`` is installed, which fuzzy matching needs."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        return cursor.fetchone()[0]
+
+
+def prefix_query(value: str) -> SearchQuery | None:
+    """A full-text query requiring every word of ``value``, the last ones as prefixes."""
+    words = word.findall(value)
+    if not words:
+        return None
+    return SearchQuery(" & ".join(f"{w}:*" for w in words), search_type="raw", config=SEARCH_CONFIG)
+
+
+def search_q(prefix: str, value: str, *fields: str, vector: str | None = None) -> Q:
+    """Match ``value`` against ``fields`` (and the search ``vector``, if the model has one)."""
+    q = Q()
+    for field in fields:
+        q |= Q(**{f"{prefix}{field}__icontains": value})
+        if has_trigram():
+            q |= Q(TrigramWordSimilar(Upper(f"{prefix}{field}"), Upper(Value(value))))
+
+    query = prefix_query(value) if vector else None
+    if query is not None:
+        q |= Q(**{f"{prefix}{vector}": query})
+
+    return q
+
+
+def rank(value: str, field: str, vector: str | None = None):
+    """How well a row matches ``value``: its full-text rank plus the similarity of ``field``."""
+    score = Value(0.0) if not has_trigram() else TrigramWordSimilarity(value, field)
+    query = prefix_query(value) if vector else None
+    if query is not None:
+        score = score + SearchRank(F(vector), query)
+    # Substring matches outrank rows that only match fuzzily.
+    score = score + Case(When(Q(**{f"{field}__icontains": value}), then=Value(1.0)), default=Value(0.0))
+    return Cast(score, FloatField())
+
+
+def search_hits(querysets: dict[enums.SearchKind, tuple[QuerySet, str, str | None]], value: str, limit: int) -> list[dict[str, t.Any]]:
+    """Rank the matches of ``value`` in every queryset and return the best ``limit``.
+
+    ``querysets`` maps each kind to its (already scoped) queryset, the field
+    to match and label the hits by and the search vector, if any. The
+    branches are combined with ``UNION ALL``, so this is one query.
+    """
+    branches = [
+        queryset.filter(search_q("", value, field, vector=vector))
+        # Prefixed, as the models have fields of these names (Definition.kind).
+        .annotate(hit_kind=Value(kind.value), hit_label=F(field), hit_rank=rank(value, field, vector))
+        .values("id", "hit_kind", "hit_label", "hit_rank")
+        for kind, (queryset, field, vector) in querysets.items()
+    ]
+
+    first, *rest = branches
+    return list(first.union(*rest, all=True).order_by("-hit_rank", "hit_label")[:limit])
@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save, post_delete
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from bridge import models, channel_signals, channels
+from bridge import models, channel_signals, channels, demand_cache
 from typing import Type
 from django.conf import settings
 from authentikate.models import Organization
@@ -34,6 +37,26 @@ def publish_pod_del(sender: Type[models.Pod], instance: models.Pod = None, creat
     )
 
 
+@receiver(pre_save, sender=models.Definition)
+def fill_definition_shape(sender: Type[models.Definition], instance: models.Definition, **kwargs) -> None:
+    """Keeps the shape columns of a saved definition in line with its ports (ingestion sets them itself)"""
+    for column, value in models.Definition.port_shape(instance.args, instance.returns).items():
+        setattr(instance, column, value)
+
+
+@receiver(post_save, sender=models.Definition)
+def rebuild_definition_ports(sender: Type[models.Definition], instance: models.Definition, **kwargs) -> None:
+    """Re-unnests the ports of a saved definition (e.g. edited in the admin), so demands see them"""
+    models.DefinitionPort.rebuild([instance])
+    transaction.on_commit(partial(demand_cache.bump_generation, instance.organization_id))
+
+
+@receiver(post_save, sender=models.StateDefinition)
+def rebuild_state_ports(sender: Type[models.StateDefinition], instance: models.StateDefinition, **kwargs) -> None:
+    """Re-unnests the ports of a saved state definition, so state demands see them"""
+    models.StateDefinitionPort.rebuild([instance])
+
+
 def _iter_default_repo_identifiers() -> list[str]:
     identifiers: list[str] = []
 
@@ -1,3 +1,4 @@
 from .pod import pod, pods
+from .scan_job import scan_job
 
-__all__ = ["pod", "pods"]
+__all__ = ["pod", "pods", "scan_job"]
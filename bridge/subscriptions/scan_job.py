@@ -0,0 +1,61 @@
+from kante.types import Info
+from bridge import models, messages
+from bridge.channel_signals import ScanJobSignal
+from bridge.enums import ScanJobStatus
+from bridge.repo.jobs import scan_job_group
+from bridge.scoping import aget_for_org
+from typing import AsyncGenerator
+from bridge import channels
+import strawberry
+
+
+def progress_message(signal: ScanJobSignal) -> messages.ScanJobProgressMessage:
+    return messages.ScanJobProgressMessage(
+        job=str(signal.job),
+        repo=str(signal.repo),
+        status=signal.status,
+        flavours=signal.flavours,
+        reason=signal.reason,
+        done=signal.done,
+    )
+
+
+async def scan_job(
+    info: Info,
+    job_id: strawberry.ID,
+) -> AsyncGenerator[messages.ScanJobProgressMessage, None]:
+    """Stream the per-repository progress of a scan job until it is done.
+
+    The job's group is joined before the job is read, so no event is lost in
+    between. The current state of every repository is sent first (the last
+    entry marked ``done`` if the job already finished, which ends the
+    stream), then the live events.
+    """
+
+    job = await aget_for_org(models.ScanJob, info, id=job_id)
+    channel = channels.scan_job_channel
+
+    async with info.context.consumer.listen_to_channel(channel.message_type, groups=[scan_job_group(job.id)]) as events:
+        job = await models.ScanJob.objects.aget(id=job.id)
+        done = job.status == ScanJobStatus.DONE.value
+
+        entries = [entry async for entry in job.repos.order_by("id")]
+        for index, entry in enumerate(entries):
+            yield progress_message(
+                ScanJobSignal(
+                    job=job.id,
+                    repo=entry.repo_id,
+                    status=entry.status,
+                    flavours=entry.flavours,
+                    reason=entry.reason,
+                    done=done and index == len(entries) - 1,
+                )
+            )
+        if done:
+            return
+
+        async for event in events:
+            signal = channel.model.model_validate(event.get("message"))
+            yield progress_message(signal)
+            if signal.done:
+                return
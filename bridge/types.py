@@ -88,6 +88,12 @@ class GithubRepo:
     updated_at: datetime.datetime = strawberry_django.field(description="When this repository was last updated.")
     added_at: datetime.datetime = strawberry_django.field(description="When this repository was first added to Kabinet.")
     organization: Organization = strawberry_django.field(description="The organization that owns this repository.")
+    last_synced_at: datetime.datetime | None = strawberry_django.field(description="When this repository was last scanned successfully.")
+    next_sync_at: datetime.datetime | None = strawberry_django.field(description="When the background sync will scan this repository next.")
+    sync_requested_at: datetime.datetime | None = strawberry_django.field(description="When a priority scan was queued, if one is still pending.")
+    scanning_since: datetime.datetime | None = strawberry_django.field(description="When the background sync started scanning this repository, if a scan is in flight.")
+    sync_failures: int = strawberry_django.field(description="How many scans of this repository failed in a row.")
+    last_sync_error: str | None = strawberry_django.field(description="Why the last scan failed, if it did.")
 
     @strawberry_django.field(description="The URL for opening a new issue against this repository on GitHub.")
     def issue_url(self) -> str:
@@ -102,6 +108,37 @@ class GithubRepo:
         return build_prescoped_queryset(info, queryset, field="organization")
 
 
+@strawberry.type(description="One ranked result of a search across entity types.")
+class SearchHit:
+    kind: enums.SearchKind = strawberry.field(description="What kind of entity matched.")
+    id: strawberry.ID = strawberry.field(description="The ID of the entity, to be fetched with the query of its kind.")
+    label: str = strawberry.field(description="The name (or identifier) the entity matched on.")
+    rank: float = strawberry.field(description="How well the entity matched; higher is better.")
+
+
+@strawberry_django.type(models.ScanJobRepo, description="The progress of one repository within a scan job.")
+class ScanJobRepo:
+    id: auto
+    repo: GithubRepo = strawberry_django.field(description="The repository being scanned.")
+    status: enums.ScanProgress = strawberry_django.field(description="How far the scan of this repository got.")
+    flavours: int = strawberry_django.field(description="How many flavours the scan upserted.")
+    reason: str | None = strawberry_django.field(description="Why the scan failed, if it did.")
+    updated_at: datetime.datetime = strawberry_django.field(description="When this repository last made progress.")
+
+
+@strawberry_django.type(models.ScanJob, pagination=True, description="A background scan of a set of tracked GitHub repositories.")
+class ScanJob:
+    id: auto
+    status: enums.ScanJobStatus = strawberry_django.field(description="Whether the job is queued, running or done.")
+    repos: List[ScanJobRepo] = strawberry_django.field(description="The progress of every repository of the job.")
+    created_at: datetime.datetime = strawberry_django.field(description="When the job was started.")
+    finished_at: datetime.datetime | None = strawberry_django.field(description="When the last repository of the job was scanned.")
+
+    @classmethod
+    def get_queryset(cls, queryset, info: Info):
+        return build_prescoped_queryset(info, queryset)
+
+
 GithubRepoStats, GithubRepoStatsResolver = create_stats_type(
     model=models.GithubRepo,
     filters=filters.GithubRepoFilter,
@@ -141,11 +178,19 @@ class Release:
     version: str = strawberry_django.field(description="The semantic version of this release.")
     app: App = strawberry_django.field(description="The app this release belongs to.")
     scopes: List[str] = strawberry_django.field(description="The OAuth2 scopes this release requires.")
-    logo: Optional[str] = strawberry_django.field(description="The stored logo of this release.")
     original_logo: Optional[str] = strawberry_django.field(description="The original (upstream) logo URL of this release.")
     entrypoint: str = strawberry_django.field(description="The entrypoint used to start the app.")
     flavours: List["Flavour"] = strawberry_django.field(description="The flavours (buildable variants) available for this release.")
 
+    @strawberry_django.field(description="A URL of the stored copy of this release's logo, if it was fetched and the media datalayer is configured.", select_related=["stored_logo__store"])
+    def logo(self, info: Info, host: str | None = None) -> Optional[str]:
+        from datalayer.datalayer import get_current_datalayer
+
+        stored = self.stored_logo
+        if stored is None or stored.store is None:
+            return None
+        return stored.store.get_presigned_url(datalayer=get_current_datalayer(), host=host)
+
     @strawberry_django.field(description="Whether this release is currently deployed somewhere.")
     def installed(self, info: Info) -> bool:
         return True
@@ -373,6 +418,21 @@ class Definition:
         return build_prescoped_queryset(info, queryset)
 
 
+@strawberry.type(description="The best flavour for one request of a batch flavour match, with its score breakdown.")
+class FlavourMatch:
+    request: int = strawberry.field(description="The position of the request in the batch.")
+    flavour: Optional[Flavour] = strawberry.field(description="The best flavour, or null if no flavour fits the request.")
+    score: int = strawberry.field(description="The summed weight of the selectors the flavour meets in the requested environment.")
+    met: List[str] = strawberry.field(description="The kinds of the selectors the environment meets.")
+    missed: List[str] = strawberry.field(description="The kinds of the optional selectors the environment does not meet.")
+
+
+@strawberry.type(description="The definitions matching one action demand.")
+class ActionDemandMatches:
+    demand: int = strawberry.field(description="The position of the demand in the request.")
+    definitions: List[Definition] = strawberry.field(description="The matching definitions, by ID.")
+
+
 @strawberry_django.type(
     models.LogDump,
     filters=filters.LogDumpFilter,
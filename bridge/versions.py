@@ -0,0 +1,264 @@
+"""Semantic versions of releases.
+
+``Release.version`` is free text, so ordering by it is lexical ("0.10.0" <
+"0.9.0"). Ingestion parses it into ``version_major``, ``version_minor``,
+``version_patch``, ``version_prerelease`` and ``version_prerelease_key`` (see
+:func:`parse`); versions that are not semver leave them ``NULL``. Releases
+are ordered by these columns (:func:`ordering`) and constraints like ``^1.2``
+are turned into conditions on them (:func:`constraint_q`), so the latest
+compatible release of an app is found by an index scan.
+
+Constraints follow npm/cargo: ``^1.2`` (compatible, ``>=1.2.0 <2.0.0``),
+``~1.2`` (``>=1.2.0 <1.3.0``), comparisons (``>=1.0 <2``), partial or
+wildcard versions (``1.2``, ``1.x``, ``*``), space- or comma-separated
+comparators that must all hold, and ``||`` between alternatives.
+Prereleases are ordered before their release with semver precedence (see
+:func:`prerelease_key`). Like npm, a range only matches a prerelease if one
+of its comparators names a prerelease of the same ``major.minor.patch``
+(``>=1.3.0-rc.1 <1.4`` matches ``1.3.0-rc.2``, ``<2.0.0`` never matches
+``2.0.0-alpha``), unless prereleases are included explicitly.
+"""
+
+import functools
+import re
+from operator import or_
+import typing as t
+
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+from django.db.models.expressions import OrderBy
+
+version_re = re.compile(r"^v?(?P<major>\d+)(?:\.(?P<minor>\d+))?(?:\.(?P<patch>\d+))?(?:-(?P<prerelease>[0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$")
+partial_re = re.compile(r"^v?(?P<major>\d+|[xX*])(?:\.(?P<minor>\d+|[xX*]))?(?:\.(?P<patch>\d+|[xX*]))?(?:-(?P<prerelease>[0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$")
+comparator_re = re.compile(r"^(?P<operator>\^|~|>=|<=|>|<|=)?\s*(?P<version>\S+)$")
+
+COLUMNS = ("version_major", "version_minor", "version_patch")
+KEY = "version_prerelease_key"
+
+Triple = tuple[int, int, int]
+# A comparison ``operator version`` with the prerelease key of the version, if it has one.
+Bound = tuple[str, Triple, t.Optional[list[str]]]
+
+
+def prerelease_key(prerelease: str | None) -> list[str] | None:
+    """A key of a prerelease tag that orders like semver precedence.
+
+    Each dot-separated identifier becomes a string that compares correctly
+    byte by byte (the column uses the "C" collation): numeric identifiers
+    get a ``0`` and their length in front, so they compare as numbers and
+    below alphanumeric identifiers, which get a ``1``. Arrays compare
+    element by element and a shorter array sorts first, as semver wants.
+    """
+    if prerelease is None:
+        return None
+    return [f"0{len(part):03d}{part}" if part.isdigit() else f"1{part}" for part in prerelease.split(".")]
+
+
+# The key of ``-0``, below every other prerelease: ``<2.0.0-0`` excludes the prereleases of 2.0.0.
+LOWEST = prerelease_key("0")
+
+
+def parse(version: str) -> dict[str, t.Any]:
+    """The version columns of a release with this ``version``."""
+    match = version_re.match(version.strip())
+    if match is None:
+        return {"version_major": None, "version_minor": None, "version_patch": None, "version_prerelease": None, KEY: None}
+
+    return {
+        "version_major": int(match["major"]),
+        "version_minor": int(match["minor"] or 0),
+        "version_patch": int(match["patch"] or 0),
+        "version_prerelease": match["prerelease"],
+        KEY: prerelease_key(match["prerelease"]),
+    }
+
+
+def ordering(prefix: str = "", descending: bool = False, parsed: bool = False) -> list[OrderBy]:
+    """Order releases by version; versions that are not semver go last either way.
+
+    A release without a prerelease (``NULL``) sorts after its prereleases,
+    which is Postgres' default placement of ``NULL`` in both directions.
+    Pass ``parsed`` when only semver releases are selected: the leading
+    check for unparsed versions is then left out, so the order can follow
+    the ``(app, major, minor, patch)`` index instead of sorting every row.
+    """
+    columns = [F(f"{prefix}{column}") for column in (*COLUMNS, KEY, "version")]
+    order = [column.desc() if descending else column.asc() for column in columns]
+    if parsed:
+        return order
+    unparsed = ExpressionWrapper(Q(**{f"{prefix}version_major__isnull": True}), output_field=BooleanField())
+    return [unparsed.asc(), *order]
+
+
+def compare(prefix: str, operator: str, version: Triple, fixed: tuple[int, ...] = ()) -> Q:
+    """``(major, minor, patch) <operator> version`` as a condition on the columns.
+
+    The comparison is spelled out part by part. ``fixed`` are leading parts
+    already known to hold (see :func:`fixed_parts`), which are compared
+    here rather than in the database. Without them the major part is also
+    bounded on its own, which is redundant but lets Postgres answer the
+    comparison as a range of the ``(app, major, minor, patch)`` index.
+    """
+    for value, part in zip(fixed, version):
+        if value != part:
+            return Q() if (value > part) == operator.startswith(">") and operator != "=" else nothing(prefix)
+    columns = [f"{prefix}{column}" for column in COLUMNS][len(fixed) :]
+    version = version[len(fixed) :]  # type: ignore[assignment]
+    if operator == "=":
+        return Q(**dict(zip(columns, version)))
+    if not columns:
+        return Q() if operator in (">=", "<=") else nothing(prefix)
+
+    strict, last = {">": ("gt", "gt"), ">=": ("gt", "gte"), "<": ("lt", "lt"), "<=": ("lt", "lte")}[operator]
+    q = Q(**{f"{columns[-1]}__{last}": version[-1]})
+    for column, part in zip(columns[-2::-1], version[-2::-1]):
+        q = Q(**{f"{column}__{strict}": part}) | (Q(**{column: part}) & q)
+    if fixed:
+        return q
+
+    leading = "gte" if operator.startswith(">") else "lte"
+    if operator == "<" and version[1:] == (0, 0):
+        leading = "lt"
+    return Q(**{f"{columns[0]}__{leading}": version[0]}) & q
+
+
+def nothing(prefix: str) -> Q:
+    """A condition no release meets."""
+    return Q(**{f"{prefix}pk__in": []})
+
+
+def release_compare(prefix: str, operator: str, version: Triple, key: list[str] | None, fixed: tuple[int, ...] = ()) -> Q:
+    """``operator version`` for releases without a prerelease tag.
+
+    A release is above the prereleases of its own version, so against one
+    of those only its ``major.minor.patch`` counts.
+    """
+    if key is None:
+        return compare(prefix, operator, version, fixed)
+    if operator == "=":
+        return nothing(prefix)
+    return compare(prefix, ">=" if operator.startswith(">") else "<", version, fixed)
+
+
+def prerelease_compare(prefix: str, operator: str, version: Triple, key: list[str] | None) -> Q:
+    """``operator version`` for releases with a prerelease tag.
+
+    If the ``major.minor.patch`` are equal the prerelease keys decide, and
+    a version without a tag is above all of its prereleases.
+    """
+    same = compare(prefix, "=", version)
+    if operator == "=":
+        return same & Q(**{f"{prefix}{KEY}": key}) if key is not None else nothing(prefix)
+
+    strict = ">" if operator.startswith(">") else "<"
+    if key is None:
+        return compare(prefix, ">", version) if strict == ">" else compare(prefix, "<=", version)
+    lookup = {">": "gt", ">=": "gte", "<": "lt", "<=": "lte"}[operator]
+    return compare(prefix, strict, version) | (same & Q(**{f"{prefix}{KEY}__{lookup}": key}))
+
+
+def bounds(operator: str | None, version: str) -> list[Bound]:
+    """The comparisons one comparator of a constraint stands for.
+
+    Upper bounds derived from a partial version or a range exclude the
+    prereleases of that bound (``^1.2`` is ``>=1.2.0 <2.0.0-0``).
+    """
+    match = partial_re.match(version)
+    if match is None:
+        raise ValueError(f"Invalid version in constraint: {version!r}")
+
+    parts: list[int] = []
+    for part in (match["major"], match["minor"], match["patch"]):
+        if part is None or part in "xX*":
+            break
+        parts.append(int(part))
+    if match["prerelease"] is not None and len(parts) < 3:
+        raise ValueError(f"Prerelease of a partial version in constraint: {version!r}")
+    lower: Triple = tuple(parts + [0] * (3 - len(parts)))  # type: ignore[assignment]
+    key = prerelease_key(match["prerelease"])
+
+    def bump(index: int) -> Triple:
+        return tuple([*lower[:index], lower[index] + 1] + [0] * (2 - index))  # type: ignore[return-value]
+
+    if not parts:
+        return []
+
+    if operator == "^":
+        # The leftmost non-zero part may not change (^0.2 is >=0.2.0 <0.3.0).
+        index = next((i for i, part in enumerate(parts) if part != 0), len(parts) - 1)
+        return [(">=", lower, key), ("<", bump(index), LOWEST)]
+    if operator == "~":
+        return [(">=", lower, key), ("<", bump(min(1, len(parts) - 1)), LOWEST)]
+    if operator in (None, "="):
+        if len(parts) == 3:
+            return [("=", lower, key)]
+        return [(">=", lower, None), ("<", bump(len(parts) - 1), LOWEST)]
+    if operator == "<=" and len(parts) < 3:
+        return [("<", bump(len(parts) - 1), LOWEST)]
+    if operator == "<" and len(parts) < 3:
+        return [("<", lower, LOWEST)]
+    if operator == ">" and len(parts) < 3:
+        return [(">=", bump(len(parts) - 1), None)]
+    return [(operator, lower, key)]
+
+
+def names_prerelease(bound: Bound) -> bool:
+    """Whether ``bound`` came from a comparator naming a prerelease (rather than an implied ``-0`` upper bound)."""
+    operator, _, key = bound
+    return key is not None and not (operator == "<" and key == LOWEST)
+
+
+def fixed_parts(comparisons: list[Bound]) -> tuple[int, ...]:
+    """The leading parts every release within ``comparisons`` shares.
+
+    ``^1.2`` is ``>=1.2.0 <2.0.0``, so the major part is 1. Stating it as an
+    equality turns the rest of the comparison into a range of the index
+    (rather than a scan of everything below 2.0.0).
+    """
+    lowers = [version for operator, version, _ in comparisons if operator in (">", ">=")]
+    uppers = [version for operator, version, _ in comparisons if operator == "<"]
+    if not lowers or not uppers:
+        return ()
+
+    lower, upper = max(lowers), min(uppers)
+    fixed = []
+    for index in range(3):
+        if lower[index] == upper[index]:
+            fixed.append(lower[index])
+            continue
+        if upper[index] == lower[index] + 1 and not any(upper[index + 1 :]):
+            fixed.append(lower[index])
+        break
+    return tuple(fixed)
+
+
+def constraint_q(constraint: str, prefix: str = "", include_prereleases: bool = False) -> Q:
+    """The releases satisfying ``constraint``, as a condition on the version columns.
+
+    Prereleases only match if a comparator of the same alternative names a
+    prerelease of their ``major.minor.patch``, or if ``include_prereleases``.
+    """
+    alternatives = []
+    for alternative in constraint.split("||"):
+        comparisons: list[Bound] = []
+        comparators = re.sub(r"(\^|~|>=|<=|>|<|=)\s+", r"\1", alternative).replace(",", " ").split()
+        for comparator in comparators or ["*"]:
+            match = comparator_re.match(comparator)
+            if match is None:
+                raise ValueError(f"Invalid constraint: {constraint!r}")
+            comparisons.extend(bounds(match["operator"], match["version"]))
+
+        fixed = fixed_parts(comparisons)
+        releases = Q(**{f"{prefix}version_major__isnull": False, f"{prefix}version_prerelease__isnull": True}, **dict(zip((f"{prefix}{column}" for column in COLUMNS), fixed)))
+        prereleases = Q(**{f"{prefix}version_major__isnull": False, f"{prefix}version_prerelease__isnull": False})
+        for comparison in comparisons:
+            releases &= release_compare(prefix, *comparison, fixed)
+            prereleases &= prerelease_compare(prefix, *comparison)
+
+        named = sorted({comparison[1] for comparison in comparisons if names_prerelease(comparison)})
+        if include_prereleases:
+            alternatives.append(releases | prereleases)
+        elif named:
+            alternatives.append(releases | (prereleases & functools.reduce(or_, (compare(prefix, "=", version) for version in named))))
+        else:
+            alternatives.append(releases)
+    return functools.reduce(or_, alternatives)
@@ -67,6 +67,44 @@ class RedisSettings(BaseModel):
     port: int = Field(default=6379, description="Redis port.")
 
 
+class RepoSyncSettings(BaseModel):
+    """How tracked GitHub repositories are fetched and rescanned."""
+
+    raw_url: str = Field(default="https://raw.githubusercontent.com", description="Base URL that raw repository files such as ``deployments.yaml`` are fetched from.")
+    concurrency: int = Field(default=8, ge=1, description="Maximum number of repositories fetched and ingested at the same time.")
+    timeout: float = Field(default=30.0, gt=0, description="Total timeout for a single repository fetch, in seconds.")
+    interval: float = Field(default=3600.0, gt=0, description="Seconds between two background syncs of a healthy repository.")
+    jitter: float = Field(default=0.1, ge=0, lt=1, description="Fraction by which every sync delay is randomly stretched or shrunk, so repositories added together drift apart.")
+    retry: float = Field(default=60.0, gt=0, description="Seconds before the first retry of a failing repository; doubles with every further failure.")
+    max_backoff: float = Field(default=86400.0, gt=0, description="Upper bound for the retry delay of a failing repository, in seconds.")
+    poll_interval: float = Field(default=5.0, gt=0, description="Seconds the sync worker waits before looking for due repositories again when it is idle.")
+    lease: float = Field(default=600.0, gt=0, description="Seconds a claimed repository stays with the worker scanning it; after that a worker that died mid-scan no longer blocks it.")
+    max_config_size: int = Field(default=10 * 1024 * 1024, ge=1, description="Largest ``deployments.yaml`` accepted, in bytes; larger files are rejected before they are parsed.")
+    parse_workers: int = Field(default=2, ge=1, description="Threads that parse and validate ``deployments.yaml`` files off the event loop.")
+
+
+class HttpClientSettings(BaseModel):
+    """The pooled HTTP client used for outbound fetches (configs, logos)."""
+
+    max_connections: int = Field(default=32, ge=1, description="Maximum number of open connections in the pool.")
+    max_connections_per_host: int = Field(default=16, ge=0, description="Maximum number of open connections to a single host (``0`` for no limit).")
+    keepalive_timeout: float = Field(default=30.0, gt=0, description="Seconds an idle pooled connection is kept open for reuse.")
+    dns_cache_ttl: int = Field(default=300, ge=0, description="Seconds resolved host names are cached.")
+    connect_timeout: float = Field(default=10.0, gt=0, description="Timeout for establishing a connection, in seconds.")
+    retries: int = Field(default=2, ge=0, description="How often a request failing with a connection error, a timeout, 429 or 5xx is retried.")
+    retry_backoff: float = Field(default=0.5, ge=0, description="Seconds before the first retry; doubles with every further retry.")
+
+
+class DemandCacheSettings(BaseModel):
+    """Caching of the definitions that port demands match."""
+
+    ttl: int = Field(default=900, ge=0, description="Seconds a demand result is kept in the shared cache.")
+    local_size: int = Field(default=1024, ge=0, description="Demand results kept in each process, in front of the shared cache (``0`` to disable).")
+    max_ids: int = Field(default=1000, ge=0, description="Demand results matching more definitions than this are not cached; they are matched in a subquery instead.")
+    matcher: bool = Field(default=False, description="Answer port demands from an in-process index of each organization's ports instead of SQL, where possible.")
+    matcher_max_ports: int = Field(default=200_000, ge=0, description="Organizations with more ports than this are always matched in SQL.")
+
+
 class Settings(BaseSettings):
     """Top-level, validated configuration for the kabinet service."""
 
@@ -79,6 +117,10 @@ class Settings(BaseSettings):
     ensured_repos: List[str] = Field(default_factory=list, description="Container repos cloned/ensured on boot (``owner/repo:ref``).")
     repo_map: List[Dict[str, Any]] = Field(default_factory=list, description="Per-organization repository mappings.")
     default_repos: List[str] = Field(default_factory=list, description="Default repositories provisioned for new installs (``owner/repo:ref``).")
+    repo_sync: RepoSyncSettings = Field(default_factory=RepoSyncSettings, description="Repository fetching and rescanning.")
+    http_client: HttpClientSettings = Field(default_factory=HttpClientSettings, description="Outbound HTTP client.")
+    demand_cache: DemandCacheSettings = Field(default_factory=DemandCacheSettings, description="Demand result caching.")
+    datalayer: Dict[str, Any] = Field(default_factory=dict, description="S3 datalayer connection and buckets (see ``datalayer.datalayer.DatalayerConfig``); release logos are stored in its ``media`` bucket.")
 
     @classmethod
     def settings_customise_sources(
@@ -9,7 +9,7 @@ from bridge import messages
 import strawberry_django
 from koherent.strawberry.extension import KoherentExtension
 from authentikate.strawberry.extension import AuthentikateExtension
-from typing import List
+from typing import List, Optional
 from rekuest_core.constants import interface_types
 from rekuest_core.scalars import scalar_map as rscalar_map
 from bridge.scalars import scalar_map as bscalar_map
@@ -23,17 +23,34 @@ class Query:
 
     github_repo: types.GithubRepo = strawberry_django.field(resolver=queries.github_repo, description="Return a single tracked GitHub repository by its ID.")
     definition: types.Definition = strawberry_django.field(resolver=queries.definition, description="Return a single action definition by its ID.")
+    compatible_definitions: List[types.Definition] = strawberry_django.field(
+        resolver=queries.compatible_definitions,
+        description="List the definitions that can consume the returns of a definition (CONSUMERS) or whose returns it can consume (PRODUCERS).",
+    )
+    resolve_action_demands: List[types.ActionDemandMatches] = strawberry_django.field(
+        resolver=queries.resolve_action_demands,
+        description="Return the definitions matching each of the given action demands, in request order. All demands are resolved in one database round trip.",
+    )
     release: types.Release = strawberry_django.field(resolver=queries.release, description="Return a single app release by its ID.")
+    latest_release: Optional[types.Release] = strawberry_django.field(
+        resolver=queries.latest_release,
+        description="Return the highest semver release of an app (by ID or identifier) matching a constraint such as '^1.2', '~1.2' or '>=1.0 <2'. Prereleases are skipped unless the constraint names a prerelease of the same version or they are requested.",
+    )
     resource: types.Resource = strawberry_django.field(resolver=queries.resource, description="Return a single backend resource by its ID.")
     flavour: types.Flavour = strawberry_django.field(resolver=queries.flavour, description="Return a single flavour (a buildable variant of a release) by its ID.")
     deployment: types.Deployment = strawberry_django.field(resolver=queries.deployment, description="Return a single deployment by its ID.")
     backend: types.Backend = strawberry_django.field(resolver=queries.backend, description="Return a single backend by its ID.")
     pod: types.Pod = strawberry_django.field(resolver=queries.pod, description="Return a single pod by its ID.")
     pod_for_agent = strawberry_django.field(resolver=queries.pod_for_agent, description="Return the pod that a given agent (client) is running for a deployment.")
+    scan_job: types.ScanJob = strawberry_django.field(resolver=queries.scan_job, description="Return a single scan job by its ID.")
     me: types.User = strawberry_django.field(resolver=queries.me, description="Return the currently authenticated user.")
-    match_flavour: types.Flavour = strawberry_django.field(
+    match_flavour: Optional[types.Flavour] = strawberry_django.field(
         resolver=queries.match_flavour,
-        description="Return the flavour that best matches the requested release, actions and target environment.",
+        description="Return the flavour that best matches the requested release, actions and target environment, or null if none matches or can run there.",
+    )
+    match_flavours: List[types.FlavourMatch] = strawberry_django.field(
+        resolver=queries.match_flavours,
+        description="Return the best flavour for each of many (release, actions, environment) requests, with its score breakdown, in request order. All requests are answered in one database round trip.",
     )
     flavours: List[types.Flavour] = strawberry_django.field(description="List all flavours visible to the current organization.")
     releases: List[types.Release] = strawberry_django.field(description="List all app releases visible to the current organization.")
@@ -42,11 +59,17 @@ class Query:
     github_repos: List[types.GithubRepo] = strawberry_django.field(description="List all tracked GitHub repositories visible to the current organization.")
     definitions: List[types.Definition] = strawberry_django.field(description="List all action definitions visible to the current organization.")
     pods: List[types.Pod] = strawberry_django.field(description="List all pods visible to the current organization.")
+    scan_jobs: List[types.ScanJob] = strawberry_django.field(description="List all scan jobs of the current organization, newest first.")
 
     backends: List[types.Backend] = strawberry_django.field(description="List all backends visible to the current organization.")
 
     my_pod_at = strawberry_django.field(resolver=queries.my_pod_at, description="Let a backend discover one of its own pods by local identifier.")
 
+    search: List[types.SearchHit] = strawberry_django.field(
+        resolver=queries.search,
+        description="Search definitions, flavours, apps and repositories of the current organization by name, ranked best first. Matches prefixes and, where the server supports it, near misses.",
+    )
+
     # Stats
     github_repo_stats: types.GithubRepoStats = strawberry_django.field(
         resolver=types.GithubRepoStatsResolver,
@@ -60,11 +83,16 @@ class Mutation:
 
     scan_repo: types.GithubRepo = strawberry_django.mutation(
         resolver=mutations.scan_repo,
-        description="Scan a tracked GitHub repository for app manifests and update its flavours.",
+        description="Queue a priority scan of a tracked GitHub repository for app manifests. The repository is scanned in the background.",
     )
     rescan_repos: List[types.GithubRepo] = strawberry_django.mutation(
         resolver=mutations.rescan_repos,
-        description="Rescan every tracked GitHub repository for new or updated app manifests.",
+        description="Queue a priority rescan of every tracked GitHub repository. The repositories are scanned in the background.",
+    )
+
+    start_scan: types.ScanJob = strawberry_django.mutation(
+        resolver=mutations.start_scan,
+        description="Start a background scan of some or all tracked GitHub repositories. Follow it with the scanJob query or subscription.",
     )
 
     create_app_image = strawberry_django.mutation(
@@ -127,6 +155,10 @@ class Subscription:
         resolver=subscriptions.pods,
         description="Subscribe to status updates for all pods visible to the current organization.",
     )
+    scan_job: messages.ScanJobProgressMessage = strawberry.subscription(
+        resolver=subscriptions.scan_job,
+        description="Stream the per-repository progress of a scan job until it is done.",
+    )
 
 
 schema = strawberry.Schema(
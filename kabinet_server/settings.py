@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "strawberry_django",
     "channels_redis",
     "guardian",
@@ -124,6 +125,33 @@ STRAWBERRY_DJANGO = {
 REPO_MAP = conf.repo_map
 ENSURED_REPOS = conf.ensured_repos
 DEFAULT_REPOS = conf.default_repos
+GITHUB_RAW_URL = conf.repo_sync.raw_url
+REPO_SCAN_CONCURRENCY = conf.repo_sync.concurrency
+REPO_SCAN_TIMEOUT = conf.repo_sync.timeout
+REPO_SYNC_INTERVAL = conf.repo_sync.interval
+REPO_SYNC_JITTER = conf.repo_sync.jitter
+REPO_SYNC_RETRY = conf.repo_sync.retry
+REPO_SYNC_MAX_BACKOFF = conf.repo_sync.max_backoff
+REPO_SYNC_POLL_INTERVAL = conf.repo_sync.poll_interval
+REPO_SYNC_LEASE = conf.repo_sync.lease
+REPO_CONFIG_MAX_SIZE = conf.repo_sync.max_config_size
+REPO_PARSE_WORKERS = conf.repo_sync.parse_workers
+
+HTTP_CLIENT_MAX_CONNECTIONS = conf.http_client.max_connections
+HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST = conf.http_client.max_connections_per_host
+HTTP_CLIENT_KEEPALIVE_TIMEOUT = conf.http_client.keepalive_timeout
+HTTP_CLIENT_DNS_CACHE_TTL = conf.http_client.dns_cache_ttl
+HTTP_CLIENT_CONNECT_TIMEOUT = conf.http_client.connect_timeout
+HTTP_CLIENT_RETRIES = conf.http_client.retries
+HTTP_CLIENT_RETRY_BACKOFF = conf.http_client.retry_backoff
+
+DEMAND_CACHE_TTL = conf.demand_cache.ttl
+DEMAND_CACHE_LOCAL_SIZE = conf.demand_cache.local_size
+DEMAND_CACHE_MAX_IDS = conf.demand_cache.max_ids
+DEMAND_MATCHER_ENABLED = conf.demand_cache.matcher
+DEMAND_MATCHER_MAX_PORTS = conf.demand_cache.matcher_max_ports
+
+DATALAYER = conf.datalayer
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
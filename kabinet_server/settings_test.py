@@ -55,3 +55,6 @@ DATABASE_ROUTERS = []
 
 # Use in-memory channel layer for tests instead of Redis
 CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+# Likewise for the cache (demand results, presigned URLs)
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
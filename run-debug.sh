@@ -9,10 +9,7 @@ echo "=> Ensuring Superusers..."
 python manage.py ensureadmin
 
 echo "=> Ensuring Repositories..."
-python manage.py ensurerepos
+python manage.py ensurerepos --defer
 
-
-
-# Start the first process
 echo "=> Starting Server"
-python manage.py runserver 0.0.0.0:80
\ No newline at end of file
+exec python manage.py runserver 0.0.0.0:80
\ No newline at end of file
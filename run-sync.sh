@@ -0,0 +1,6 @@
+#!/bin/bash
+echo "=> Waiting for DB to be online"
+python manage.py wait_for_database -s 2
+
+echo "=> Starting Repository Sync"
+exec python manage.py syncrepos
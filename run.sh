@@ -9,10 +9,7 @@ echo "=> Ensuring Superusers..."
 python manage.py ensureadmin
 
 echo "=> Ensuring Repositories..."
-python manage.py ensurerepos
+python manage.py ensurerepos --defer
 
-
-
-# Start the first process
 echo "=> Starting Server"
-daphne -b 0.0.0.0 -p 80 --websocket_timeout -1 kabinet_server.asgi:application 
\ No newline at end of file
+exec daphne -b 0.0.0.0 -p 80 --websocket_timeout -1 kabinet_server.asgi:application 
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""Parsing a large ``deployments.yaml``: YAML loaders and event-loop stalls.
+
+Not collected by the default test run (the file does not match ``test_*.py``);
+run it explicitly and read the tables with ``-s``::
+
+    uv run pytest tests/benchmarks/bench_config_parsing.py -s
+
+The first table compares the pure-Python ``SafeLoader`` with the libyaml
+``CSafeLoader`` that ``parse_kabinet_config`` picks when it is available. The
+second measures the longest gap a 1 ms ticker sees on the event loop while the
+config is parsed and validated on the loop (as the scanner used to) and on the
+parse pool.
+"""
+
+import asyncio
+import time
+
+import pytest
+import yaml
+
+from bridge.repo.models import KabinetConfigFile
+from bridge.repo.scan import aparse_kabinet_config, parse_kabinet_config
+from tests.utils import build_synthetic_config
+
+SHAPES = [(10, 10), (50, 10), (100, 20)]
+
+
+def synthetic_body(app_images: int, implementations: int) -> bytes:
+    return yaml.safe_dump(build_synthetic_config(app_images, implementations)).encode()
+
+
+def best_of(repeat: int, fn, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+async def longest_stall(parse) -> float:
+    """Run ``parse`` next to a 1 ms ticker and return the longest gap between ticks."""
+    stall = 0.0
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        nonlocal stall
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stall = max(stall, now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    await parse()
+    done.set()
+    await task
+    return stall
+
+
+def test_bench_config_parsing() -> None:
+    if not yaml.__with_libyaml__:
+        pytest.skip("PyYAML is built without libyaml")
+
+    print()
+    print(f"{'shape':>12} {'size (kB)':>10} {'SafeLoader (ms)':>16} {'CSafeLoader (ms)':>17} {'validate (ms)':>14}")
+    for app_images, implementations in SHAPES:
+        body = synthetic_body(app_images, implementations)
+        raw = yaml.load(body, Loader=yaml.CSafeLoader)
+        python = best_of(3, yaml.load, body, yaml.SafeLoader)
+        libyaml = best_of(3, yaml.load, body, yaml.CSafeLoader)
+        validate = best_of(3, lambda: KabinetConfigFile(**raw))
+        print(f"{f'{app_images}x{implementations}':>12} {len(body) / 1024:>10.0f} {python * 1000:>16.1f} {libyaml * 1000:>17.1f} {validate * 1000:>14.1f}")
+
+
+def test_bench_event_loop_stall() -> None:
+    print()
+    print(f"{'shape':>12} {'on loop (ms)':>13} {'parse pool (ms)':>16}")
+    for app_images, implementations in SHAPES:
+        body = synthetic_body(app_images, implementations)
+
+        async def on_loop() -> None:
+            parse_kabinet_config(body)
+
+        async def in_pool() -> None:
+            await aparse_kabinet_config(body)
+
+        blocked = asyncio.run(longest_stall(on_loop))
+        offloaded = asyncio.run(longest_stall(in_pool))
+        print(f"{f'{app_images}x{implementations}':>12} {blocked * 1000:>13.1f} {offloaded * 1000:>16.1f}")
@@ -0,0 +1,151 @@
+"""Port demand matching on 100k definitions: unnesting every row vs. joining port rows.
+
+Not collected by the default test run (the file does not match ``test_*.py``);
+run it explicitly against the test stack and read the table with ``-s``::
+
+    uv run pytest tests/benchmarks/bench_demands.py -s
+
+The "before" column runs the SQL ``build_params`` emitted before definitions
+got a port table and precomputed shape columns (kept here as
+``legacy_build_params``); every demand has to return the same definitions
+both ways.
+"""
+
+import random
+import time
+import typing as t
+
+import pytest
+from authentikate.models import Organization
+from django.db import connection
+from rekuest_core.enums import PortKind
+from rekuest_core.inputs.types import PortMatchInput
+
+from bridge import managers, models
+
+DEFINITIONS = 100_000
+IDENTIFIERS = [f"@mikro/{name}" for name in ("image", "roi", "table", "file", "stage", "dataset", "snapshot", "mesh")]
+KINDS = [kind.value for kind in PortKind]
+
+DEMANDS: list[tuple[str, list[PortMatchInput], dict]] = [
+    ("identifier", [PortMatchInput(kind=PortKind.STRUCTURE, identifier="@mikro/mesh")], {}),
+    ("two ports", [PortMatchInput(identifier="@mikro/mesh"), PortMatchInput(kind=PortKind.ENUM)], {}),
+    ("key", [PortMatchInput(key="port_37")], {}),
+    ("positional", [PortMatchInput(at=0, identifier="@mikro/mesh")], {}),
+    ("forced length", [PortMatchInput(identifier="@mikro/mesh")], {"force_length": 2}),
+    ("shape only", [], {"force_non_nullable_length": 1, "force_structure_length": 0}),
+]
+
+
+def legacy_item_conditions(item: PortMatchInput, index: int) -> tuple[str, dict]:
+    """The conditions on one unnested ``item`` of a port array, as the baseline built them."""
+    parts = []
+    params = {}
+    if item.at is not None:
+        parts.append(f"idx = %(arg_at_{index})s")
+        params[f"arg_at_{index}"] = item.at + 1
+    for field in ("key", "kind", "identifier"):
+        value = getattr(item, field)
+        if value:
+            parts.append(f"item->>'{field}' = %(arg_{field}_{index})s")
+            params[f"arg_{field}_{index}"] = getattr(value, "value", value)
+    return " AND ".join(parts), params
+
+
+def legacy_build_params(
+    search_params: list[PortMatchInput],
+    type: str = "args",
+    force_length: t.Optional[int] = None,
+    force_non_nullable_length: t.Optional[int] = None,
+    force_structure_length: t.Optional[int] = None,
+) -> tuple[str, dict]:
+    """The per-row ``EXISTS (... jsonb_array_elements ...)`` matcher, kept here as the baseline."""
+    queries = []
+    params = {}
+    for index, item in enumerate(search_params):
+        sql_part, item_params = legacy_item_conditions(item, index)
+        queries.append(f"EXISTS (SELECT 1 FROM jsonb_array_elements({type}) WITH ORDINALITY AS j(item, idx) WHERE {sql_part})")
+        params.update(item_params)
+
+    if force_length is not None:
+        queries.append(f"jsonb_array_length({type}) = {force_length}")
+
+    if force_non_nullable_length is not None:
+        queries.append(f"(SELECT COUNT(*) FROM jsonb_array_elements({type}) AS j(item) WHERE item->>'nullable'::text = 'false') = {force_non_nullable_length}")
+
+    if force_structure_length is not None:
+        queries.append(f"(SELECT COUNT(*) FROM jsonb_array_elements({type}) AS j(item) WHERE item->>'kind' = 'STRUCTURE') = {force_structure_length}")
+
+    return "SELECT id FROM bridge_definition WHERE " + " AND ".join(queries), params
+
+
+def synthetic_port(rng: random.Random) -> dict:
+    kind = rng.choice(KINDS)
+    return {
+        "key": f"port_{rng.randrange(200)}",
+        "kind": kind,
+        "identifier": rng.choice(IDENTIFIERS) if kind == "STRUCTURE" else None,
+        "nullable": rng.random() < 0.3,
+        "children": [],
+    }
+
+
+def create_definitions(batch: list[models.Definition]) -> None:
+    definitions = models.Definition.objects.bulk_create(batch)
+    models.DefinitionPort.objects.bulk_create(
+        [
+            port
+            for definition in definitions
+            for direction in ("args", "returns")
+            for port in models.DefinitionPort.from_ports(definition, direction, getattr(definition, direction))
+        ]
+    )
+
+
+def populate(organization: Organization) -> None:
+    rng = random.Random(1)
+    batch = []
+    for i in range(DEFINITIONS):
+        args = [synthetic_port(rng) for _ in range(rng.randrange(1, 5))]
+        returns = [synthetic_port(rng) for _ in range(rng.randrange(0, 3))]
+        batch.append(
+            models.Definition(
+                name=f"definition {i}",
+                hash=f"bench-{i}",
+                organization=organization,
+                description="",
+                kind="FUNCTION",
+                args=args,
+                returns=returns,
+                **models.Definition.port_shape(args, returns),
+            )
+        )
+        if len(batch) == 5000:
+            create_definitions(batch)
+            batch = []
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE bridge_definition")
+        cursor.execute("ANALYZE bridge_definitionport")
+
+
+def run(sql: str, params: dict) -> tuple[float, set[int]]:
+    with connection.cursor() as cursor:
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        ids = {row[0] for row in cursor.fetchall()}
+        return time.perf_counter() - start, ids
+
+
+@pytest.mark.django_db
+def test_bench_demands() -> None:
+    organization = Organization.objects.create(slug="bench-demands")
+    populate(organization)
+
+    print()
+    print(f"{'demand':>14} {'matches':>8} {'before (ms)':>12} {'after (ms)':>11}")
+    for name, demands, forced in DEMANDS:
+        before, legacy_ids = run(*legacy_build_params(demands, **forced))
+        after, ids = run(*managers.build_params(demands, organization_id=organization.id, **forced))
+        assert ids == legacy_ids, name
+        print(f"{name:>14} {len(ids):>8} {before * 1000:>12.1f} {after * 1000:>11.1f}")
@@ -0,0 +1,199 @@
+"""Flavour matching on releases with many flavours: per-row pydantic parsing vs. compiled selectors.
+
+Not collected by the default test run (the file does not match ``test_*.py``);
+run it explicitly against the test stack and read the table with ``-s``::
+
+    uv run pytest tests/benchmarks/bench_flavours.py -s
+
+The "before" column validates every candidate's selectors with
+``Flavour.get_selectors()`` and scores all of them; the "after" column drops
+unrunnable flavours in SQL and scores the rest from compiled selectors
+(``bridge.scoring``). Both have to pick the same flavour.
+
+``test_bench_flavour_actions`` times the flavours providing N actions: one
+join of the flavour-definition table per hash (before) against one grouped
+query (``managers.flavour_ids_providing``, after).
+
+``test_bench_match_flavours`` answers a burst of agent requests with one
+``matchFlavour`` per request (before) and one ``matchFlavours`` (after).
+"""
+
+import random
+import time
+import types as pytypes
+
+import pytest
+from authentikate.models import Organization
+from django.db import connection
+
+from bridge import managers, models, queries, scoring
+from bridge.enums import ContainerType
+from bridge.inputs import DeviceFeatureModel, EnvironmentInputModel, MatchFlavoursInput, MatchFlavoursInputModel
+
+RELEASES = 50
+FLAVOURS = 200
+DEFINITIONS = 2000
+PROVIDED = 30
+ACTIONS = (1, 5, 10, 20)
+ROUNDS = 20
+AGENTS = 300
+
+SELECTORS = [
+    [],
+    [{"kind": "cuda", "cuda_version": "11.8"}],
+    [{"kind": "cuda", "cuda_version": "12.4", "weight": 2}],
+    [{"kind": "rocm", "api_version": "5.7", "api_thing": None}],
+    [{"kind": "cpu", "min_count": 8}],
+    [{"kind": "ram", "min": 16000, "required": False, "weight": 3}],
+    [{"kind": "label", "key": "zone", "value": "lab"}],
+    [{"kind": "cuda", "cuda_version": "11.0"}, {"kind": "ram", "min": 32000}],
+]
+
+ENVIRONMENTS = {
+    "gpu node": EnvironmentInputModel(
+        container_type=ContainerType.DOCKER,
+        features=[DeviceFeatureModel(kind="cuda", cuda_version="12.1"), DeviceFeatureModel(kind="cpu", cpu_count="16", memory=64000)],
+    ),
+    "cpu node": EnvironmentInputModel(container_type=ContainerType.DOCKER, features=[DeviceFeatureModel(kind="cpu", cpu_count="4", memory=8000)]),
+}
+
+
+def populate(organization: Organization) -> list[models.Release]:
+    rng = random.Random(1)
+    repo = models.GithubRepo.objects.create(name="bench", organization=organization, repo="bench", user="bench", branch="main")
+    app = models.App.objects.create(identifier="bench", organization=organization)
+    image = models.DockerImage.objects.create(image_string="bench:latest", organization=organization)
+    releases = models.Release.objects.bulk_create([models.Release(app=app, version=f"0.{i}.0") for i in range(RELEASES)])
+    models.Flavour.objects.bulk_create(
+        [
+            models.Flavour(release=release, name=f"flavour {i}", repo=repo, image=image, builder="bench", selectors=selectors, **models.Flavour.capabilities(selectors))
+            for release in releases
+            for i, selectors in enumerate(rng.choice(SELECTORS) for _ in range(FLAVOURS))
+        ]
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE bridge_flavour")
+    return releases
+
+
+def legacy_rank(release: models.Release, environment: EnvironmentInputModel) -> list[scoring.Score]:
+    candidates = [pytypes.SimpleNamespace(id=flavour.id, selectors=[s.model_dump() for s in flavour.get_selectors()]) for flavour in release.flavours.order_by("id")]
+    return scoring.rank(candidates, environment)
+
+
+def compiled_rank(release: models.Release, environment: EnvironmentInputModel) -> list[scoring.Score]:
+    return scoring.rank(scoring.exclude_unrunnable(release.flavours.order_by("id"), environment), environment)
+
+
+def timed(rank, releases: list[models.Release], environment: EnvironmentInputModel) -> tuple[float, list[int]]:
+    start = time.perf_counter()
+    best = [rank(release, environment)[0].flavour.id for release in releases]
+    return (time.perf_counter() - start) / len(releases), best
+
+
+@pytest.mark.django_db
+def test_bench_flavours() -> None:
+    organization = Organization.objects.create(slug="bench-flavours")
+    releases = populate(organization)
+
+    print()
+    print(f"{'environment':>12} {'before (ms)':>12} {'after (ms)':>11}")
+    for name, environment in ENVIRONMENTS.items():
+        before, legacy_best = timed(legacy_rank, releases, environment)
+        after, best = timed(compiled_rank, releases, environment)
+        assert best == legacy_best, name
+        print(f"{name:>12} {before * 1000:>12.2f} {after * 1000:>11.2f}")
+
+
+def provide(organization: Organization) -> dict[int, list[str]]:
+    """Link every flavour to ``PROVIDED`` random definitions; the hashes each flavour provides."""
+    rng = random.Random(2)
+    definitions = models.Definition.objects.bulk_create(
+        [
+            models.Definition(name=f"definition {i}", hash=f"bench-{i}", organization=organization, description="", kind="FUNCTION", args=[], returns=[])
+            for i in range(DEFINITIONS)
+        ]
+    )
+    through = models.Definition.flavours.through
+    provided: dict[int, list[str]] = {}
+    links = []
+    for flavour_id in models.Flavour.objects.filter(release__app__organization=organization).values_list("id", flat=True):
+        chosen = rng.sample(definitions, PROVIDED)
+        provided[flavour_id] = [definition.hash for definition in chosen]
+        links.extend(through(flavour_id=flavour_id, definition_id=definition.id) for definition in chosen)
+    through.objects.bulk_create(links, batch_size=10_000)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE bridge_definition")
+        cursor.execute("ANALYZE bridge_definition_flavours")
+    return provided
+
+
+def joined(hashes: list[str], organization: Organization) -> set[int]:
+    flavours = models.Flavour.objects.filter(release__app__organization=organization)
+    for action_hash in hashes:
+        flavours = flavours.filter(definitions__hash=action_hash)
+    return set(flavours.values_list("id", flat=True))
+
+
+def grouped(hashes: list[str], organization: Organization) -> set[int]:
+    flavours = models.Flavour.objects.filter(release__app__organization=organization)
+    return set(flavours.filter(id__in=managers.flavour_ids_providing(hashes, organization.id)).values_list("id", flat=True))
+
+
+def timed_matches(match, requests: list[list[str]], organization: Organization) -> tuple[float, list[set[int]]]:
+    start = time.perf_counter()
+    matches = [match(hashes, organization) for hashes in requests]
+    return (time.perf_counter() - start) / len(requests), matches
+
+
+@pytest.mark.django_db
+def test_bench_flavour_actions() -> None:
+    organization = Organization.objects.create(slug="bench-flavour-actions")
+    populate(organization)
+    provided = provide(organization)
+    rng = random.Random(3)
+
+    print()
+    print(f"{'actions':>8} {'before (ms)':>12} {'after (ms)':>11}")
+    for count in ACTIONS:
+        requests = [rng.sample(provided[rng.choice(list(provided))], count) for _ in range(ROUNDS)]
+        before, legacy_matches = timed_matches(joined, requests, organization)
+        after, matches = timed_matches(grouped, requests, organization)
+        assert matches == legacy_matches, count
+        print(f"{count:>8} {before * 1000:>12.2f} {after * 1000:>11.2f}")
+
+
+@pytest.mark.django_db
+def test_bench_match_flavours() -> None:
+    organization = Organization.objects.create(slug="bench-match-flavours")
+    populate(organization)
+    provided = provide(organization)
+    rng = random.Random(4)
+    info = pytypes.SimpleNamespace(context=pytypes.SimpleNamespace(request=pytypes.SimpleNamespace(organization=organization)))
+
+    release_of = dict(models.Flavour.objects.filter(id__in=provided).values_list("id", "release_id"))
+    requests = []
+    for _ in range(AGENTS):
+        flavour_id = rng.choice(list(provided))
+        request = MatchFlavoursInputModel(
+            release=str(release_of[flavour_id]), actions=rng.sample(provided[flavour_id], 3), environment=rng.choice(list(ENVIRONMENTS.values()))
+        )
+        requests.append(MatchFlavoursInput.from_pydantic(request))
+
+    start = time.perf_counter()
+    one_by_one = []
+    for request in requests:
+        try:
+            one_by_one.append(queries.match_flavour(info, request).id)
+        except ValueError:
+            one_by_one.append(None)
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = [match.flavour.id if match.flavour else None for match in queries.match_flavours(info, requests)]
+    after = time.perf_counter() - start
+
+    assert batched == one_by_one
+    print()
+    print(f"{'requests':>9} {'before (ms)':>12} {'after (ms)':>11}")
+    print(f"{AGENTS:>9} {before * 1000:>12.1f} {after * 1000:>11.1f}")
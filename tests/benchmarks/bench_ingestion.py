@@ -0,0 +1,98 @@
+"""Round trips per repository scan: per-row ``update_or_create`` vs. bulk upserts.
+
+Not collected by the default test run (the file does not match ``test_*.py``);
+run it explicitly against the test stack and read the table with ``-s``::
+
+    uv run pytest tests/benchmarks/bench_ingestion.py -s
+
+The "before" column replays the ingestion loop ``parse_config`` used before it
+was moved onto bulk upserts, so both numbers come from the same database.
+"""
+
+import time
+import typing
+
+import pytest
+from asgiref.sync import async_to_sync
+from authentikate.models import Organization
+from django.db import connection
+
+from bridge import models
+from bridge.repo.db import parse_config
+from bridge.repo.models import KabinetConfigFile
+from tests.utils import build_synthetic_config
+
+SHAPES = [(1, 1), (10, 10), (40, 30)]
+
+
+def legacy_parse_config(config: KabinetConfigFile, repo: models.GithubRepo, organization: Organization) -> None:
+    """The per-row ingestion loop, kept here as the baseline."""
+    for deployment in config.app_images:
+        manifest = deployment.manifest
+        app, _ = models.App.objects.get_or_create(identifier=manifest.identifier, organization=organization)
+        release, _ = models.Release.objects.update_or_create(version=manifest.version, app=app, defaults=dict(scopes=manifest.scopes))
+        image, _ = models.DockerImage.objects.update_or_create(image_string=deployment.image.image_string, defaults=dict(build_at=deployment.image.build_at), organization=organization)
+        flavour, _ = models.Flavour.objects.update_or_create(
+            release=release,
+            name=deployment.flavour_name,
+            defaults=dict(
+                deployment_id=deployment.app_image_id,
+                flavour=deployment.app_image_id,
+                selectors=[d.model_dump() for d in deployment.selectors],
+                repo=repo,
+                image=image,
+                manifest=deployment.manifest.model_dump(),
+                requirements=deployment.inspection.model_dump()["requirements"],
+            ),
+        )
+        for implementation in deployment.inspection.implementations:
+            definition, _ = models.Definition.objects.update_or_create(
+                hash=implementation.definition.unique_hash,
+                organization=organization,
+                defaults=dict(
+                    description=implementation.definition.description,
+                    args=[d.model_dump() for d in implementation.definition.args],
+                    returns=[d.model_dump() for d in implementation.definition.returns],
+                    name=implementation.definition.name,
+                ),
+            )
+            definition.flavours.add(flavour)
+
+
+def measure(ingest: typing.Callable[[], typing.Any]) -> tuple[int, float]:
+    """Count the statements sent to the database (the query log caps at 9000)."""
+    statements = 0
+
+    def count(execute, sql, params, many, context):  # noqa: ANN001, ANN202
+        nonlocal statements
+        statements += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        start = time.perf_counter()
+        ingest()
+        elapsed = time.perf_counter() - start
+    return statements, elapsed
+
+
+@pytest.mark.django_db
+def test_bench_ingestion_round_trips() -> None:
+    print()
+    print(f"{'images x impls':>15} | {'before (queries)':>16} | {'after (queries)':>15} | {'before (s)':>10} | {'after (s)':>9}")
+
+    for images, implementations in SHAPES:
+        config = KabinetConfigFile(**build_synthetic_config(images, implementations))
+
+        legacy_org = Organization.objects.create(slug=f"legacy-{images}-{implementations}")
+        legacy_repo = models.GithubRepo.objects.create(name="legacy", organization=legacy_org)
+        before, before_s = measure(lambda: legacy_parse_config(config, legacy_repo, legacy_org))
+
+        bulk_org = Organization.objects.create(slug=f"bulk-{images}-{implementations}")
+        bulk_repo = models.GithubRepo.objects.create(name="bulk", organization=bulk_org)
+        after, after_s = measure(lambda: async_to_sync(parse_config)(config, bulk_repo, bulk_org))
+
+        print(f"{f'{images} x {implementations}':>15} | {before:>16} | {after:>15} | {before_s:>10.3f} | {after_s:>9.3f}")
+
+        assert models.Flavour.objects.filter(repo=bulk_repo).count() == models.Flavour.objects.filter(repo=legacy_repo).count()
+        assert models.Definition.objects.filter(organization=bulk_org).count() == models.Definition.objects.filter(organization=legacy_org).count()
+        assert after < before or images == 1
@@ -0,0 +1,59 @@
+"""Port demands on 100k definitions: the port queries vs. the in-process matcher.
+
+Not collected by the default test run (the file does not match ``test_*.py``);
+run it explicitly against the test stack and read the table with ``-s``::
+
+    uv run pytest tests/benchmarks/bench_matcher.py -s
+
+Uses the definitions and demands of ``bench_demands``. The matcher column is
+measured on a loaded index (the load itself is reported once); every demand
+has to return the same definitions both ways.
+"""
+
+import time
+
+import pytest
+from authentikate.models import Organization
+from django.db import connection
+
+from bridge import managers, matcher
+from bridge.enums import DemandKind
+from bridge.inputs import PortDemandInput
+from tests.benchmarks.bench_demands import DEMANDS, populate
+
+ROUNDS = 20
+
+
+def sql_ids(demands: list[PortDemandInput], organization_id: int) -> list[int]:
+    sql, values = managers.build_port_demands_sql(demands, organization_id=organization_id)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, values)
+        return sorted(row[0] for row in cursor.fetchall())
+
+
+def timed(function, *args) -> tuple[float, list[int]]:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = function(*args)
+    return (time.perf_counter() - start) / ROUNDS, result
+
+
+@pytest.mark.django_db
+def test_bench_matcher(settings) -> None:
+    settings.DEMAND_MATCHER_ENABLED = True
+    settings.DEMAND_MATCHER_MAX_PORTS = 10_000_000
+    organization = Organization.objects.create(slug="bench-matcher")
+    populate(organization)
+
+    start = time.perf_counter()
+    matcher.get_index(organization.id)
+    print()
+    print(f"index loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"{'demand':>14} {'matches':>8} {'sql (ms)':>9} {'memory (ms)':>12}")
+    for name, matches, forced in DEMANDS:
+        demands = [PortDemandInput(kind=DemandKind.ARGS, matches=matches or None, **forced)]
+        sql, expected = timed(sql_ids, demands, organization.id)
+        memory, ids = timed(matcher.match_port_demands, demands, organization.id)
+        assert ids == expected, name
+        print(f"{name:>14} {len(ids):>8} {sql * 1000:>9.2f} {memory * 1000:>12.2f}")
@@ -0,0 +1,80 @@
+"""Latest compatible release of an app with thousands of releases: client-side semver sort vs. ``latestRelease``.
+
+Not collected by the default test run (the file does not match ``test_*.py``);
+run it explicitly against the test stack and read the table with ``-s``::
+
+    uv run pytest tests/benchmarks/bench_releases.py -s
+
+The "before" column lists every release of the app, parses the versions and
+picks the highest one matching the constraint in Python, as clients had to
+(ordering by ``version`` was lexical). The "after" column is
+``queries.latest_release``, which resolves the constraint on the indexed
+semver columns. Both have to pick the same release.
+"""
+
+import random
+import time
+import types as pytypes
+
+import pytest
+from authentikate.models import Organization
+from django.db import connection
+
+from bridge import models, queries, versions
+
+APPS = 20
+RELEASES = 5000
+ROUNDS = 50
+CONSTRAINTS = {"^1.2": lambda v: v >= (1, 2, 0) and v < (2, 0, 0), "~3.4": lambda v: (3, 4, 0) <= v < (3, 5, 0), "<1": lambda v: v < (1, 0, 0), "*": lambda v: True}
+
+
+def populate(organization: Organization) -> list[models.App]:
+    rng = random.Random(1)
+    apps = models.App.objects.bulk_create([models.App(identifier=f"bench-{i}", organization=organization) for i in range(APPS)])
+    releases = []
+    for app in apps:
+        seen: set[str] = set()
+        while len(seen) < RELEASES:
+            seen.add(f"{rng.randrange(6)}.{rng.randrange(40)}.{rng.randrange(40)}" + rng.choice(["", "", "", "-rc.1"]))
+        releases.extend(models.Release(app=app, version=version, **models.Release.version_columns(version)) for version in sorted(seen))
+    models.Release.objects.bulk_create(releases, batch_size=10_000)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE bridge_release")
+    return apps
+
+
+def client_side(app: models.App, constraint: str) -> int | None:
+    best = None
+    for id, version in models.Release.objects.filter(app=app).values_list("id", "version"):
+        parsed = versions.parse(version)
+        if parsed["version_prerelease"] is not None:
+            continue
+        key = (parsed["version_major"], parsed["version_minor"], parsed["version_patch"])
+        if CONSTRAINTS[constraint](key) and (best is None or key > best[0]):
+            best = (key, id)
+    return best and best[1]
+
+
+@pytest.mark.django_db
+def test_bench_latest_release() -> None:
+    organization = Organization.objects.create(slug="bench-releases")
+    apps = populate(organization)
+    info = pytypes.SimpleNamespace(context=pytypes.SimpleNamespace(request=pytypes.SimpleNamespace(organization=organization)))
+    rng = random.Random(2)
+
+    def server_side(app: models.App, constraint: str) -> int | None:
+        release = queries.latest_release(info, app=str(app.id), constraint=constraint)
+        return release and release.id
+
+    print()
+    print(f"{'constraint':>10} {'before (ms)':>12} {'after (ms)':>11}")
+    for constraint in CONSTRAINTS:
+        picked = [rng.choice(apps) for _ in range(ROUNDS)]
+        timings = []
+        results = []
+        for lookup in (client_side, server_side):
+            start = time.perf_counter()
+            results.append([lookup(app, constraint) for app in picked])
+            timings.append((time.perf_counter() - start) / ROUNDS)
+        assert results[0] == results[1], constraint
+        print(f"{constraint:>10} {timings[0] * 1000:>12.2f} {timings[1] * 1000:>11.2f}")
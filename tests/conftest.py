@@ -116,6 +116,21 @@ def django_db_setup(django_db_setup, django_db_blocker):
             connections.close_all()
 
 
+@pytest.fixture(autouse=True)
+def empty_demand_cache():
+    """Start every test without cached demand results or port indexes.
+
+    Rows (and their IDs) do not outlive a test, but the cache would.
+    """
+    from django.core.cache import cache
+
+    from bridge import demand_cache, matcher
+
+    cache.clear()
+    demand_cache.clear_local()
+    matcher.clear()
+
+
 @pytest.fixture(scope="function")
 def authenticated_context(db, backend_stack):
     # Match the identity the static "test" token resolves to (see settings_test
@@ -0,0 +1,110 @@
+"""Tests for the demand result cache in ``bridge.demand_cache``."""
+
+import pytest
+from authentikate.models import Organization
+from rekuest_core.enums import PortKind
+from rekuest_core.inputs.types import PortMatchInput
+
+from bridge import demand_cache
+from bridge.enums import DemandKind
+from bridge.inputs import PortDemandInput
+from bridge.models import GithubRepo
+from bridge.repo.db import ingest_config
+from bridge.repo.models import KabinetConfigFile
+from tests.utils import build_synthetic_config
+
+IMAGE = PortMatchInput(kind=PortKind.STRUCTURE, identifier="@mikro/image")
+FLOAT = PortMatchInput(kind=PortKind.FLOAT)
+
+
+def test_equivalent_demands_share_a_key() -> None:
+    args = PortDemandInput(kind=DemandKind.ARGS, matches=[IMAGE, FLOAT])
+    returns = PortDemandInput(kind=DemandKind.RETURNS, matches=[IMAGE])
+
+    key = demand_cache.demand_key([args, returns], 1)
+    assert demand_cache.demand_key([returns, PortDemandInput(kind=DemandKind.ARGS, matches=[FLOAT, IMAGE])], 1) == key
+    assert demand_cache.demand_key([args, returns], 2) != key
+    assert demand_cache.demand_key([args, PortDemandInput(kind=DemandKind.RETURNS, matches=[IMAGE], force_length=1)], 1) != key
+
+
+def test_results_are_cached_until_the_generation_moves() -> None:
+    demands = [PortDemandInput(kind=DemandKind.ARGS, matches=[IMAGE])]
+    calls = []
+
+    def match() -> list[int]:
+        calls.append(1)
+        return [1, 2]
+
+    assert demand_cache.get_or_match(demands, 1, match) == [1, 2]
+    assert demand_cache.get_or_match(demands, 1, match) == [1, 2]
+    demand_cache.clear_local()
+    assert demand_cache.get_or_match(demands, 1, match) == [1, 2]
+    assert len(calls) == 1
+
+    demand_cache.bump_generation(2)
+    assert demand_cache.get_or_match(demands, 1, match) == [1, 2]
+    assert len(calls) == 1
+
+    demand_cache.bump_generation(1)
+    assert demand_cache.get_or_match(demands, 1, match) == [1, 2]
+    assert len(calls) == 2
+
+
+def test_large_results_are_not_cached(settings) -> None:
+    settings.DEMAND_CACHE_MAX_IDS = 2
+    demands = [PortDemandInput(kind=DemandKind.ARGS, matches=[FLOAT])]
+    calls = []
+
+    def match() -> list[int]:
+        calls.append(1)
+        return [1, 2, 3]
+
+    assert demand_cache.get_or_match(demands, 1, match) is None
+    demand_cache.clear_local()
+    assert demand_cache.get_or_match(demands, 1, match) is None
+    assert len(calls) == 1
+
+
+def test_local_results_are_bounded(settings) -> None:
+    settings.DEMAND_CACHE_LOCAL_SIZE = 2
+    for at in range(3):
+        demand_cache.get_or_match([PortDemandInput(kind=DemandKind.ARGS, matches=[PortMatchInput(at=at)])], 1, lambda: [at])
+
+    assert len(demand_cache._local) == 2
+
+
+def test_ingestion_bumps_the_generation(db, django_capture_on_commit_callbacks) -> None:
+    organization = Organization.objects.create(slug="demand-cache-organization")
+    repo = GithubRepo.objects.create(name="demand-cache", organization=organization)
+    before = demand_cache.generation(organization.id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ingest_config(KabinetConfigFile(**build_synthetic_config(app_images=1, implementations=1)), repo, organization)
+
+    assert demand_cache.generation(organization.id) == before + 1
+
+
+def test_removing_a_flavour_invalidates_cached_results(db, django_capture_on_commit_callbacks) -> None:
+    organization = Organization.objects.create(slug="demand-cache-removal-organization")
+    repo = GithubRepo.objects.create(name="demand-cache-removal", organization=organization)
+    raw = build_synthetic_config(app_images=2, implementations=1)
+    with django_capture_on_commit_callbacks(execute=True):
+        ingest_config(KabinetConfigFile(**raw), repo, organization)
+
+    demands = [PortDemandInput(kind=DemandKind.ARGS, matches=[IMAGE])]
+    matched: list[int] = []
+
+    def match() -> list[int]:
+        matched.append(1)
+        return [len(matched)]
+
+    assert demand_cache.get_or_match(demands, organization.id, match) == [1]
+    assert demand_cache.get_or_match(demands, organization.id, match) == [1]
+
+    # Nothing but a deletion: the remaining app image is unchanged.
+    raw["app_images"] = raw["app_images"][:1]
+    with django_capture_on_commit_callbacks(execute=True):
+        result = ingest_config(KabinetConfigFile(**raw), repo, organization)
+    assert len(result.removed) == 1 and not result.added and not result.changed
+
+    assert demand_cache.get_or_match(demands, organization.id, match) == [2]
@@ -0,0 +1,286 @@
+"""Tests for the port demand matcher in ``bridge.managers``.
+
+Definitions are created directly, together with the port rows ingestion
+maintains for them; the demands are answered by joins over those rows.
+"""
+
+import pytest
+from authentikate.models import Organization
+from rekuest_core.enums import PortKind
+from rekuest_core.inputs.types import PortMatchInput
+
+from bridge import managers, models
+from bridge.inputs import ActionDemandInput
+
+
+def port(key: str, kind: str, identifier: str | None = None, nullable: bool = False, children: list | None = None) -> dict:
+    return {"key": key, "kind": kind, "identifier": identifier, "nullable": nullable, "children": children or []}
+
+
+@pytest.fixture
+def definitions(db) -> dict[str, int]:
+    organization = Organization.objects.create(slug="demand-organization")
+    shapes = {
+        "segment": [port("image", "STRUCTURE", "@mikro/image"), port("sigma", "FLOAT", nullable=True)],
+        "threshold": [port("value", "FLOAT"), port("image", "STRUCTURE", "@mikro/image")],
+        "label": [port("name", "STRING")],
+        "stack": [port("images", "LIST", children=[port("...", "STRUCTURE", "@mikro/image")])],
+        "pair": [port("pair", "LIST", children=[port("first", "INT"), port("second", "STRUCTURE", "@mikro/image")])],
+    }
+
+    ids = {}
+    for name, args in shapes.items():
+        returns = [port("out", "STRUCTURE", "@mikro/image")] if name != "label" else []
+        definition = models.Definition.objects.create(
+            name=name, hash=name, organization=organization, description=name, kind="FUNCTION", args=args, returns=returns, **models.Definition.port_shape(args, returns)
+        )
+        ids[name] = definition.id
+
+    return ids
+
+
+def match(definitions: dict[str, int], demands: list[PortMatchInput] | None, type: str = "args", **forced) -> set[str]:
+    ids = set(managers.get_action_ids_by_demands(demands, type=type, **forced))
+    return {name for name, id in definitions.items() if id in ids}
+
+
+def test_demands_join_ports() -> None:
+    sql, params = managers.build_params([PortMatchInput(key="image"), PortMatchInput(kind=PortKind.FLOAT)])
+    assert sql.startswith("SELECT DISTINCT arg0.definition_id FROM bridge_definitionport arg0 JOIN bridge_definitionport arg1")
+    assert "jsonb_array_elements" not in sql
+    assert params == {"arg_direction": "args", "arg0_key": "image", "arg1_kind": "FLOAT"}
+
+
+def test_demands_match_ports(definitions: dict[str, int]) -> None:
+    assert match(definitions, [PortMatchInput(kind=PortKind.STRUCTURE, identifier="@mikro/image")]) == {"segment", "threshold"}
+    assert match(definitions, [PortMatchInput(kind=PortKind.STRUCTURE, identifier="@mikro/image"), PortMatchInput(kind=PortKind.FLOAT)]) == {"segment", "threshold"}
+    # Both fields have to hold for the same port.
+    assert match(definitions, [PortMatchInput(key="image", kind=PortKind.FLOAT)]) == set()
+    assert match(definitions, [PortMatchInput(identifier="@mikro/image")], type="returns") == {"segment", "threshold", "stack", "pair"}
+
+
+def test_children_match_by_position(definitions: dict[str, int]) -> None:
+    """The n-th child demand is matched against the n-th child of a port."""
+    image = PortMatchInput(kind=PortKind.STRUCTURE, identifier="@mikro/image")
+    assert match(definitions, [PortMatchInput(kind=PortKind.LIST, children=[image])]) == {"stack"}
+    assert match(definitions, [PortMatchInput(kind=PortKind.LIST, children=[PortMatchInput(kind=PortKind.INT), image])]) == {"pair"}
+    assert match(definitions, [PortMatchInput(children=[PortMatchInput(key="second")])]) == set()
+
+
+def test_state_demands_join_state_ports(definitions: dict[str, int]) -> None:
+    """State demands are answered over the state port table, children by position."""
+    organization = models.Definition.objects.get(id=definitions["stack"]).organization
+    ports = {
+        "stack": [port("images", "LIST", children=[port("...", "STRUCTURE", "@mikro/image")])],
+        "pair": [port("pair", "LIST", children=[port("first", "INT"), port("second", "STRUCTURE", "@mikro/image")])],
+    }
+    states = {}
+    for name, state_ports in ports.items():
+        state = models.StateDefinition.objects.create(name=name, description=name, ports=state_ports, organization=organization)
+        states[state.id] = name
+
+    def match_states(matches: list[PortMatchInput]) -> set[str]:
+        return {states[id] for id in managers.get_state_ids_by_demands(matches, organization_id=organization.id)}
+
+    image = PortMatchInput(kind=PortKind.STRUCTURE, identifier="@mikro/image")
+    assert match_states([PortMatchInput(kind=PortKind.LIST, children=[image])]) == {"stack"}
+    assert match_states([PortMatchInput(kind=PortKind.LIST, children=[PortMatchInput(key="first"), PortMatchInput(key="second")])]) == {"pair"}
+    assert match_states([PortMatchInput(children=[PortMatchInput(key="second")])]) == set()
+
+
+def test_saved_definitions_and_states_keep_their_ports(definitions: dict[str, int]) -> None:
+    """Definitions and states created or edited outside ingestion (like in the
+    admin) get their port rows and shape columns rebuilt on save."""
+    label = models.Definition.objects.get(id=definitions["label"])
+    label.args = [port("image", "STRUCTURE", "@mikro/image"), port("name", "STRING")]
+    label.save()
+
+    label.refresh_from_db()
+    assert (label.arg_count, label.structure_arg_count) == (2, 1)
+    assert match(definitions, [PortMatchInput(at=0, identifier="@mikro/image")], force_length=2) == {"label", "segment"}
+
+    state = models.StateDefinition.objects.create(name="later", description="later", ports=[port("count", "INT")], organization=label.organization)
+    assert managers.get_state_ids_by_demands([PortMatchInput(kind=PortKind.INT)], organization_id=label.organization_id) == [state.id]
+
+    state.ports = [port("image", "STRUCTURE", "@mikro/image")]
+    state.save()
+    assert managers.get_state_ids_by_demands([PortMatchInput(kind=PortKind.INT)], organization_id=label.organization_id) == []
+    assert managers.get_state_ids_by_demands([PortMatchInput(identifier="@mikro/image")], organization_id=label.organization_id) == [state.id]
+
+
+def test_positions_and_counts(definitions: dict[str, int]) -> None:
+    assert match(definitions, [PortMatchInput(at=0, kind=PortKind.STRUCTURE)]) == {"segment"}
+    assert match(definitions, [PortMatchInput(at=1, kind=PortKind.STRUCTURE)]) == {"threshold"}
+    assert match(definitions, [PortMatchInput(kind=PortKind.STRUCTURE)], force_length=2) == {"segment", "threshold"}
+    assert match(definitions, [PortMatchInput(kind=PortKind.STRUCTURE)], force_non_nullable_length=1) == {"segment"}
+    assert match(definitions, None, force_structure_length=0) == {"label", "stack", "pair"}
+    assert match(definitions, [PortMatchInput(kind=PortKind.LIST)], force_length=1) == {"stack", "pair"}
+
+
+def test_action_demands_match_args_and_returns(definitions: dict[str, int]) -> None:
+    image = PortMatchInput(identifier="@mikro/image")
+    demand = ActionDemandInput(arg_matches=[PortMatchInput(kind=PortKind.FLOAT)], return_matches=[image])
+    assert set(managers.get_action_ids_by_action_demand(demand)) == {definitions["segment"], definitions["threshold"]}
+
+    demand = ActionDemandInput(name="threshold", arg_matches=[PortMatchInput(kind=PortKind.FLOAT)], return_matches=[image], force_arg_length=2)
+    assert managers.get_action_ids_by_action_demand(demand) == [definitions["threshold"]]
+
+
+def test_action_demands_match_hash_and_protocols(definitions: dict[str, int]) -> None:
+    segment = models.Definition.objects.get(id=definitions["segment"])
+    predicate = models.Protocol.objects.create(name="Predicate", description="", organization=segment.organization)
+    segment.protocols.add(predicate)
+
+    # A hash-only demand selects that definition, not the whole organization.
+    demand = ActionDemandInput(hash="threshold")
+    assert managers.get_action_ids_by_action_demand(demand, organization_id=segment.organization_id) == [definitions["threshold"]]
+
+    demand = ActionDemandInput(protocols=[predicate.name])
+    assert managers.get_action_ids_by_action_demand(demand, organization_id=segment.organization_id) == [segment.id]
+    demand = ActionDemandInput(hash="threshold", protocols=[predicate.name])
+    assert managers.get_action_ids_by_action_demand(demand, organization_id=segment.organization_id) == []
+
+    with pytest.raises(ValueError):
+        managers.build_action_demand_params(ActionDemandInput(key="segment"), organization_id=segment.organization_id)
+
+
+def test_action_demands_match_protocols_by_name(definitions: dict[str, int]) -> None:
+    segment = models.Definition.objects.get(id=definitions["segment"])
+    segment.protocols.add(models.Protocol.objects.create(name="predicate", description="", organization=segment.organization))
+
+    demand = ActionDemandInput(protocols=["predicate"], return_matches=[PortMatchInput(identifier="@mikro/image")])
+    assert managers.get_action_ids_by_action_demand(demand, organization_id=segment.organization_id) == [segment.id]
+    assert managers.get_action_ids_by_action_demand(ActionDemandInput(protocols=["unknown"]), organization_id=segment.organization_id) == []
+
+
+def test_empty_action_demands_are_rejected(definitions: dict[str, int]) -> None:
+    organization_id = models.Definition.objects.get(id=definitions["segment"]).organization_id
+
+    with pytest.raises(ValueError, match="No search params"):
+        managers.build_action_demand_params(ActionDemandInput(), organization_id=organization_id)
+    with pytest.raises(ValueError, match="No search params"):
+        managers.get_action_ids_by_action_demand(ActionDemandInput(arg_matches=[], return_matches=[]), organization_id=organization_id)
+
+
+def test_action_demands_resolve_in_one_query(definitions: dict[str, int], django_assert_num_queries) -> None:
+    image = PortMatchInput(identifier="@mikro/image")
+    demands = [
+        ActionDemandInput(arg_matches=[PortMatchInput(kind=PortKind.FLOAT)], return_matches=[image]),
+        ActionDemandInput(name="label"),
+        ActionDemandInput(arg_matches=[PortMatchInput(kind=PortKind.LIST)], force_arg_length=2),
+    ]
+
+    with django_assert_num_queries(1):
+        matches = managers.get_definitions_by_action_demands(demands)
+
+    assert [[definition.name for definition in demand] for demand in matches] == [["segment", "threshold"], ["label"], []]
+
+
+def test_port_demands_compile_to_one_subquery(definitions: dict[str, int], django_assert_num_queries) -> None:
+    """Several demands are intersected by the database, in the one query of the queryset."""
+    from django.db.models.expressions import RawSQL
+
+    from bridge.enums import DemandKind
+    from bridge.inputs import PortDemandInput
+
+    demands = [
+        PortDemandInput(kind=DemandKind.ARGS, matches=[PortMatchInput(kind=PortKind.STRUCTURE)]),
+        PortDemandInput(kind=DemandKind.ARGS, matches=[PortMatchInput(kind=PortKind.FLOAT)], force_non_nullable_length=1),
+        PortDemandInput(kind=DemandKind.RETURNS, matches=[PortMatchInput(identifier="@mikro/image")]),
+    ]
+    sql, params = managers.build_port_demands_sql(demands)
+    assert sql.count("INTERSECT") == 2
+
+    with django_assert_num_queries(1):
+        names = set(models.Definition.objects.filter(id__in=RawSQL(sql, params)).values_list("name", flat=True))
+
+    assert names == {"segment"}
+
+
+def test_demands_stay_within_organization(definitions: dict[str, int]) -> None:
+    organization = models.Definition.objects.get(id=definitions["segment"]).organization
+    other = Organization.objects.create(slug="other-demand-organization")
+    args = [port("image", "STRUCTURE", "@mikro/image")]
+    foreign = models.Definition.objects.create(
+        name="foreign", hash="foreign", organization=other, description="foreign", kind="FUNCTION", args=args, returns=[], **models.Definition.port_shape(args, [])
+    )
+
+    image = [PortMatchInput(identifier="@mikro/image")]
+    assert foreign.id in managers.get_action_ids_by_demands(image)
+    assert set(managers.get_action_ids_by_demands(image, organization_id=organization.id)) == {definitions["segment"], definitions["threshold"]}
+    assert managers.get_action_ids_by_demands(image, organization_id=other.id) == [foreign.id]
+    assert managers.get_action_ids_by_demands(None, force_structure_length=1, organization_id=other.id) == [foreign.id]
+
+
+def test_compatible_definitions_pair_port_signatures(definitions: dict[str, int]) -> None:
+    from django.db.models.expressions import RawSQL
+
+    from bridge.enums import CompatibilityDirection
+
+    organization = models.Definition.objects.get(id=definitions["segment"]).organization
+    returns = [port("out", "STRUCTURE", "@mikro/image", nullable=True)]
+    maybe = models.Definition.objects.create(name="maybe", hash="maybe", organization=organization, description="maybe", kind="FUNCTION", args=[], returns=returns)
+
+    def compatible(name: str, direction: CompatibilityDirection) -> set[str]:
+        sql, params = managers.build_compatibility_sql(definitions.get(name, maybe.id), direction)
+        return set(models.Definition.objects.filter(id__in=RawSQL(sql, params)).values_list("name", flat=True))
+
+    assert models.DefinitionPort.signature_of(port("images", "LIST", children=[port("...", "STRUCTURE", "@mikro/image")])) == "LIST<STRUCTURE:@mikro/image>"
+    assert compatible("segment", CompatibilityDirection.CONSUMERS) == {"threshold"}
+    # A nullable image only fits args that accept None, which no image arg here does.
+    assert compatible("maybe", CompatibilityDirection.CONSUMERS) == set()
+    assert compatible("threshold", CompatibilityDirection.PRODUCERS) == {"segment", "stack", "pair"}
+    assert compatible("stack", CompatibilityDirection.PRODUCERS) == set()
+
+
+def test_in_memory_matcher_agrees_with_sql(definitions: dict[str, int], settings) -> None:
+    from django.db import connection
+
+    from bridge import matcher
+    from bridge.enums import DemandKind
+    from bridge.inputs import PortDemandInput
+
+    settings.DEMAND_MATCHER_ENABLED = True
+    organization_id = models.Definition.objects.get(id=definitions["segment"]).organization_id
+    image = PortMatchInput(kind=PortKind.STRUCTURE, identifier="@mikro/image")
+    cases = [
+        [PortDemandInput(kind=DemandKind.ARGS, matches=[image])],
+        [PortDemandInput(kind=DemandKind.ARGS, matches=[image, PortMatchInput(kind=PortKind.FLOAT)])],
+        [PortDemandInput(kind=DemandKind.ARGS, matches=[PortMatchInput(key="image", kind=PortKind.FLOAT)])],
+        [PortDemandInput(kind=DemandKind.ARGS, matches=[PortMatchInput(at=1, kind=PortKind.STRUCTURE)])],
+        [PortDemandInput(kind=DemandKind.ARGS, matches=[PortMatchInput(kind=PortKind.LIST)], force_length=1)],
+        [PortDemandInput(kind=DemandKind.ARGS, force_structure_length=0), PortDemandInput(kind=DemandKind.RETURNS, matches=[image])],
+        [PortDemandInput(kind=DemandKind.ARGS, matches=[image], force_non_nullable_length=1)],
+    ]
+
+    for demands in cases:
+        sql, values = managers.build_port_demands_sql(demands, organization_id=organization_id)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, values)
+            expected = sorted(row[0] for row in cursor.fetchall())
+
+        assert matcher.match_port_demands(demands, organization_id) == expected
+
+    # Children are left to SQL.
+    assert matcher.match_port_demands([PortDemandInput(kind=DemandKind.ARGS, matches=[PortMatchInput(children=[image])])], organization_id) is None
+
+
+def test_in_memory_matcher_follows_ingestion(definitions: dict[str, int], settings, django_assert_num_queries) -> None:
+    from bridge import demand_cache
+    from bridge.enums import DemandKind
+    from bridge.inputs import PortDemandInput
+
+    settings.DEMAND_MATCHER_ENABLED = True
+    organization = models.Definition.objects.get(id=definitions["segment"]).organization
+    demands = [PortDemandInput(kind=DemandKind.ARGS, matches=[PortMatchInput(kind=PortKind.STRING)])]
+
+    assert managers.get_definition_ids_by_port_demands(demands, organization_id=organization.id) == [definitions["label"]]
+    with django_assert_num_queries(0):
+        assert managers.get_definition_ids_by_port_demands(demands, organization_id=organization.id) == [definitions["label"]]
+
+    args = [port("title", "STRING")]
+    title = models.Definition.objects.create(name="title", hash="title", organization=organization, description="title", kind="FUNCTION", args=args, returns=[], **models.Definition.port_shape(args, []))
+    assert managers.get_definition_ids_by_port_demands(demands, organization_id=organization.id) == [definitions["label"]]
+
+    demand_cache.bump_generation(organization.id)
+    assert managers.get_definition_ids_by_port_demands(demands, organization_id=organization.id) == [definitions["label"], title.id]
@@ -0,0 +1,53 @@
+"""Tests for ``ensurerepos`` provisioning against the raw-file stand-in."""
+
+import pytest
+
+from bridge.models import Flavour, GithubRepo
+from bridge.repo.provision import RepoTarget, aensure_repos
+from tests.utils import build_relative_dir, kabinet_path, serve_raw_files
+
+
+def deployments_yaml() -> str:
+    with open(build_relative_dir("deployments/deployments.yaml"), "r") as f:
+        return f.read()
+
+
+def target(organization: str, repo: str) -> RepoTarget:
+    return RepoTarget(organization=organization, user="arkitektio-apps", repo=repo, branch="main", name=f"arkitektio-apps/{repo}")
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_shared_repos_are_fetched_once(settings) -> None:
+    """Organizations mapping the same repository share one fetch, and a second
+    run finds every config unchanged."""
+    targets = [target("first-org", "shared"), target("second-org", "shared"), target("second-org", "own"), target("second-org", "own")]
+    files = {kabinet_path("arkitektio-apps", name): deployments_yaml() for name in ("shared", "own")}
+
+    async with serve_raw_files(files) as stand_in:
+        settings.GITHUB_RAW_URL = stand_in.url
+        results = await aensure_repos(targets)
+
+        assert sorted(request.path for request in stand_in.requests) == sorted(files)
+        assert [result.status.value for result in results] == ["OK", "OK", "OK"]
+        assert await GithubRepo.objects.filter(organization__slug__in=["first-org", "second-org"]).acount() == 3
+        assert await Flavour.objects.filter(repo__githubrepo__organization__slug="first-org").acount() == 1
+
+        again = await aensure_repos(targets)
+
+    assert [result.status.value for result in again] == ["UNCHANGED", "UNCHANGED", "UNCHANGED"]
+    assert await GithubRepo.objects.filter(organization__slug__in=["first-org", "second-org"]).acount() == 3
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_deferred_repos_are_queued(settings) -> None:
+    async with serve_raw_files({}) as stand_in:
+        settings.GITHUB_RAW_URL = stand_in.url
+        results = await aensure_repos([target("deferred-org", "later")], defer=True)
+
+    assert stand_in.requests == []
+    assert [result.status.value for result in results] == ["QUEUED"]
+    repo = await GithubRepo.objects.aget(repo="later")
+    assert repo.sync_requested_at is not None
+    assert repo.config_digest is None
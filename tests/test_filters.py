@@ -176,6 +176,39 @@ async def test_definition_demands_filter_is_wired(authenticated_context: HttpCon
     assert len(definitions) == 1
 
 
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_definition_demands_filter_intersects_demands(authenticated_context: HttpContext, built_chain: dict) -> None:
+    """Every demand has to hold; the built definition takes a file and a stage and returns a list."""
+
+    async def definition_ids(demands: list[dict]) -> list[str]:
+        hit = (
+            await execute(
+                "query($f: DefinitionFilter){ definitions(filters: $f){ id } }",
+                authenticated_context,
+                {"f": {"demands": demands}},
+            )
+        )["definitions"]
+        return [d["id"] for d in hit]
+
+    file_arg = {"kind": "ARGS", "matches": [{"identifier": "@mikro/file"}], "forceLength": 2}
+    list_return = {"kind": "RETURNS", "matches": [{"kind": "LIST"}]}
+
+    assert len(await definition_ids([file_arg, list_return])) == 1
+    assert await definition_ids([file_arg, {"kind": "RETURNS", "matches": [{"kind": "STRUCTURE"}]}]) == []
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_definition_demands_filter_matches_large_results_in_a_subquery(authenticated_context: HttpContext, built_chain: dict, settings) -> None:
+    """Results too large to cache are matched in a subquery, with the same answer."""
+    settings.DEMAND_CACHE_MAX_IDS = 0
+    demands = [{"kind": "ARGS", "matches": [{"identifier": "@mikro/file"}], "forceLength": 2}]
+
+    hit = (await execute("query($f: DefinitionFilter){ definitions(filters: $f){ id } }", authenticated_context, {"f": {"demands": demands}}))["definitions"]
+    assert len(hit) == 1
+
+
 # ---------------------------------------------------------------------------
 # Filter field migration — new logical composition (AND / OR / NOT)
 # ---------------------------------------------------------------------------
@@ -0,0 +1,60 @@
+"""Tests for the shared outbound HTTP client, against the raw-file stand-in."""
+
+import pytest
+
+from bridge.repo.client import get_session, metrics
+from bridge.repo.scan import aget_kabinet_config
+from tests.utils import build_relative_dir, kabinet_path, serve_raw_files
+
+
+def deployments_yaml() -> str:
+    with open(build_relative_dir("deployments/deployments.yaml"), "r") as f:
+        return f.read()
+
+
+@pytest.mark.asyncio
+async def test_fetches_share_pooled_connections(settings) -> None:
+    files = {kabinet_path("arkitektio-apps", "one"): deployments_yaml()}
+    metrics.reset()
+
+    async with serve_raw_files(files) as stand_in:
+        session = get_session()
+        for _ in range(3):
+            await aget_kabinet_config(f"{stand_in.url}{kabinet_path('arkitektio-apps', 'one')}")
+
+        assert get_session() is session
+
+    assert session.closed
+    assert metrics.requests == 3
+    assert metrics.connections_created == 1
+    assert metrics.connections_reused == 2
+    assert metrics.latency_max > 0
+
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried(settings) -> None:
+    settings.HTTP_CLIENT_RETRY_BACKOFF = 0
+    path = kabinet_path("arkitektio-apps", "flaky")
+    metrics.reset()
+
+    async with serve_raw_files({path: deployments_yaml()}, flaky={path: 2}) as stand_in:
+        fetched = await aget_kabinet_config(f"{stand_in.url}{path}")
+
+    assert fetched.config is not None
+    assert len(stand_in.requests) == 3
+    assert metrics.retries == 2
+
+
+@pytest.mark.asyncio
+async def test_retries_are_bounded(settings) -> None:
+    from bridge.repo.errors import FetchError
+
+    settings.HTTP_CLIENT_RETRY_BACKOFF = 0
+    settings.HTTP_CLIENT_RETRIES = 1
+    path = kabinet_path("arkitektio-apps", "down")
+
+    async with serve_raw_files({path: deployments_yaml()}, flaky={path: 5}) as stand_in:
+        with pytest.raises(FetchError, match="503"):
+            await aget_kabinet_config(f"{stand_in.url}{path}")
+
+    assert len(stand_in.requests) == 2
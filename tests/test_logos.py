@@ -0,0 +1,134 @@
+"""Tests for the content-addressed release logo cache.
+
+Logos are served by the local raw-file stand-in; the S3 upload of the media
+datalayer is replaced by a recorder, so the tests stay offline.
+"""
+
+import hashlib
+
+import pytest
+from asgiref.sync import sync_to_async
+
+from authentikate.models import Organization
+from bridge.models import GithubRepo, Logo, Release
+from bridge.repo.db import aingest_config
+from bridge.repo.logos import assign_logos, prune_logos
+from bridge.repo.models import KabinetConfigFile
+from kante.context import HttpContext
+from tests.utils import build_synthetic_config, execute, serve_raw_files
+
+
+@pytest.fixture
+def uploads(settings, monkeypatch) -> list[str]:
+    """Configure a media bucket and record the keys uploaded to it."""
+    from datalayer import datalayer
+
+    settings.DATALAYER = {"media": {"bucket": "media"}}
+    monkeypatch.setattr(datalayer, "GLOBAL_DL", None)
+
+    keys: list[str] = []
+    monkeypatch.setattr(datalayer.Datalayer, "put_file", lambda self, bucket_key, object_path, payload, content_type=None: keys.append(object_path))
+    return keys
+
+
+def with_logos(raw: dict, base_url: str, logos: list[str]) -> KabinetConfigFile:
+    for image, logo in zip(raw["app_images"], logos):
+        image["manifest"]["logo"] = f"{base_url}{logo}"
+    return KabinetConfigFile(**raw)
+
+
+def touch(raw: dict) -> None:
+    """Change every app image, so the next ingestion rewrites all of them."""
+    for image in raw["app_images"]:
+        image["manifest"]["scopes"] = image["manifest"]["scopes"] + ["touched"]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_logos_are_fetched_once_and_shared(uploads: list[str]) -> None:
+    """Releases sharing a logo URL cause one download, identical content behind
+    two URLs is stored once, and unchanged logos are revalidated with a 304."""
+    organization = await Organization.objects.acreate(slug="logo-organization")
+    repo = await GithubRepo.objects.acreate(name="logos", organization=organization)
+    raw = build_synthetic_config(app_images=3, implementations=1)
+    files = {"/logos/a.png": "PNG-A", "/logos/b.png": "PNG-A", "/logos/c.png": "PNG-C"}
+
+    async with serve_raw_files(files) as stand_in:
+        config = with_logos(raw, stand_in.url, ["/logos/a.png", "/logos/a.png", "/logos/b.png"])
+        await aingest_config(config, repo, organization)
+
+        assert sorted(request.path for request in stand_in.requests) == ["/logos/a.png", "/logos/b.png"]
+        assert len(uploads) == 1
+        assert await Logo.objects.acount() == 1
+        logo = await Logo.objects.aget()
+        assert await Release.objects.filter(stored_logo=logo).acount() == 3
+
+        stand_in.requests.clear()
+        touch(raw)
+        await aingest_config(with_logos(raw, stand_in.url, ["/logos/a.png", "/logos/a.png", "/logos/b.png"]), repo, organization)
+
+        assert all(request.headers.get("If-None-Match") for request in stand_in.requests)
+        assert len(uploads) == 1
+
+        touch(raw)
+        await aingest_config(with_logos(raw, stand_in.url, ["/logos/c.png"] * 3), repo, organization)
+
+    # The new content is stored, the old logo lost its last release and is pruned.
+    assert len(uploads) == 2
+    assert [remaining.id async for remaining in Logo.objects.all()] != [logo.id]
+    assert await Logo.objects.acount() == 1
+    assert await Release.objects.filter(original_logo__endswith="/logos/c.png").acount() == 3
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_failing_logo_does_not_fail_ingestion(uploads: list[str]) -> None:
+    organization = await Organization.objects.acreate(slug="broken-logo-organization")
+    repo = await GithubRepo.objects.acreate(name="broken-logos", organization=organization)
+
+    async with serve_raw_files({}) as stand_in:
+        config = with_logos(build_synthetic_config(app_images=1, implementations=1), stand_in.url, ["/logos/missing.png"])
+        result = await aingest_config(config, repo, organization)
+
+    assert len(result.added) == 1
+    assert uploads == []
+    assert await Release.objects.filter(stored_logo__isnull=False).acount() == 0
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_release_logo_resolves_to_the_stored_copy(uploads: list[str], authenticated_context: HttpContext) -> None:
+    organization = authenticated_context.request.organization
+    repo = await GithubRepo.objects.acreate(name="served-logos", organization=organization)
+
+    async with serve_raw_files({"/logos/a.png": "PNG-A"}) as stand_in:
+        await aingest_config(with_logos(build_synthetic_config(app_images=1, implementations=1), stand_in.url, ["/logos/a.png"]), repo, organization)
+
+    releases = (await execute("query{ releases{ logo originalLogo } }", authenticated_context))["releases"]
+    served = [release for release in releases if release["originalLogo"]]
+    assert len(served) == 1
+    assert served[0]["logo"].endswith(f"logos/{hashlib.sha256(b'PNG-A').hexdigest()}")
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_logos_linked_meanwhile_are_not_pruned(uploads: list[str]) -> None:
+    """Pruning counts references after locking, and a link to a logo that was
+    pruned before it could be assigned is skipped instead of failing."""
+    organization = await Organization.objects.acreate(slug="racing-logo-organization")
+    repo = await GithubRepo.objects.acreate(name="racing-logos", organization=organization)
+
+    async with serve_raw_files({"/logos/a.png": "PNG-A"}) as stand_in:
+        await aingest_config(with_logos(build_synthetic_config(app_images=1, implementations=1), stand_in.url, ["/logos/a.png"]), repo, organization)
+    logo = await Logo.objects.aget()
+    release = await Release.objects.aget(stored_logo=logo)
+
+    await sync_to_async(prune_logos)({logo.id})
+    assert await Logo.objects.filter(id=logo.id).aexists()
+
+    pruned = await Logo.objects.acreate(digest="0" * 64, size=0)
+    pruned_id = pruned.id
+    await pruned.adelete()
+    pruned.id = pruned_id
+    await sync_to_async(assign_logos)({"https://example.com/b.png": [release.id]}, {"https://example.com/b.png": pruned})
+    assert (await Release.objects.aget(id=release.id)).stored_logo_id == logo.id
@@ -87,6 +87,62 @@ async def test_releases_query_filter_order(authenticated_context: HttpContext, b
     assert one["version"] == "0.1.9"
 
 
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_releases_order_and_resolve_by_semver(authenticated_context: HttpContext, built_chain: dict) -> None:
+    from bridge.models import Release
+
+    built = await Release.objects.aget()
+    for version in ("0.10.0", "0.9.0", "1.2.0", "1.3.0-rc.1", "1.3.0-rc.10", "1.3.0-rc.2", "1.3.0-beta", "1.10.2", "2.0.0", "3.0.0-alpha", "nightly"):
+        await Release.objects.acreate(app_id=built.app_id, version=version, **Release.version_columns(version))
+
+    ordered = (
+        await execute(
+            "query($o: [ReleaseOrder!]){ releases(ordering: $o){ version } }",
+            authenticated_context,
+            {"o": [{"version": "DESC"}]},
+        )
+    )["releases"]
+    assert [r["version"] for r in ordered] == [
+        "3.0.0-alpha",
+        "2.0.0",
+        "1.10.2",
+        "1.3.0-rc.10",
+        "1.3.0-rc.2",
+        "1.3.0-rc.1",
+        "1.3.0-beta",
+        "1.2.0",
+        "0.10.0",
+        "0.9.0",
+        "0.1.9",
+        "nightly",
+    ]
+
+    query = "query($app: ID, $c: String, $p: Boolean! = false){ latestRelease(app: $app, constraint: $c, includePrereleases: $p){ version } }"
+    app = str(built.app_id)
+    for constraint, prereleases, expected in (
+        ("^1.2", False, "1.10.2"),
+        ("~1.2", False, "1.2.0"),
+        ("<1", False, "0.10.0"),
+        ("^0.1", False, "0.1.9"),
+        (None, False, "2.0.0"),
+        ("^3", False, None),
+        # Prereleases only match when a comparator names one of the same version.
+        ("<3.0.0", False, "2.0.0"),
+        (">=1.3.0-rc.1 <1.4", False, "1.3.0-rc.10"),
+        ("1.3.0-rc.2", False, "1.3.0-rc.2"),
+        ("~1.3", False, None),
+        ("<1.3.0", False, "1.2.0"),
+        # Or when they are included, but ranges still end before the prereleases of their upper bound.
+        ("<1.3.0", True, "1.3.0-rc.10"),
+        ("^2", True, "2.0.0"),
+        ("<3.0.0", True, "3.0.0-alpha"),
+        (None, True, "3.0.0-alpha"),
+    ):
+        latest = (await execute(query, authenticated_context, {"app": app, "c": constraint, "p": prereleases}))["latestRelease"]
+        assert (latest and latest["version"]) == expected, (constraint, prereleases)
+
+
 @pytest.mark.django_db(transaction=True)
 @pytest.mark.asyncio
 async def test_flavours_query_filter_order(authenticated_context: HttpContext, flavour_id: str) -> None:
@@ -146,3 +202,56 @@ async def test_definitions_query_filter_order(authenticated_context: HttpContext
 
     one = (await execute("query($id: ID!){ definition(id: $id){ id name } }", authenticated_context, {"id": definition["id"]}))["definition"]
     assert one["name"] == "Convert Omero"
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_resolve_action_demands(authenticated_context: HttpContext, other_org_context: HttpContext, built_chain: dict) -> None:
+    """Every demand gets its own list of matches, in request order."""
+    query = "query($d: [ActionDemandInput!]!){ resolveActionDemands(demands: $d){ demand definitions{ name } } }"
+    demands = [
+        {"argMatches": [{"identifier": "@mikro/file"}], "returnMatches": [{"kind": "LIST"}]},
+        {"name": "Convert Omero", "forceArgLength": 3},
+        {"name": "Convert Omero", "forceArgLength": 2},
+    ]
+
+    resolved = (await execute(query, authenticated_context, {"d": demands}))["resolveActionDemands"]
+    assert resolved == [
+        {"demand": 0, "definitions": [{"name": "Convert Omero"}]},
+        {"demand": 1, "definitions": []},
+        {"demand": 2, "definitions": [{"name": "Convert Omero"}]},
+    ]
+
+    resolved = (await execute(query, other_org_context, {"d": demands}))["resolveActionDemands"]
+    assert [match["definitions"] for match in resolved] == [[], [], []]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_compatible_definitions(authenticated_context: HttpContext, built_chain: dict) -> None:
+    """The built chain has a single definition, which is never compatible with itself."""
+    definition = (await execute("query{ definitions{ id } }", authenticated_context))["definitions"][0]
+
+    for direction in ("CONSUMERS", "PRODUCERS"):
+        compatible = (
+            await execute(
+                "query($id: ID!, $d: CompatibilityDirection!){ compatibleDefinitions(definition: $id, direction: $d){ id } }",
+                authenticated_context,
+                {"id": definition["id"], "d": direction},
+            )
+        )["compatibleDefinitions"]
+        assert compatible == []
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_match_flavour_by_actions(authenticated_context: HttpContext, flavour_id: str) -> None:
+    """A flavour matches when it provides every requested action; repeated hashes count once."""
+    definition = (await execute("query{ definitions{ hash } }", authenticated_context))["definitions"][0]
+    query = "query($i: MatchFlavoursInput!){ matchFlavour(input: $i){ id } }"
+
+    matched = (await execute(query, authenticated_context, {"i": {"actions": [definition["hash"], definition["hash"]]}}))["matchFlavour"]
+    assert matched["id"] == flavour_id
+
+    missing = (await execute(query, authenticated_context, {"i": {"actions": [definition["hash"], "not-a-hash"]}}))["matchFlavour"]
+    assert missing is None
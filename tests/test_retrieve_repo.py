@@ -50,3 +50,98 @@ async def test_db_deployments(db: typing.Any) -> None:
     flavours = await parse_config(config, github_repo, organization)
 
     assert len(flavours) == 1, "Should have three flavours"
+
+
+def test_db_deployments_bulk_round_trips(db: typing.Any, django_assert_max_num_queries: typing.Any) -> None:
+    """Ingestion costs one upsert per model, however many app images a config has,
+    and re-ingesting the same config leaves the rows in place."""
+    from asgiref.sync import async_to_sync
+    from bridge.models import Definition, DefinitionPort
+    from tests.utils import build_synthetic_config
+
+    organization = Organization.objects.create(slug="bulk-organization")
+    github_repo = GithubRepo.objects.create(name="bulk", organization=organization)
+    config = KabinetConfigFile(**build_synthetic_config(app_images=5, implementations=4))
+
+    # savepoint + stored flavours + apps, releases, images, flavours, definitions, ports (delete + insert), M2M links
+    with django_assert_max_num_queries(11):
+        flavours = async_to_sync(parse_config)(config, github_repo, organization)
+
+    assert [f.name for f in flavours] == [image.flavour_name for image in config.app_images]
+    assert Flavour.objects.filter(repo=github_repo).count() == 5
+    assert Definition.objects.filter(organization=organization).count() == 20
+
+    # savepoint + stored flavours, nothing to write
+    with django_assert_max_num_queries(3):
+        again = async_to_sync(parse_config)(config, github_repo, organization)
+
+    assert [f.id for f in again] == [f.id for f in flavours]
+    assert App.objects.filter(organization=organization).count() == 5
+    assert Release.objects.filter(app__organization=organization).count() == 5
+    assert Definition.objects.filter(organization=organization).count() == 20
+    assert DefinitionPort.objects.filter(definition__organization=organization).count() == sum(
+        len(implementation.definition.args) + len(implementation.definition.returns) for image in config.app_images for implementation in image.inspection.implementations
+    )
+    assert Definition.flavours.through.objects.filter(flavour__in=flavours).count() == 20
+
+
+def test_db_deployments_diff_per_app_image(db: typing.Any) -> None:
+    """Only app images whose fingerprint changed are rewritten; flavours that left
+    the config are removed."""
+    from asgiref.sync import async_to_sync
+    from bridge.models import Definition
+    from bridge.repo.db import aingest_config
+    from tests.utils import build_synthetic_config
+
+    organization = Organization.objects.create(slug="diff-organization")
+    github_repo = GithubRepo.objects.create(name="diff", organization=organization)
+    raw = build_synthetic_config(app_images=3, implementations=2)
+
+    first = async_to_sync(aingest_config)(KabinetConfigFile(**raw), github_repo, organization)
+    assert len(first.added) == 3 and not first.changed and not first.removed
+    stamps = dict(Flavour.objects.filter(repo=github_repo).values_list("id", "created_at"))
+
+    raw["app_images"][1]["inspection"]["implementations"].pop()
+    removed = raw["app_images"].pop(2)
+    second = async_to_sync(aingest_config)(KabinetConfigFile(**raw), github_repo, organization)
+
+    assert [f.id for f in second.unchanged] == [first.flavours[0].id]
+    assert [f.id for f in second.changed] == [first.flavours[1].id]
+    assert second.added == []
+    assert second.removed == [(removed["manifest"]["identifier"], removed["manifest"]["version"], removed["flavourName"])]
+
+    assert Flavour.objects.get(id=first.flavours[0].id).created_at == stamps[first.flavours[0].id]
+    assert Flavour.objects.get(id=first.flavours[1].id).created_at > stamps[first.flavours[1].id]
+    assert not Flavour.objects.filter(id=first.flavours[2].id).exists()
+    assert Definition.flavours.through.objects.filter(flavour_id=first.flavours[1].id).count() == 1
+
+
+def test_db_deployments_keep_deployed_flavours(db: typing.Any) -> None:
+    """A flavour that left the config but is still deployed is kept, reported as
+    kept rather than removed, and does not make later ingestions count as changes."""
+    from asgiref.sync import async_to_sync
+    from authentikate.models import Client
+    from bridge.models import Backend, Deployment
+    from bridge.repo.db import aingest_config
+    from tests.utils import build_synthetic_config
+
+    organization = Organization.objects.create(slug="kept-organization")
+    github_repo = GithubRepo.objects.create(name="kept", organization=organization)
+    raw = build_synthetic_config(app_images=2, implementations=1)
+    first = async_to_sync(aingest_config)(KabinetConfigFile(**raw), github_repo, organization)
+
+    user = get_user_model().objects.create(username="kept-user")
+    backend = Backend.objects.create(organization=organization, user=user, client=Client.objects.create(client_id="kept-client"))
+    Deployment.objects.create(flavour=first.flavours[1], backend=backend)
+
+    left = raw["app_images"].pop(1)
+    key = (left["manifest"]["identifier"], left["manifest"]["version"], left["flavourName"])
+    second = async_to_sync(aingest_config)(KabinetConfigFile(**raw), github_repo, organization)
+    assert second.removed == [] and second.kept == [key]
+    assert not second.touched
+    assert Flavour.objects.filter(id=first.flavours[1].id).exists()
+
+    remaining = raw["app_images"].pop(0)
+    third = async_to_sync(aingest_config)(KabinetConfigFile(**raw), github_repo, organization)
+    assert third.removed == [(remaining["manifest"]["identifier"], remaining["manifest"]["version"], remaining["flavourName"])]
+    assert third.kept == [key] and third.touched
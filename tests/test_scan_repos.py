@@ -0,0 +1,453 @@
+"""Tests for rescanning tracked repositories.
+
+The repositories' ``deployments.yaml`` files are served by a local stand-in for
+raw.githubusercontent.com (``tests.utils.serve_raw_files``), which the server is
+pointed at through the ``GITHUB_RAW_URL`` setting — so these tests stay offline.
+The mutations only queue scans; the tests drain the queue with a
+:class:`bridge.repo.sync.RepoSyncWorker` run in ``once`` mode.
+"""
+
+import asyncio
+import contextlib
+import datetime
+from typing import Iterator
+
+import pytest
+import yaml
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import connection
+from django.utils import timezone
+
+from kante.context import HttpContext
+from tests.utils import build_relative_dir, execute, kabinet_path, serve_raw_files
+
+
+RESCAN_REPOS = """
+    mutation {
+        rescanRepos { id repo }
+    }
+"""
+
+
+def deployments_yaml() -> str:
+    with open(build_relative_dir("deployments/deployments.yaml"), "r") as f:
+        return f.read()
+
+
+@contextlib.contextmanager
+def count_writes() -> Iterator[list[str]]:
+    """Collect every INSERT/UPDATE/DELETE run on the default connection, except
+    the sync bookkeeping on the repository row itself."""
+    writes: list[str] = []
+
+    def wrapper(execute, sql, params, many, context):
+        if sql.lstrip().split(" ", 1)[0].upper() in ("INSERT", "UPDATE", "DELETE") and '"bridge_githubrepo"' not in sql:
+            writes.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield writes
+
+
+async def create_repo(context: HttpContext, repo: str) -> None:
+    from bridge.models import GithubRepo
+
+    await GithubRepo.objects.acreate(
+        name=repo,
+        repo=repo,
+        user="arkitektio-apps",
+        branch="main",
+        organization=context.request.organization,
+    )
+
+
+async def rescan(context: HttpContext, concurrency: int | None = None) -> dict:
+    """Queue a rescan through the API and let a worker drain it."""
+    from bridge.repo.sync import RepoSyncWorker
+
+    await execute(RESCAN_REPOS, context)
+
+    results = await RepoSyncWorker(concurrency=concurrency).run(once=True)
+    return {result.repo.repo: result for result in results}
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_rescan_repos_only_queues(authenticated_context: HttpContext, settings) -> None:
+    """The mutation returns at once and leaves the fetching to the worker."""
+    from bridge.models import GithubRepo
+
+    await create_repo(authenticated_context, "one")
+    await GithubRepo.objects.aupdate(next_sync_at=timezone.now() + datetime.timedelta(hours=1))
+
+    async with serve_raw_files({}) as stand_in:
+        settings.GITHUB_RAW_URL = stand_in.url
+        results = (await execute(RESCAN_REPOS, authenticated_context))["rescanRepos"]
+
+    assert [result["repo"] for result in results] == ["one"]
+    assert stand_in.requests == []
+    assert (await GithubRepo.objects.aget(repo="one")).sync_requested_at is not None
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_create_github_repo_only_queues(authenticated_context: HttpContext, settings) -> None:
+    """A new repository is fetched by the worker, not inside the request."""
+    from bridge.models import Flavour, GithubRepo
+    from bridge.repo.sync import RepoSyncWorker
+
+    files = {kabinet_path("arkitektio-apps", "one"): deployments_yaml()}
+    async with serve_raw_files(files) as stand_in:
+        settings.GITHUB_RAW_URL = stand_in.url
+        created = (await execute('mutation { createGithubRepo(input: {identifier: "arkitektio-apps/one"}) { id } }', authenticated_context))["createGithubRepo"]
+
+        assert stand_in.requests == []
+        repo = await GithubRepo.objects.aget(id=created["id"])
+        assert repo.sync_requested_at is not None
+
+        results = await RepoSyncWorker().run(once=True)
+
+    assert [(result.repo.id, result.status.value) for result in results] == [(repo.id, "OK")]
+    assert await Flavour.objects.filter(repo=repo).aexists()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_sync_worker_is_bounded_and_isolates_failures(authenticated_context: HttpContext, settings) -> None:
+    """Repos are fetched in parallel up to the configured concurrency, and one
+    missing ``deployments.yaml`` is reported without aborting the others."""
+    files = {kabinet_path("arkitektio-apps", name): deployments_yaml() for name in ("one", "two", "three")}
+
+    for name in ("one", "two", "three", "missing"):
+        await create_repo(authenticated_context, name)
+
+    async with serve_raw_files(files, delay=0.05) as stand_in:
+        settings.GITHUB_RAW_URL = stand_in.url
+        by_repo = await rescan(authenticated_context, concurrency=2)
+
+    assert {name: result.status.value for name, result in by_repo.items()} == {
+        "one": "OK",
+        "two": "OK",
+        "three": "OK",
+        "missing": "FAILED",
+    }
+    assert "404" in by_repo["missing"].reason
+    assert by_repo["one"].reason is None
+
+    assert len([request for request in stand_in.requests if request.path.startswith("/arkitektio-apps/")]) == 4
+    assert stand_in.max_in_flight == 2
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_sync_worker_backs_off_failing_repos(authenticated_context: HttpContext, settings) -> None:
+    """Consecutive failures double the retry delay up to the cap; a success
+    resets it to the regular interval."""
+    from bridge.models import GithubRepo
+    from bridge.repo.sync import RepoSyncWorker
+
+    settings.REPO_SYNC_JITTER = 0
+    settings.REPO_SYNC_RETRY = 60
+    settings.REPO_SYNC_MAX_BACKOFF = 150
+    await create_repo(authenticated_context, "one")
+    path = kabinet_path("arkitektio-apps", "one")
+    files: dict[str, str] = {}
+
+    async def delay_after_run() -> tuple[GithubRepo, float]:
+        await GithubRepo.objects.aupdate(next_sync_at=None)
+        before = timezone.now()
+        await RepoSyncWorker().run(once=True)
+        repo = await GithubRepo.objects.aget(repo="one")
+        return repo, (repo.next_sync_at - before).total_seconds()
+
+    async with serve_raw_files(files) as stand_in:
+        settings.GITHUB_RAW_URL = stand_in.url
+
+        delays = []
+        for _ in range(3):
+            repo, delay = await delay_after_run()
+            delays.append(delay)
+
+        assert repo.sync_failures == 3
+        assert "404" in repo.last_sync_error
+        assert [round(delay) for delay in delays] == [60, 120, 150]
+
+        files[path] = deployments_yaml()
+        repo, delay = await delay_after_run()
+
+    assert repo.sync_failures == 0
+    assert repo.last_sync_error is None
+    assert repo.last_synced_at is not None
+    assert round(delay) == settings.REPO_SYNC_INTERVAL
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_sync_worker_prefers_requested_repos(authenticated_context: HttpContext, settings) -> None:
+    """Repos that are not due are left alone unless a priority sync was requested."""
+    from bridge.models import GithubRepo
+    from bridge.repo.sync import RepoSyncWorker
+
+    files = {kabinet_path("arkitektio-apps", name): deployments_yaml() for name in ("one", "two")}
+    for name in ("one", "two"):
+        await create_repo(authenticated_context, name)
+    await GithubRepo.objects.aupdate(next_sync_at=timezone.now() + datetime.timedelta(hours=1))
+
+    scan_repo = """
+        mutation ($id: String!) {
+            scanRepo(input: { id: $id }) { id syncRequestedAt }
+        }
+    """
+    two = await GithubRepo.objects.aget(repo="two")
+
+    async with serve_raw_files(files) as stand_in:
+        settings.GITHUB_RAW_URL = stand_in.url
+        queued = (await execute(scan_repo, authenticated_context, {"id": str(two.id)}))["scanRepo"]
+        results = await RepoSyncWorker().run(once=True)
+
+    assert queued["syncRequestedAt"] is not None
+    assert [result.repo.repo for result in results] == ["two"]
+    assert (await GithubRepo.objects.aget(repo="two")).sync_requested_at is None
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_claims_skip_repos_with_a_scan_in_flight(authenticated_context: HttpContext, settings) -> None:
+    """A priority request for a repository that is being scanned waits for the
+    scan to be recorded, unless the worker's lease ran out."""
+    from bridge.models import GithubRepo
+    from bridge.repo.sync import RepoSyncWorker, claim_due_repos
+
+    files = {kabinet_path("arkitektio-apps", "one"): deployments_yaml()}
+    await create_repo(authenticated_context, "one")
+
+    claimed = await sync_to_async(claim_due_repos)(8)
+    assert [repo.repo for repo in claimed] == ["one"]
+    assert (await GithubRepo.objects.aget(repo="one")).scanning_since is not None
+
+    await GithubRepo.objects.aupdate(sync_requested_at=timezone.now())
+    assert await sync_to_async(claim_due_repos)(8) == []
+
+    await GithubRepo.objects.aupdate(scanning_since=timezone.now() - datetime.timedelta(seconds=settings.REPO_SYNC_LEASE + 1))
+    async with serve_raw_files(files) as stand_in:
+        settings.GITHUB_RAW_URL = stand_in.url
+        results = await RepoSyncWorker().run(once=True)
+
+    repo = await GithubRepo.objects.aget(repo="one")
+    assert [result.repo.repo for result in results] == ["one"]
+    assert repo.scanning_since is None
+    assert repo.sync_requested_at is None
+
+
+async def rescan_twice(context: HttpContext, settings, etags: bool) -> tuple[dict, list[str], list]:
+    path = kabinet_path("arkitektio-apps", "one")
+    files = {path: deployments_yaml()}
+
+    async with serve_raw_files(files, etags=etags) as stand_in:
+        settings.GITHUB_RAW_URL = stand_in.url
+        first = await rescan(context)
+        assert first["one"].status.value == "OK"
+
+        with count_writes() as writes:
+            second = await rescan(context)
+
+    return second, writes, [request for request in stand_in.requests if request.path == path]
+
+
+@pytest.mark.django_db
+def test_unchanged_config_is_answered_by_etag(authenticated_context: HttpContext, settings) -> None:
+    """A second scan revalidates with ``If-None-Match``, gets a ``304`` and
+    writes nothing."""
+    async_to_sync(create_repo)(authenticated_context, "one")
+
+    results, writes, requests = async_to_sync(rescan_twice)(authenticated_context, settings, etags=True)
+
+    assert results["one"].status.value == "UNCHANGED"
+    assert writes == []
+    assert "If-None-Match" not in requests[0].headers
+    assert requests[1].headers["If-None-Match"]
+
+
+@pytest.mark.django_db
+def test_unchanged_config_is_detected_by_digest(authenticated_context: HttpContext, settings) -> None:
+    """Without validators from the host, an identical body is recognised by its
+    digest and neither parsed nor ingested."""
+    async_to_sync(create_repo)(authenticated_context, "one")
+
+    results, writes, requests = async_to_sync(rescan_twice)(authenticated_context, settings, etags=False)
+
+    assert results["one"].status.value == "UNCHANGED"
+    assert writes == []
+    assert "If-None-Match" not in requests[1].headers
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_oversized_config_is_rejected(authenticated_context: HttpContext, settings) -> None:
+    """A ``deployments.yaml`` above the size limit fails the scan without being
+    parsed; the repository keeps no validators, so it is fetched in full again."""
+    from bridge.models import GithubRepo
+
+    settings.REPO_CONFIG_MAX_SIZE = 1024
+    await create_repo(authenticated_context, "one")
+    files = {kabinet_path("arkitektio-apps", "one"): deployments_yaml()}
+
+    async with serve_raw_files(files) as stand_in:
+        settings.GITHUB_RAW_URL = stand_in.url
+        results = await rescan(authenticated_context)
+
+    assert results["one"].status.value == "FAILED"
+    assert "too large" in results["one"].reason
+    repo = await GithubRepo.objects.aget(repo="one")
+    assert repo.config_digest is None
+    assert await repo.flavours.acount() == 0
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_changed_config_is_reingested(authenticated_context: HttpContext, settings) -> None:
+    """A changed ``deployments.yaml`` misses the stored validators and is ingested again."""
+    from bridge.models import GithubRepo
+
+    await create_repo(authenticated_context, "one")
+    path = kabinet_path("arkitektio-apps", "one")
+    files = {path: deployments_yaml()}
+
+    async with serve_raw_files(files) as stand_in:
+        settings.GITHUB_RAW_URL = stand_in.url
+        await rescan(authenticated_context)
+        digest = (await GithubRepo.objects.aget(repo="one")).config_digest
+
+        changed = yaml.safe_load(files[path])
+        changed["app_images"][0]["manifest"]["scopes"].append("write")
+        files[path] = yaml.safe_dump(changed)
+        results = await rescan(authenticated_context)
+
+    assert results["one"].status.value == "OK"
+    assert [flavour.name for flavour in results["one"].changed] == ["vanilla"]
+    repo = await GithubRepo.objects.aget(repo="one")
+    assert repo.config_digest != digest
+    assert repo.config_etag
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_emptied_config_removes_flavours(authenticated_context: HttpContext, settings) -> None:
+    """A config without app images still goes through the diff, so its flavours are removed."""
+    from bridge.models import GithubRepo
+
+    await create_repo(authenticated_context, "one")
+    path = kabinet_path("arkitektio-apps", "one")
+    files = {path: deployments_yaml()}
+
+    async with serve_raw_files(files) as stand_in:
+        settings.GITHUB_RAW_URL = stand_in.url
+        await rescan(authenticated_context)
+
+        emptied = yaml.safe_load(files[path])
+        emptied["app_images"] = []
+        files[path] = yaml.safe_dump(emptied)
+        results = await rescan(authenticated_context)
+
+    assert results["one"].status.value == "OK"
+    assert results["one"].removed
+    assert await (await GithubRepo.objects.aget(repo="one")).flavours.acount() == 0
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_scan_job_streams_progress(authenticated_context: HttpContext, settings) -> None:
+    """A scan job is queued by ``startScan``, worked off by the sync worker and
+    broadcasts every stage of every repository on its channel group."""
+    from channels.layers import get_channel_layer
+
+    from bridge.channels import scan_job_channel
+    from bridge.models import GithubRepo
+    from bridge.repo.jobs import scan_job_group
+    from bridge.repo.sync import RepoSyncWorker
+
+    files = {kabinet_path("arkitektio-apps", "one"): deployments_yaml()}
+    for name in ("one", "missing"):
+        await create_repo(authenticated_context, name)
+    ids = {repo.repo: str(repo.id) async for repo in GithubRepo.objects.filter(repo__in=["one", "missing"])}
+
+    start_scan = """
+        mutation ($repos: [String!]) {
+            startScan(input: { repos: $repos }) { id status repos { status } }
+        }
+    """
+    scan_job = """
+        query ($id: ID!) {
+            scanJob(id: $id) { status finishedAt repos { repo { repo } status flavours reason } }
+        }
+    """
+
+    job = (await execute(start_scan, authenticated_context, {"repos": list(ids.values())}))["startScan"]
+    assert job["status"] == "QUEUED"
+    assert [entry["status"] for entry in job["repos"]] == ["QUEUED", "QUEUED"]
+
+    layer = get_channel_layer()
+    listener = await layer.new_channel()
+    await layer.group_add(scan_job_group(job["id"]), listener)
+
+    async with serve_raw_files(files) as stand_in:
+        settings.GITHUB_RAW_URL = stand_in.url
+        await RepoSyncWorker().run(once=True)
+
+    events = []
+    while not events or not events[-1].done:
+        message = await asyncio.wait_for(layer.receive(listener), timeout=5)
+        assert message["type"] == scan_job_channel.message_type
+        events.append(scan_job_channel.model.model_validate(message["message"]))
+
+    by_repo: dict[str, list] = {}
+    for event in events:
+        by_repo.setdefault(str(event.repo), []).append(event)
+    assert [event.status for event in by_repo[ids["one"]]] == ["FETCHED", "PARSED", "UPSERTED"]
+    assert by_repo[ids["one"]][-1].flavours == 1
+    assert [event.status for event in by_repo[ids["missing"]]] == ["FAILED"]
+    assert sum(event.done for event in events) == 1
+
+    result = (await execute(scan_job, authenticated_context, {"id": job["id"]}))["scanJob"]
+    assert result["status"] == "DONE"
+    assert result["finishedAt"] is not None
+    entries = {entry["repo"]["repo"]: entry for entry in result["repos"]}
+    assert entries["one"]["status"] == "UPSERTED" and entries["one"]["flavours"] == 1
+    assert entries["missing"]["status"] == "FAILED" and "404" in entries["missing"]["reason"]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_scan_job_subscription_snapshots_a_job_finishing_while_subscribing(authenticated_context: HttpContext) -> None:
+    """The subscription joins the job's group before reading the job, so a job
+    that finishes in between is still reported (as a done snapshot) instead of
+    leaving the stream waiting for an event that was already sent."""
+    import types as pytypes
+
+    from bridge.enums import ScanProgress
+    from bridge.models import GithubRepo
+    from bridge.repo.jobs import areport_progress
+    from bridge.subscriptions.scan_job import scan_job
+
+    await create_repo(authenticated_context, "one")
+    repo = await GithubRepo.objects.aget(repo="one")
+    job = (await execute("mutation($r: [String!]){ startScan(input: { repos: $r }) { id } }", authenticated_context, {"r": [str(repo.id)]}))["startScan"]
+
+    class FinishingConsumer:
+        @contextlib.asynccontextmanager
+        async def listen_to_channel(self, message_type: str, groups: list[str]):
+            await areport_progress(repo, ScanProgress.UPSERTED, flavours=1)
+
+            async def silence():
+                await asyncio.Event().wait()
+                yield
+
+            yield silence()
+
+    info = pytypes.SimpleNamespace(context=pytypes.SimpleNamespace(request=authenticated_context.request, consumer=FinishingConsumer()))
+
+    async def collect() -> list:
+        return [message async for message in scan_job(info, job["id"])]
+
+    messages = await asyncio.wait_for(collect(), timeout=5)
+    assert [(message.repo, message.status, message.flavours, message.done) for message in messages] == [(str(repo.id), "UPSERTED", 1, True)]
@@ -0,0 +1,187 @@
+"""Tests for scoring flavours against an environment in ``bridge.scoring``."""
+
+import types as pytypes
+
+import pytest
+from kante.context import HttpContext
+
+from bridge import scoring
+from bridge.enums import ContainerType
+from bridge.inputs import DeviceFeatureModel, EnvironmentInputModel
+from bridge.models import Flavour
+from tests.utils import execute
+
+GPU_NODE = EnvironmentInputModel(
+    container_type=ContainerType.DOCKER,
+    features=[DeviceFeatureModel(kind="cuda", cuda_version="12.1", cuda_cores=4096), DeviceFeatureModel(kind="cpu", cpu_count="16", memory=64000)],
+)
+CPU_NODE = EnvironmentInputModel(container_type=ContainerType.DOCKER, features=[DeviceFeatureModel(kind="cpu", cpu_count="4", memory=8000)])
+
+
+def flavour(name: str, selectors: list[dict]) -> pytypes.SimpleNamespace:
+    return pytypes.SimpleNamespace(name=name, selectors=selectors)
+
+
+def test_required_selectors_drop_flavours_and_weights_rank_the_rest() -> None:
+    vanilla = flavour("vanilla", [])
+    cuda = flavour("cuda", [{"kind": "cuda", "cuda_version": "11.8"}])
+    new_cuda = flavour("cuda-13", [{"kind": "cuda", "cuda_version": "13.0"}])
+    big = flavour("big", [{"kind": "cpu", "memory": 32000, "required": False, "weight": 3}])
+
+    assert [s.flavour.name for s in scoring.rank([vanilla, cuda, new_cuda, big], GPU_NODE)] == ["big", "cuda", "vanilla"]
+
+    ranked = scoring.rank([vanilla, cuda, new_cuda, big], CPU_NODE)
+    assert [s.flavour.name for s in ranked] == ["vanilla", "big"]
+    assert ranked[1].score == 0 and ranked[1].missed == ["cpu"]
+
+
+def test_versions_compare_numerically() -> None:
+    assert scoring.level("11.10") > scoring.level("11.8")
+    assert scoring.rank([flavour("cuda", [{"kind": "cuda", "cuda_version": "12.10"}])], GPU_NODE) == []
+
+
+def test_capabilities_keep_the_highest_required_minimum() -> None:
+    selectors = [
+        {"kind": "cuda", "cuda_version": "11.8"},
+        {"kind": "cuda", "cuda_version": "12.1", "cuda_cores": 1024},
+        {"kind": "ram", "min": 16000},
+        {"kind": "cpu", "memory": 32000, "required": False},
+    ]
+    capabilities = scoring.capabilities(selectors)
+    assert capabilities["required_kinds"] == ["cuda", "ram"]
+    assert capabilities["min_cuda_version"] == [12, 1]
+    assert capabilities["min_cuda_cores"] == 1024
+    assert capabilities["min_memory"] == 16000
+    assert capabilities["min_rocm_version"] is None
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_capability_columns_drop_unrunnable_flavours(flavour_id: str) -> None:
+    vanilla = await Flavour.objects.aget(id=flavour_id)
+    selectors = {
+        "cuda": [{"kind": "cuda", "cuda_version": "11.8"}],
+        "cuda-13": [{"kind": "cuda", "cuda_version": "13.0"}],
+        "big": [{"kind": "ram", "min": 32000}],
+        "rocm": [{"kind": "rocm", "api_version": "5.7"}],
+    }
+    for name, flavour_selectors in selectors.items():
+        flavour = await Flavour.objects.aget(id=flavour_id)
+        flavour.pk = None
+        flavour.name = name
+        flavour.selectors = flavour_selectors
+        for column, value in Flavour.capabilities(flavour_selectors).items():
+            setattr(flavour, column, value)
+        await flavour.asave()
+
+    async def runnable(environment: EnvironmentInputModel) -> set[str]:
+        flavours = scoring.exclude_unrunnable(Flavour.objects.filter(release_id=vanilla.release_id), environment)
+        return {name async for name in flavours.values_list("name", flat=True)}
+
+    assert await runnable(GPU_NODE) == {"vanilla", "cuda", "big"}
+    assert await runnable(CPU_NODE) == {"vanilla"}
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_match_flavour_uses_the_environment(authenticated_context: HttpContext, flavour_id: str) -> None:
+    vanilla = await Flavour.objects.aget(id=flavour_id)
+    cuda = await Flavour.objects.aget(id=flavour_id)
+    cuda.pk = None
+    cuda.name = "cuda"
+    cuda.selectors = [{"kind": "cuda", "cuda_version": "11.8"}]
+    for column, value in Flavour.capabilities(cuda.selectors).items():
+        setattr(cuda, column, value)
+    await cuda.asave()
+
+    query = "query($i: MatchFlavoursInput!){ matchFlavour(input: $i){ id name } }"
+    gpu = {"containerType": "DOCKER", "features": [{"kind": "cuda", "cudaVersion": "12.1"}]}
+    cpu = {"containerType": "DOCKER", "features": [{"kind": "cpu", "cpuCount": "4"}]}
+
+    for environment, expected in ((gpu, "cuda"), (cpu, "vanilla")):
+        matched = (await execute(query, authenticated_context, {"i": {"release": str(vanilla.release_id), "environment": environment}}))["matchFlavour"]
+        assert matched["name"] == expected
+
+    await Flavour.objects.filter(id=vanilla.id).adelete()
+    assert (await execute(query, authenticated_context, {"i": {"release": str(vanilla.release_id), "environment": cpu}}))["matchFlavour"] is None
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_match_flavours_answers_each_request(authenticated_context: HttpContext, flavour_id: str) -> None:
+    vanilla = await Flavour.objects.aget(id=flavour_id)
+    cuda = await Flavour.objects.aget(id=flavour_id)
+    cuda.pk = None
+    cuda.name = "cuda"
+    cuda.selectors = [{"kind": "cuda", "cuda_version": "11.8", "weight": 2}]
+    for column, value in Flavour.capabilities(cuda.selectors).items():
+        setattr(cuda, column, value)
+    await cuda.asave()
+    definition = (await execute("query{ definitions{ hash } }", authenticated_context))["definitions"][0]
+
+    query = "query($r: [MatchFlavoursInput!]!){ matchFlavours(requests: $r){ request flavour{ name } score met missed } }"
+    release = str(vanilla.release_id)
+    requests = [
+        {"release": release, "environment": {"containerType": "DOCKER", "features": [{"kind": "cuda", "cudaVersion": "12.1"}]}},
+        {"release": release, "environment": {"containerType": "DOCKER", "features": [{"kind": "cpu"}]}},
+        {"actions": [definition["hash"]]},
+        {"release": release, "actions": ["not-a-hash"]},
+    ]
+
+    matches = (await execute(query, authenticated_context, {"r": requests}))["matchFlavours"]
+    assert matches == [
+        {"request": 0, "flavour": {"name": "cuda"}, "score": 2, "met": ["cuda"], "missed": []},
+        {"request": 1, "flavour": {"name": "vanilla"}, "score": 0, "met": [], "missed": []},
+        {"request": 2, "flavour": {"name": "vanilla"}, "score": 0, "met": [], "missed": []},
+        {"request": 3, "flavour": None, "score": 0, "met": [], "missed": []},
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_match_flavours_excludes_unrunnable_flavours_in_sql(authenticated_context: HttpContext, flavour_id: str, monkeypatch) -> None:
+    """Flavours the capability columns rule out for a request's environment
+    are never scored for it, and are not even read if no request can run them."""
+    vanilla = await Flavour.objects.aget(id=flavour_id)
+    for name, selectors in (("cuda", [{"kind": "cuda", "cuda_version": "11.8", "weight": 2}]), ("rocm", [{"kind": "rocm", "api_version": "5.7"}])):
+        flavour = await Flavour.objects.aget(id=flavour_id)
+        flavour.pk = None
+        flavour.name = name
+        flavour.selectors = selectors
+        for column, value in Flavour.capabilities(selectors).items():
+            setattr(flavour, column, value)
+        await flavour.asave()
+    names = {id: name async for id, name in Flavour.objects.values_list("id", "name")}
+
+    scored: list[tuple[str, str]] = []
+    score = scoring.score
+
+    def recording_score(flavour, features):
+        scored.append((features[0].kind, names[flavour.id]))
+        return score(flavour, features)
+
+    monkeypatch.setattr(scoring, "score", recording_score)
+
+    from bridge import managers
+
+    read: list[str] = []
+    get_flavour_candidates = managers.get_flavour_candidates
+
+    def recording_candidates(*args, **kwargs):
+        rows = get_flavour_candidates(*args, **kwargs)
+        read.extend(names[row[0]] for row in rows)
+        return rows
+
+    monkeypatch.setattr(managers, "get_flavour_candidates", recording_candidates)
+
+    query = "query($r: [MatchFlavoursInput!]!){ matchFlavours(requests: $r){ request flavour{ name } } }"
+    release = str(vanilla.release_id)
+    requests = [
+        {"release": release, "environment": {"containerType": "DOCKER", "features": [{"kind": "cuda", "cudaVersion": "12.1"}]}},
+        {"release": release, "environment": {"containerType": "DOCKER", "features": [{"kind": "cpu"}]}},
+    ]
+
+    matches = (await execute(query, authenticated_context, {"r": requests}))["matchFlavours"]
+    assert [match["flavour"]["name"] for match in matches] == ["cuda", "vanilla"]
+    assert sorted(scored) == [("cpu", "vanilla"), ("cuda", "cuda"), ("cuda", "vanilla")]
+    assert sorted(read) == ["cuda", "vanilla"]
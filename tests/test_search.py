@@ -0,0 +1,58 @@
+"""Tests for ranked search (``bridge.search``): the ``search`` filters and the root ``search`` query.
+
+The built chain has the app ``ome`` in the repository ``ome`` and one definition,
+"Convert Omero" ("Converts an Omero File in a set of Mikrodata").
+"""
+
+import pytest
+
+from kante.context import HttpContext
+from tests.utils import execute
+
+SEARCH = "query($q: String!){ search(query: $q){ kind id label rank } }"
+
+
+async def definition_names(context: HttpContext, search: str) -> list[str]:
+    result = await execute("query($f: DefinitionFilter){ definitions(filters: $f){ name } }", context, {"f": {"search": search}})
+    return [d["name"] for d in result["definitions"]]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_definition_search_is_full_text(authenticated_context: HttpContext, built_chain: dict) -> None:
+    assert await definition_names(authenticated_context, "conv") == ["Convert Omero"]
+    # The description is searched too, and every word has to match.
+    assert await definition_names(authenticated_context, "omero mikrodat") == ["Convert Omero"]
+    assert await definition_names(authenticated_context, "omero segmentation") == []
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_search_ranks_hits_across_kinds(authenticated_context: HttpContext, built_chain: dict) -> None:
+    hits = (await execute(SEARCH, authenticated_context, {"q": "ome"}))["search"]
+
+    assert {hit["kind"] for hit in hits} >= {"DEFINITION", "APP", "GITHUB_REPO"}
+    assert [hit["rank"] for hit in hits] == sorted((hit["rank"] for hit in hits), reverse=True)
+    assert {"kind": "GITHUB_REPO", "id": built_chain["repo_id"]} in [{"kind": hit["kind"], "id": hit["id"]} for hit in hits]
+
+    hits = (await execute(SEARCH, authenticated_context, {"q": "mikrodata"}))["search"]
+    assert [(hit["kind"], hit["label"]) for hit in hits] == [("DEFINITION", "Convert Omero")]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_search_is_scoped_to_the_organization(authenticated_context: HttpContext, other_org_context: HttpContext, built_chain: dict) -> None:
+    assert (await execute(SEARCH, other_org_context, {"q": "ome"}))["search"] == []
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_search_tolerates_typos(authenticated_context: HttpContext, built_chain: dict) -> None:
+    from asgiref.sync import sync_to_async
+
+    from bridge.search import has_trigram
+
+    if not await sync_to_async(has_trigram)():
+        pytest.skip("pg_trgm is not installed")
+
+    assert await definition_names(authenticated_context, "Convrt") == ["Convert Omero"]
@@ -0,0 +1,41 @@
+"""Tests for semver parsing and constraints in ``bridge.versions``."""
+
+import pytest
+
+from bridge import versions
+
+
+def test_parse_fills_missing_parts_and_ignores_non_semver() -> None:
+    assert versions.parse("v1.2") == {"version_major": 1, "version_minor": 2, "version_patch": 0, "version_prerelease": None, "version_prerelease_key": None}
+    assert versions.parse("1.3.0-rc.1+build.5")["version_prerelease"] == "rc.1"
+    assert versions.parse("nightly")["version_major"] is None
+
+
+def test_prerelease_keys_follow_semver_precedence() -> None:
+    tags = ["alpha", "alpha.1", "alpha.beta", "beta", "beta.2", "beta.11", "rc.1", "rc.2", "rc.10"]
+    assert sorted(tags, key=versions.prerelease_key) == tags
+    assert versions.prerelease_key("1") < versions.prerelease_key("10") < versions.prerelease_key("9a")
+
+
+def test_constraints_expand_to_bounds() -> None:
+    lowest = versions.LOWEST
+    assert versions.bounds("^", "1.2") == [(">=", (1, 2, 0), None), ("<", (2, 0, 0), lowest)]
+    assert versions.bounds("^", "0.2.3") == [(">=", (0, 2, 3), None), ("<", (0, 3, 0), lowest)]
+    assert versions.bounds("~", "1.2.3") == [(">=", (1, 2, 3), None), ("<", (1, 3, 0), lowest)]
+    assert versions.bounds(None, "1.x") == [(">=", (1, 0, 0), None), ("<", (2, 0, 0), lowest)]
+    assert versions.bounds("<=", "1.2") == [("<", (1, 3, 0), lowest)]
+    assert versions.bounds(">=", "1.3.0-rc.1") == [(">=", (1, 3, 0), versions.prerelease_key("rc.1"))]
+    assert versions.bounds(None, "*") == []
+
+
+def test_ranges_fix_their_shared_leading_parts() -> None:
+    assert versions.fixed_parts(versions.bounds("^", "1.2")) == (1,)
+    assert versions.fixed_parts(versions.bounds("~", "3.4")) == (3, 4)
+    assert versions.fixed_parts(versions.bounds("<", "1")) == ()
+
+
+def test_invalid_constraints_are_rejected() -> None:
+    with pytest.raises(ValueError):
+        versions.constraint_q("^one")
+    with pytest.raises(ValueError):
+        versions.constraint_q(">=1.2-rc.1")
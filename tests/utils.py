@@ -1,5 +1,8 @@
+import asyncio
+import contextlib
+import hashlib
 import os
-from typing import Any
+from typing import Any, AsyncIterator
 
 
 async def execute(query: str, context: Any, variables: dict | None = None) -> dict:
@@ -30,3 +33,129 @@ def build_relative_dir(path: str) -> str:
         The relative directory
     """
     return os.path.join(os.path.dirname(__file__), path)
+
+
+def build_synthetic_config(app_images: int, implementations: int) -> dict:
+    """Build a raw ``deployments.yaml`` mapping with many app images.
+
+    Every app image is a copy of the first one in ``deployments/deployments.yaml``
+    with its own app identifier, flavour, docker image and ``implementations``
+    distinct definitions, so each one produces its own rows on ingestion.
+
+    Parameters
+    ----------
+    app_images : int
+        How many app images the config should contain
+    implementations : int
+        How many implementations (definitions) each app image should provide
+
+    Returns
+    -------
+    dict
+        The raw config, ready for ``KabinetConfigFile(**config)``
+    """
+    import copy
+
+    import yaml
+
+    with open(build_relative_dir("deployments/deployments.yaml"), "r") as f:
+        template = yaml.safe_load(f)["app_images"][0]
+
+    images = []
+    for i in range(app_images):
+        image = copy.deepcopy(template)
+        image["appImageId"] = f"{template['appImageId']}{i}"
+        image["flavourName"] = f"{template['flavourName']}-{i}"
+        image["manifest"]["identifier"] = f"{template['manifest']['identifier']}.synthetic{i}"
+        image["image"]["imageString"] = f"{template['image']['imageString']}-{i}"
+
+        base = template["inspection"]["implementations"][0]
+        image["inspection"]["implementations"] = []
+        for j in range(implementations):
+            implementation = copy.deepcopy(base)
+            implementation["definition"]["key"] = f"{base['definition']['key']}_{i}_{j}"
+            implementation["definition"]["name"] = f"{base['definition']['name']} {i}.{j}"
+            image["inspection"]["implementations"].append(implementation)
+
+        images.append(image)
+
+    return {"app_images": images}
+
+
+class RawFileServer:
+    """A local stand-in for raw.githubusercontent.com.
+
+    Serves ``files`` (path -> body) and answers 404 for everything else. It
+    records every request and the highest number of requests it was handling
+    at the same time, so tests can assert on fan-out and connection reuse.
+    Like GitHub, it sends a content ETag and answers a matching
+    ``If-None-Match`` with ``304``, unless ``etags`` is off. ``flaky`` maps
+    paths to a number of ``503`` answers to give before serving the file.
+    """
+
+    def __init__(self, files: dict[str, str], delay: float = 0, etags: bool = True, flaky: dict[str, int] | None = None) -> None:
+        self.files = files
+        self.delay = delay
+        self.etags = etags
+        self.flaky = dict(flaky or {})
+        self.requests: list[Any] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.url = ""
+
+    async def handle(self, request: Any) -> Any:
+        from aiohttp import web
+
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.flaky.get(request.path):
+                self.flaky[request.path] -= 1
+                return web.Response(status=503)
+
+            if request.path not in self.files:
+                return web.Response(status=404)
+
+            body = self.files[request.path]
+            if not self.etags:
+                return web.Response(text=body)
+
+            etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+            if request.headers.get("If-None-Match") == etag:
+                return web.Response(status=304, headers={"ETag": etag})
+            return web.Response(text=body, headers={"ETag": etag})
+        finally:
+            self.in_flight -= 1
+
+
+@contextlib.asynccontextmanager
+async def serve_raw_files(files: dict[str, str], delay: float = 0, etags: bool = True, flaky: dict[str, int] | None = None) -> AsyncIterator[RawFileServer]:
+    """Run a :class:`RawFileServer` on a free local port for the duration of the block.
+
+    The shared HTTP client session is closed on exit, so no pooled connection
+    outlives the stand-in.
+    """
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    from bridge.repo.client import aclose_session
+
+    stand_in = RawFileServer(files, delay=delay, etags=etags, flaky=flaky)
+    app = web.Application()
+    app.router.add_route("GET", "/{tail:.*}", stand_in.handle)
+
+    server = TestServer(app, host="127.0.0.1")
+    await server.start_server()
+    stand_in.url = str(server.make_url("")).rstrip("/")
+    try:
+        yield stand_in
+    finally:
+        await aclose_session()
+        await server.close()
+
+
+def kabinet_path(user: str, repo: str, branch: str = "main") -> str:
+    """The path a repository's ``deployments.yaml`` is served at."""
+    return f"/{user}/{repo}/{branch}/.arkitekt_next/deployments.yaml"